@@ -67,12 +67,13 @@ def add_new_car(admin_id):
             available=1
         )
         
-        if storage.add_car(car):
-            showroom.add_car(car_id)
-            storage.save_showrooms()
-            
-            storage.push_admin_action(admin_id, "add", "car", car_id, f"{make} {model}")
-            
+        with storage.transaction():
+            added = storage.add_car(car)
+            if added:
+                storage.add_car_to_showroom(showroom_id, car_id)
+                storage.push_admin_action(admin_id, "add", "car", car_id, f"{make} {model}")
+        
+        if added:
             print(f"\n Car added successfully Car ID: {car_id}")
             return True
         else:
@@ -84,7 +85,7 @@ def add_new_car(admin_id):
         return False
 
 
-def update_car_details():
+def update_car_details(admin_id):
     """Update car details."""
     print("\n" + "=" * 60)
     print("UPDATE CAR")
@@ -108,7 +109,13 @@ def update_car_details():
         price_input = input(f"New Price [{car.price}]: ").strip()
         price = float(price_input) if price_input else car.price
         
-        if storage.update_car(car_id, make=make, model=model, year=year, price=price):
+        before = car.to_csv_row()
+        with storage.transaction():
+            updated = storage.update_car(car_id, make=make, model=model, year=year, price=price)
+            if updated:
+                storage.push_admin_action(admin_id, "update", "car", car_id, f"{make} {model}", before)
+        
+        if updated:
             print(f"\n Car updated successfully")
             return True
         else:
@@ -134,9 +141,12 @@ def delete_car_admin(admin_id):
         
         if confirm in ['yes', 'y']:
             car_info = f"{car.make} {car.model}"
-            if storage.delete_car(car_id):
-                
-                storage.push_admin_action(admin_id, "delete", "car", car_id, car_info)
+            with storage.transaction():
+                deleted = storage.delete_car(car_id)
+                if deleted:
+                    storage.push_admin_action(admin_id, "delete", "car", car_id, car_info, car.to_csv_row())
+            
+            if deleted:
                 print(f"\n Car deleted successfully")
                 return True
             else:
@@ -212,9 +222,13 @@ def delete_customer_admin(admin_id):
         confirm = input(f"Delete customer '{customer.username}'? (yes/no): ").strip().lower()
         
         if confirm in ['yes', 'y']:
-            if storage.delete_customer(customer_id):
-                
-                storage.push_admin_action(admin_id, "delete", "customer", customer_id, customer.username)
+            with storage.transaction():
+                deleted = storage.delete_customer(customer_id)
+                if deleted:
+                    storage.push_admin_action(admin_id, "delete", "customer", customer_id, customer.username,
+                                              customer.to_csv_row())
+            
+            if deleted:
                 print(f"\n Customer deleted successfully")
                 return True
             else:
@@ -282,7 +296,7 @@ def add_new_showroom(admin_id):
         return False
 
 
-def update_showroom_details():
+def update_showroom_details(admin_id):
     """Update showroom details."""
     print("\n" + "=" * 60)
     print("UPDATE SHOWROOM")
@@ -303,7 +317,13 @@ def update_showroom_details():
         location = input(f"New Location [{showroom.location}]: ").strip() or showroom.location
         phone = input(f"New Phone [{showroom.phone}]: ").strip() or showroom.phone
         
-        if storage.update_showroom(showroom_id, name=name, location=location, phone=phone):
+        before = showroom.to_csv_row()
+        with storage.transaction():
+            updated = storage.update_showroom(showroom_id, name=name, location=location, phone=phone)
+            if updated:
+                storage.push_admin_action(admin_id, "update", "showroom", showroom_id, name, before)
+        
+        if updated:
             print(f"\n Showroom updated successfully")
             return True
         else:
@@ -331,8 +351,13 @@ def delete_showroom_admin(admin_id):
         confirm = input(f"Delete showroom '{showroom.name}'? (yes/no): ").strip().lower()
         
         if confirm in ['yes', 'y']:
-            if storage.delete_showroom(showroom_id):
-                storage.push_admin_action(admin_id, "delete", "showroom", showroom_id, showroom.name)
+            with storage.transaction():
+                deleted = storage.delete_showroom(showroom_id)
+                if deleted:
+                    storage.push_admin_action(admin_id, "delete", "showroom", showroom_id, showroom.name,
+                                              showroom.to_csv_row())
+            
+            if deleted:
                 print(f"\n Showroom deleted successfully")
                 return True
             else:
@@ -400,7 +425,7 @@ def add_new_garage(admin_id):
         return False
 
 
-def update_garage_details():
+def update_garage_details(admin_id):
     """Update garage details."""
     print("\n" + "=" * 60)
     print("UPDATE GARAGE")
@@ -421,7 +446,13 @@ def update_garage_details():
         location = input(f"New Location [{garage.location}]: ").strip() or garage.location
         phone = input(f"New Phone [{garage.phone}]: ").strip() or garage.phone
         
-        if storage.update_garage(garage_id, name=name, location=location, phone=phone):
+        before = garage.to_csv_row()
+        with storage.transaction():
+            updated = storage.update_garage(garage_id, name=name, location=location, phone=phone)
+            if updated:
+                storage.push_admin_action(admin_id, "update", "garage", garage_id, name, before)
+        
+        if updated:
             print(f"\n Garage updated successfully")
             return True
         else:
@@ -449,9 +480,12 @@ def delete_garage_admin(admin_id):
         confirm = input(f"Delete garage '{garage.name}'? (yes/no): ").strip().lower()
         
         if confirm in ['yes', 'y']:
-            if storage.delete_garage(garage_id):
-                
-                storage.push_admin_action(admin_id, "delete", "garage", garage_id, garage.name)
+            with storage.transaction():
+                deleted = storage.delete_garage(garage_id)
+                if deleted:
+                    storage.push_admin_action(admin_id, "delete", "garage", garage_id, garage.name, garage.to_csv_row())
+            
+            if deleted:
                 print(f"\n Garage deleted successfully")
                 return True
             else:
@@ -515,7 +549,7 @@ def add_new_service(admin_id):
         return False
 
 
-def update_service_details():
+def update_service_details(admin_id):
     """Update service details."""
     print("\n" + "=" * 60)
     print("UPDATE SERVICE")
@@ -536,7 +570,13 @@ def update_service_details():
         price_input = input(f"New Price [{service.price}]: ").strip()
         price = float(price_input) if price_input else service.price
         
-        if storage.update_service(service_id, name=name, price=price):
+        before = service.to_csv_row()
+        with storage.transaction():
+            updated = storage.update_service(service_id, name=name, price=price)
+            if updated:
+                storage.push_admin_action(admin_id, "update", "service", service_id, name, before)
+        
+        if updated:
             print(f"\n Service updated successfully")
             return True
         else:
@@ -561,9 +601,12 @@ def delete_service_admin(admin_id):
         confirm = input(f"Delete service '{service.name}'? (yes/no): ").strip().lower()
         
         if confirm in ['yes', 'y']:
-            if storage.delete_service(service_id):
-                
-                storage.push_admin_action(admin_id, "delete", "service", service_id, service.name)
+            with storage.transaction():
+                deleted = storage.delete_service(service_id)
+                if deleted:
+                    storage.push_admin_action(admin_id, "delete", "service", service_id, service.name, service.to_csv_row())
+            
+            if deleted:
                 print(f"\n Service deleted successfully")
                 return True
             else:
@@ -584,36 +627,104 @@ def view_service_queue():
     return storage.view_service_request_queue()
 
 
-def process_next_service_request():
-    """Process the next service request from the queue."""
-    request = storage.dequeue_service_request()
+def process_next_service_request(garage_id=None):
+    """Process the next service request for a garage, or the next garage in round-robin order."""
+    with storage.transaction():
+        request = storage.dequeue_service_request(garage_id)
+        
+        if not request:
+            return None
+        
+        #create service process
+        process_id = storage.next_id_for("service_process")
+        service = storage.get_service_by_id(request['service_id'])
+        
+        service_process = ServiceProcess(
+            process_id=process_id,
+            customer_id=request['customer_id'],
+            date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            amount=service.price if service else 0,
+            service_id=request['service_id'],
+            garage_id=request['garage_id']
+        )
+        
+        storage.add_service_process(service_process)
     
-    if not request:
-        return None
+    print(f"\n Service request completed")
+    print(f"  Process ID: {process_id}")
+    print(f"  Customer ID: {request['customer_id']}")
+    if service:
+        print(f"  Service: {service.name}")
+        print(f"  Amount: ${service.price:.2f}")
     
-    #create service process
-    process_id = storage.next_id_for("service_process")
+    return service_process
+
+
+def _build_service_process(request, process_id, date):
+    """Build the ServiceProcess record for a dequeued service request."""
     service = storage.get_service_by_id(request['service_id'])
-    
-    service_process = ServiceProcess(
+    return ServiceProcess(
         process_id=process_id,
         customer_id=request['customer_id'],
-        date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        date=date,
         amount=service.price if service else 0,
         service_id=request['service_id'],
         garage_id=request['garage_id']
     )
+
+
+def process_service_requests(batch_size=100, garage_id=None):
+    """Process up to batch_size queued service requests serially and return a summary.
+
+    Requests are dequeued and turned into ServiceProcess records one after another in a
+    plain loop; the whole batch is committed in one transaction: one write per file
+    instead of one per request.
+    """
+    date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    storage.add_service_process(service_process)
+    with storage.transaction():
+        requests = storage.dequeue_service_requests(batch_size, garage_id)
+        processes = []
+        for request in requests:
+            service_process = _build_service_process(request, storage.next_id_for("service_process"), date)
+            storage.add_service_process(service_process)
+            processes.append(service_process)
+        process_ids = [p.process_id for p in processes]
     
-    print(f"\n Service request completed")
-    print(f"  Process ID: {process_id}")
-    print(f"  Customer ID: {request['customer_id']}")
-    if service:
-        print(f"  Service: {service.name}")
-        print(f"  Amount: ${service.price:.2f}")
+    by_garage = {}
+    for service_process in processes:
+        by_garage[service_process.garage_id] = by_garage.get(service_process.garage_id, 0) + 1
     
-    return service_process
+    summary = {
+        'processed': len(processes),
+        'process_ids': process_ids,
+        'total_amount': sum(p.amount for p in processes),
+        'by_garage': by_garage,
+        'remaining': storage.get_queue_size()
+    }
+    
+    print(f"\n Processed {summary['processed']} service requests")
+    for gid, count in sorted(by_garage.items()):
+        print(f"  Garage #{gid}: {count}")
+    print(f"  Total Amount: ${summary['total_amount']:,.2f}")
+    print(f"  Remaining in Queue: {summary['remaining']}")
+    
+    return summary
+
+
+def process_service_request_batch():
+    """Ask for a batch size and process that many queued service requests, one after another."""
+    try:
+        batch_size = input("Batch size (default 100): ").strip()
+        batch_size = int(batch_size) if batch_size else 100
+        if batch_size <= 0:
+            print("\n Batch size must be positive.")
+            return None
+        return process_service_requests(batch_size)
+    
+    except ValueError as e:
+        print(f"\n Invalid input: {e}")
+        return None
 
 
 #stack management 
@@ -623,18 +734,34 @@ def view_admin_actions():
 
 
 def undo_last_action():
-    """Undo the last admin action."""
-    action = storage.pop_admin_action()
-    
-    if not action:
-        return None
-    
-    print(f"\nUndoing action: {action['action_type']} {action['entity_type']} #{action['entity_id']}")
+    """Undo the last admin action by applying its inverse operation."""
+    with storage.transaction():
+        action = storage.pop_admin_action()
+        
+        if not action:
+            return None
+        
+        entity_type = action['entity_type']
+        entity_id = action['entity_id']
+        print(f"\nUndoing action: {action['action_type']} {entity_type} #{entity_id}")
+        
+        if action['action_type'] == 'add':
+            #the inverse of an add is a delete (delete_car also unlinks the showroom)
+            delete = getattr(storage, f"delete_{entity_type}", None)
+            undone = bool(delete and delete(entity_id))
+        elif action['action_type'] in ('update', 'delete') and action.get('before'):
+            #put the before-image back, from the stack itself
+            entity = storage.restore_entity(entity_type, action['before'])
+            if entity_type == 'car' and action['action_type'] == 'delete':
+                storage.add_car_to_showroom(entity.showroom_id, entity.id)
+            undone = True
+        else:
+            undone = False
     
-    if action['action_type'] == 'delete':
-        print("  Note: Undo for delete operations requires manual restoration")
-    elif action['action_type'] == 'add':
-        print("  Note: Consider manually removing the added entity")
+    if undone:
+        print(f" {action['action_type'].capitalize()} of {entity_type} #{entity_id} undone")
+    else:
+        print("  Note: No undo information was recorded for this action, it requires manual restoration")
     
     print(" Action popped from stack")
     return action
@@ -698,17 +825,36 @@ def view_system_statistics():
     
     print(f"\nQueue & Stack:")
     print(f"  Service Request Queue: {storage.get_queue_size()} pending")
+    for garage_id, depth in sorted(storage.get_garage_queue_sizes().items()):
+        print(f"    Garage #{garage_id}: {depth} pending")
     print(f"  Admin Action Stack: {storage.get_stack_size()} actions")
     
     print(f"\nReservations:")
     print(f"  Active Reservations: {len(storage.get_all_reservations())}")
     
-    total_buy_rent = sum(p.amount for p in buy_rent)
-    total_service = sum(p.amount for p in service_processes)
+    revenue = storage.get_revenue_stats()
     print(f"\nRevenue:")
-    print(f"  Car Sales/Rentals: ${total_buy_rent:,.2f}")
-    print(f"  Services: ${total_service:,.2f}")
-    print(f"  Total: ${(total_buy_rent + total_service):,.2f}")
+    print(f"  Car Sales/Rentals: ${revenue['buy_rent_total']:,.2f}"
+          f" (buy ${revenue['by_type']['buy']:,.2f}, rent ${revenue['by_type']['rent']:,.2f})")
+    print(f"  Services: ${revenue['service_total']:,.2f}")
+    print(f"  Total: ${revenue['total']:,.2f}")
+    print(f"\nRevenue by Month:")
+    for month, amount in revenue['by_month'].items():
+        print(f"  {month}: ${amount:,.2f}")
+    print(f"\nRevenue by Showroom:")
+    for showroom_id, amount in sorted(revenue['by_showroom'].items()):
+        print(f"  Showroom #{showroom_id}: ${amount:,.2f}")
+    print(f"\nRevenue by Garage:")
+    for garage_id, amount in sorted(revenue['by_garage'].items()):
+        print(f"  Garage #{garage_id}: ${amount:,.2f}")
+    print(f"\nTop Customers:")
+    for customer_id, amount in sorted(revenue['by_customer'].items(), key=lambda item: -item[1])[:5]:
+        print(f"  Customer #{customer_id}: ${amount:,.2f}")
+    print(f"\nAmount Percentiles:")
+    for name, label in (("buy_rent", "Sale/Rental"), ("service", "Service")):
+        if revenue['percentiles'][name]:
+            cuts = ", ".join(f"p{q} ${amount:,.2f}" for q, amount in revenue['percentiles'][name].items())
+            print(f"  {label}: {cuts}")
     
     #car availability
     cars = storage.get_all_cars()
@@ -772,7 +918,7 @@ def admin_menu(admin):
             elif choice == '2':
                 add_new_car(admin.id)
             elif choice == '3':
-                update_car_details()
+                update_car_details(admin.id)
             elif choice == '4':
                 delete_car_admin(admin.id)
             elif choice == '5':
@@ -787,7 +933,7 @@ def admin_menu(admin):
             elif choice == '9':
                 add_new_showroom(admin.id)
             elif choice == '10':
-                update_showroom_details()
+                update_showroom_details(admin.id)
             elif choice == '11':
                 delete_showroom_admin(admin.id)
             elif choice == '12':
@@ -795,7 +941,7 @@ def admin_menu(admin):
             elif choice == '13':
                 add_new_garage(admin.id)
             elif choice == '14':
-                update_garage_details()
+                update_garage_details(admin.id)
             elif choice == '15':
                 delete_garage_admin(admin.id)
             elif choice == '16':
@@ -803,7 +949,7 @@ def admin_menu(admin):
             elif choice == '17':
                 add_new_service(admin.id)
             elif choice == '18':
-                update_service_details()
+                update_service_details(admin.id)
             elif choice == '19':
                 delete_service_admin(admin.id)
             elif choice == '20':
@@ -0,0 +1,77 @@
+#car search benchmark: Car.matches_filter over every car vs. the columnar CarTable masks
+#vs. storage.search_cars (which plans over the CarIndex or hands off to the CarTable),
+#and the cheapest available cars by sorting everything vs. walking the PriceIndex
+#   usage: python benchmarks/car_search.py [number of cars]  (needs numpy)
+import os
+import random
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from columnar import CarTable
+from models import Car
+import storage
+from storage import PriceIndex
+
+MAKES = ["Toyota", "Honda", "BMW", "Audi", "Kia", "Ford", "Hyundai", "Nissan"]
+MODELS = ["Camry", "Civic", "X5", "A4", "Rio", "Focus", "Accord", "Elantra", "Sunny"]
+
+FILTERS = [
+    {"make": "toy"},
+    {"model": "c", "available": True},
+    {"year": 2018, "min_price": 20000},
+    {"make": "BMW", "max_price": 50000, "available": "1"},
+    {"make": "kia", "year": 2018, "showroom_id": 7},
+    {"year": 2020, "showroom_id": 12, "available": True},
+]
+
+
+def make_cars(count):
+    """Return count random cars."""
+    rng = random.Random(0)
+    return [Car(i, rng.choice(MAKES), rng.choice(MODELS), rng.randint(2005, 2024),
+                rng.randint(5, 120) * 1000.0, rng.randint(0, 1), rng.randint(1, 50), rng.randint(0, 1))
+            for i in range(1, count + 1)]
+
+
+def timed(function):
+    """Return (result, milliseconds) of one call."""
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    cars = make_cars(count)
+    by_id = {car.id: car for car in cars}
+    table, build_ms = timed(lambda: CarTable(cars))
+    #serve the generated cars from storage, as if they had been loaded from cars.csv
+    storage._bind_table("cars", by_id)
+    _, warm_ms = timed(lambda: storage.search_cars({"year": 2020}))
+    print(f"{count} cars, CarTable built in {build_ms:.0f} ms, storage's car indexes in {warm_ms:.0f} ms")
+    print(f"{'filters':<56}{'loop ms':>10}{'columnar ms':>13}{'search_cars ms':>16}{'matches':>10}")
+
+    for filters in FILTERS:
+        expected, loop_ms = timed(lambda: [car for car in cars if car.matches_filter(filters)])
+        found, columnar_ms = timed(lambda: table.filter(filters))
+        searched, search_ms = timed(lambda: storage.search_cars(filters))
+        assert [car.id for car in found] == [car.id for car in expected] == [car.id for car in searched]
+        print(f"{str(filters):<56}{loop_ms:>10.1f}{columnar_ms:>13.1f}{search_ms:>16.1f}{len(found):>10}")
+
+    prices = PriceIndex(cars)
+    for lo, hi in ((None, None), (40000, 60000)):
+        def in_range(car):
+            return car.available and (lo is None or car.price >= lo) and (hi is None or car.price <= hi)
+        expected, sort_ms = timed(lambda: sorted(filter(in_range, cars), key=lambda car: (car.price, car.id))[:50])
+        found, walk_ms = timed(lambda: list(islice(
+            (car for car in map(by_id.__getitem__, prices.ids_between(lo, hi)) if car.available), 50)))
+        assert [car.id for car in found] == [car.id for car in expected]
+        print(f"cheapest 50 available priced {lo}..{hi}: sorted in {sort_ms:.1f} ms, "
+              f"price index walk in {walk_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
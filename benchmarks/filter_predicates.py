@@ -0,0 +1,58 @@
+#filter benchmark: Car.matches_filter vs. the predicates compiled by search_utils, per row
+#   usage: python benchmarks/filter_predicates.py [number of rows]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models import Car
+from search_utils import compile_car_filter
+
+MAKES = ["Toyota", "Honda", "BMW", "Audi", "Kia", "Ford", "Hyundai", "Nissan"]
+MODELS = ["Camry", "Civic", "X5", "A4", "Rio", "Focus", "Accord", "Elantra", "Sunny"]
+
+CAR_FILTERS = [
+    {"make": "toy"},
+    {"year": "2018", "min_price": "20000"},
+    {"make": "BMW", "max_price": 50000, "available": "1"},
+    {"make": "o", "model": "c", "year": 2020, "min_price": 10000, "max_price": 90000, "available": True},
+]
+
+
+def make_cars(count):
+    """Return count random cars."""
+    rng = random.Random(0)
+    return [Car(i, rng.choice(MAKES), rng.choice(MODELS), rng.randint(2005, 2024),
+                rng.randint(5, 120) * 1000.0, rng.randint(0, 1), rng.randint(1, 50), rng.randint(0, 1))
+            for i in range(1, count + 1)]
+
+
+def per_row_ns(rows, predicate):
+    """Return (matching rows, nanoseconds per row) of one pass of predicate over rows."""
+    start = time.perf_counter()
+    found = [row for row in rows if predicate(row)]
+    return found, (time.perf_counter() - start) * 1e9 / len(rows)
+
+
+def compare(cars, filters):
+    """Print the per-row cost of matches_filter and of the compiled predicate for one filter dict."""
+    expected, plain_ns = per_row_ns(cars, lambda car: car.matches_filter(filters))
+    found, compiled_ns = per_row_ns(cars, compile_car_filter(filters))
+    assert found == expected
+    print(f"{str(filters):<100}{plain_ns:>8.0f}{compiled_ns:>10.0f}{plain_ns / compiled_ns:>8.1f}x")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    cars = make_cars(count)
+    print(f"ns per car over {count} cars")
+    print(f"{'filters':<100}{'plain':>8}{'compiled':>10}{'speedup':>9}")
+
+    for filters in CAR_FILTERS:
+        compare(cars, filters)
+
+
+if __name__ == "__main__":
+    main()
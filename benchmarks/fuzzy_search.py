@@ -0,0 +1,76 @@
+#fuzzy car search benchmark: edit distance against every car vs. the FuzzyCarIndex BK-tree
+#   usage: python benchmarks/fuzzy_search.py [number of cars]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fuzzy import FuzzyCarIndex, edit_distance, tolerance, words
+from models import Car
+
+MAKES = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Land Cruiser"],
+    "Mercedes-Benz": ["C-Class", "E-Class", "GLC", "S-Class"],
+    "Volkswagen": ["Golf", "Passat", "Tiguan", "Polo"],
+    "Hyundai": ["Elantra", "Tucson", "Accent", "Sonata"],
+    "Chevrolet": ["Corvette", "Malibu", "Camaro", "Cruze"],
+    "Nissan": ["Sunny", "Altima", "Qashqai", "X-Trail"],
+    "Porsche": ["Cayenne", "Macan", "Panamera", "Taycan"],
+}
+
+QUERIES = ["mercedez", "toyota corola", "volkswagon tiguan", "hundai", "chevrolette camero", "porshe"]
+
+
+def make_cars(count):
+    """Return count random cars, each model also sold under a few trim suffixes."""
+    rng = random.Random(0)
+    cars = []
+    for i in range(1, count + 1):
+        make = rng.choice(list(MAKES))
+        model = f"{rng.choice(MAKES[make])} {rng.choice(['', 'Sport', 'Hybrid', f'T{rng.randint(1, 400)}'])}"
+        cars.append(Car(i, make, model.strip(), 2020, 30000.0, 1, 1, 1))
+    return cars
+
+
+def brute_force(cars, query, limit):
+    """Rank every car by edit distance, the way a search without the index would."""
+    terms = words(query)
+    scored = []
+    for car in cars:
+        car_words = words(car.make) + words(car.model)
+        score = 0
+        for term in terms:
+            distance = min(edit_distance(term, word) for word in car_words)
+            if distance > tolerance(term):
+                break
+            score += distance
+        else:
+            scored.append((score, car.id))
+    return [car_id for _, car_id in sorted(scored)[:limit]]
+
+
+def timed(function):
+    """Return (result, milliseconds) of one call."""
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cars = make_cars(count)
+    index, build_ms = timed(lambda: FuzzyCarIndex(cars))
+    print(f"{count} cars, {len(index.tree)} distinct words, FuzzyCarIndex built in {build_ms:.0f} ms")
+    print(f"{'query':<24}{'every car ms':>14}{'bk-tree ms':>12}")
+
+    for query in QUERIES:
+        expected, brute_ms = timed(lambda: brute_force(cars, query, 10))
+        found, index_ms = timed(lambda: index.search(query, 10))
+        assert found == expected
+        print(f"{query:<24}{brute_ms:>14.1f}{index_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
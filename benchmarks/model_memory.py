@@ -0,0 +1,59 @@
+#memory benchmark for the model classes: bytes per object with __slots__ (as shipped)
+#and without (the same class rebuilt with a per-instance __dict__)
+#   usage: python benchmarks/model_memory.py [objects per class]
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models import (
+    Customer, Car, Showroom, Garage, Service,
+    BuyRentProcess, ServiceProcess, Reservation
+)
+
+#one representative csv row per model; the id column is replaced per object
+SAMPLE_ROWS = {
+    Customer: "1,john_doe,secret123,01012345678",
+    Car: "1,Toyota,Camry,2022,28000.0,1,1,1",
+    Showroom: "1,Downtown Auto Mall,Cairo,0225551234,1;2;3;4",
+    Garage: "1,Quick Fix,Giza,0235554321,1;2;3",
+    Service: "1,Oil Change,50.0",
+    BuyRentProcess: "1,1,2024-12-10 10:30:00,28000.0,1,buy",
+    ServiceProcess: "1,1,2024-12-10 11:00:00,50.0,1,1",
+    Reservation: "1,1,1,2025-12-08 19:04:28,2025-12-09 19:04:28",
+}
+
+
+def unslotted(cls):
+    """Return a copy of a model class without __slots__, i.e. with a per-instance __dict__."""
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in cls.__slots__ and name not in ("__slots__", "__dict__", "__weakref__")}
+    return type(cls.__name__, (), namespace)
+
+
+def bytes_per_object(cls, row, count):
+    """Average bytes allocated per object when parsing count rows into cls."""
+    rows = [f"{i}{row[row.index(','):]}" for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls.from_csv_row(line) for line in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    #the list holding the objects is not part of their cost
+    return (after - before - sys.getsizeof(objects)) / len(objects)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"Bytes per object ({count} objects per class)")
+    print(f"{'model':<16}{'__dict__':>10}{'__slots__':>11}{'saved':>8}")
+
+    for cls, row in SAMPLE_ROWS.items():
+        plain = bytes_per_object(unslotted(cls), row, count)
+        slotted = bytes_per_object(cls, row, count)
+        print(f"{cls.__name__:<16}{plain:>10.0f}{slotted:>11.0f}{1 - slotted / plain:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
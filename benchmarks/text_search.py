@@ -0,0 +1,50 @@
+#substring search benchmark: Service.matches_filter over every service vs. a TrigramIndex lookup
+#   usage: python benchmarks/text_search.py [number of services]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from models import Service
+from storage import TrigramIndex
+
+WORDS = ["oil", "brake", "tyre", "engine", "filter", "battery", "wash", "polish", "alignment",
+         "coolant", "clutch", "gearbox", "exhaust", "wiper", "spark", "plug", "check", "premium"]
+
+QUERIES = ["oil", "gearbox flush", "premium wash", "alignment 42", "xyz", "ch"]
+
+
+def make_services(count):
+    """Return count services with random multi-word names."""
+    rng = random.Random(0)
+    return [Service(i, f"{' '.join(rng.sample(WORDS, 3))} {rng.randint(1, 999)}", 100.0)
+            for i in range(1, count + 1)]
+
+
+def timed(function):
+    """Return (result, milliseconds) of one call."""
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    services = make_services(count)
+    by_id = {service.id: service for service in services}
+    index, build_ms = timed(lambda: TrigramIndex(services, ("name",)))
+    print(f"{count} services, TrigramIndex built in {build_ms:.0f} ms")
+    print(f"{'name contains':<20}{'loop ms':>10}{'trigram ms':>12}{'matches':>10}")
+
+    for query in QUERIES:
+        filters = {"name": query}
+        expected, loop_ms = timed(lambda: [service for service in services if service.matches_filter(filters)])
+        found, index_ms = timed(lambda: [by_id[i] for i in sorted(index.search(filters))])
+        assert [service.id for service in found] == [service.id for service in expected]
+        print(f"{query!r:<20}{loop_ms:>10.1f}{index_ms:>12.1f}{len(found):>10}")
+
+
+if __name__ == "__main__":
+    main()
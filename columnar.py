@@ -0,0 +1,284 @@
+#columnar (NumPy) mirrors of in-memory tables, used by storage for vectorized scans
+#numpy is optional: when it is missing HAVE_NUMPY is False and storage keeps per-object loops
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+#a table's arrays are compacted once more than this share of its rows are deleted
+COMPACT_RATIO = 0.5
+
+
+class CarTable:
+    """Columnar copy of the car inventory for vectorized filtering.
+
+    year, price, installment, showroom_id and available are NumPy arrays; make and model are
+    integer codes into per-column vocabularies, so a substring filter tests each distinct value
+    once. Rows keep insertion order (a delete leaves a tombstone until the next compaction), so
+    results come back in the same order as cars_by_id.
+    """
+
+    COLUMNS = {
+        "year": "int32",
+        "price": "float64",
+        "installment": "int8",
+        "showroom_id": "int64",
+        "available": "bool",
+        "make": "int32",
+        "model": "int32",
+        "live": "bool",
+    }
+
+    def __init__(self, cars=()):
+        if np is None:
+            raise ImportError("CarTable requires numpy")
+        cars = list(cars)
+        #car object of each row (None once deleted) and row of each car id
+        self._cars = cars
+        self._rows = {car.id: row for row, car in enumerate(cars)}
+        self._size = len(cars)
+        self._dead = 0
+        #per text column: value -> code, and the lowercased value of each code
+        self._codes = {"make": {}, "model": {}}
+        self._lowered = {"make": [], "model": []}
+
+        capacity = max(self._size, 16)
+        self._arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        for name in ("year", "price", "installment", "showroom_id", "available"):
+            self._arrays[name][:self._size] = np.fromiter(
+                (getattr(car, name) for car in cars), dtype=self.COLUMNS[name], count=self._size)
+        for name in ("make", "model"):
+            self._arrays[name][:self._size] = np.fromiter(
+                (self._encode(name, getattr(car, name)) for car in cars), dtype="int32", count=self._size)
+        self._arrays["live"][:self._size] = True
+
+    def __len__(self):
+        return self._size - self._dead
+
+    def _encode(self, column, value):
+        """Return the code of a make/model value, adding it to the vocabulary if new."""
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self._lowered[column].append(value.lower())
+        return code
+
+    def _grow(self):
+        """Double the capacity of every column."""
+        for name, array in self._arrays.items():
+            grown = np.zeros(len(array) * 2, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            self._arrays[name] = grown
+
+    def upsert(self, car):
+        """Add a car, or overwrite its row in place if it is already in the table."""
+        row = self._rows.get(car.id)
+        if row is None:
+            if self._size == len(self._arrays["live"]):
+                self._grow()
+            row = self._rows[car.id] = self._size
+            self._size += 1
+            self._cars.append(car)
+        else:
+            self._cars[row] = car
+
+        arrays = self._arrays
+        arrays["year"][row] = car.year
+        arrays["price"][row] = car.price
+        arrays["installment"][row] = car.installment
+        arrays["showroom_id"][row] = car.showroom_id
+        arrays["available"][row] = car.available
+        arrays["make"][row] = self._encode("make", car.make)
+        arrays["model"][row] = self._encode("model", car.model)
+        arrays["live"][row] = True
+
+    def remove(self, car_id):
+        """Drop a car's row (a tombstone until the table is compacted)."""
+        row = self._rows.pop(car_id, None)
+        if row is None:
+            return
+        self._arrays["live"][row] = False
+        self._cars[row] = None
+        self._dead += 1
+        if self._dead > COMPACT_RATIO * self._size:
+            self._compact()
+
+    def _compact(self):
+        """Squeeze the tombstones out of every column, keeping row order."""
+        keep = self._arrays["live"][:self._size]
+        live = int(keep.sum())
+        for array in self._arrays.values():
+            array[:live] = array[:self._size][keep]
+        self._cars = [car for car in self._cars if car is not None]
+        self._rows = {car.id: row for row, car in enumerate(self._cars)}
+        self._size = live
+        self._dead = 0
+
+    def _matching_codes(self, column, text):
+        """Return the codes of the vocabulary values containing text (case-insensitive)."""
+        needle = text.lower()
+        return [code for code, value in enumerate(self._lowered[column]) if needle in value]
+
+    def mask(self, filters):
+        """Return a boolean row mask for the same filters as Car.matches_filter."""
+        arrays = {name: array[:self._size] for name, array in self._arrays.items()}
+        mask = arrays["live"].copy()
+
+        for column in ("make", "model"):
+            if filters.get(column):
+                mask &= np.isin(arrays[column], self._matching_codes(column, filters[column]))
+
+        if filters.get("year") is not None:
+            mask &= arrays["year"] == int(filters["year"])
+
+        if filters.get("showroom_id") is not None:
+            mask &= arrays["showroom_id"] == int(filters["showroom_id"])
+
+        if filters.get("min_price") is not None:
+            mask &= arrays["price"] >= float(filters["min_price"])
+
+        if filters.get("max_price") is not None:
+            mask &= arrays["price"] <= float(filters["max_price"])
+
+        if filters.get("available") is not None:
+            val = filters["available"]
+            val = bool(int(val)) if isinstance(val, str) else bool(val)
+            mask &= arrays["available"] == val
+
+        return mask
+
+    def filter(self, filters):
+        """Return the Car objects matching the filters, in insertion order."""
+        return [self._cars[row] for row in np.flatnonzero(self.mask(filters))]
+
+
+class Ledger:
+    """Columnar, append-only copy of a history table for vectorized revenue analytics.
+
+    Holds amount, customer_id, item_id (the car or service), garage_id (-1 if none), date
+    (epoch seconds, -1 if unknown) and a type code per process, so totals, group-bys and
+    percentiles are NumPy reductions instead of loops over process objects.
+    """
+
+    COLUMNS = {
+        "amount": "float64",
+        "customer_id": "int64",
+        "item_id": "int64",
+        "garage_id": "int64",
+        "date": "int64",
+        "type": "int16",
+        "live": "bool",
+    }
+
+    def __init__(self, processes=(), item_field="car_id", garage_field=None, type_field=None):
+        if np is None:
+            raise ImportError("Ledger requires numpy")
+        self._item_field = item_field
+        self._garage_field = garage_field
+        self._type_field = type_field
+        processes = list(processes)
+        #row of each process id, and the type code of each type name
+        self._rows = {process.process_id: row for row, process in enumerate(processes)}
+        self._types = {}
+        self._size = len(processes)
+
+        capacity = max(self._size, 16)
+        self._arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        columns = {
+            "amount": (process.amount for process in processes),
+            "customer_id": (process.customer_id for process in processes),
+            "item_id": (getattr(process, item_field) for process in processes),
+            "garage_id": (getattr(process, garage_field) if garage_field else -1 for process in processes),
+            "date": (-1 if process.date_ts is None else process.date_ts for process in processes),
+            "type": (self._type_code(process) for process in processes),
+        }
+        for name, values in columns.items():
+            self._arrays[name][:self._size] = np.fromiter(values, dtype=self.COLUMNS[name], count=self._size)
+        self._arrays["live"][:self._size] = True
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _type_code(self, process):
+        """Return the code of a process's type (a single code when the table has no type column)."""
+        name = getattr(process, self._type_field).lower() if self._type_field else ""
+        code = self._types.get(name)
+        if code is None:
+            code = self._types[name] = len(self._types)
+        return code
+
+    def upsert(self, process):
+        """Append a process (history tables only grow; a repeated id overwrites its row)."""
+        row = self._rows.get(process.process_id)
+        if row is None:
+            if self._size == len(self._arrays["live"]):
+                for name, array in self._arrays.items():
+                    grown = np.zeros(len(array) * 2, dtype=array.dtype)
+                    grown[:self._size] = array[:self._size]
+                    self._arrays[name] = grown
+            row = self._rows[process.process_id] = self._size
+            self._size += 1
+
+        arrays = self._arrays
+        arrays["amount"][row] = process.amount
+        arrays["customer_id"][row] = process.customer_id
+        arrays["item_id"][row] = getattr(process, self._item_field)
+        arrays["garage_id"][row] = getattr(process, self._garage_field) if self._garage_field else -1
+        arrays["date"][row] = -1 if process.date_ts is None else process.date_ts
+        arrays["type"][row] = self._type_code(process)
+        arrays["live"][row] = True
+
+    def remove(self, process_id):
+        """Drop a process from the aggregates."""
+        row = self._rows.pop(process_id, None)
+        if row is not None:
+            self._arrays["live"][row] = False
+
+    def _mask(self, type=None):
+        """Return the rows to aggregate: live ones, of one type if given."""
+        mask = self._arrays["live"][:self._size].copy()
+        if type is not None:
+            code = self._types.get(type.lower())
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            mask &= self._arrays["type"][:self._size] == code
+        return mask
+
+    def _months(self, mask):
+        """Return the month of each selected row as yyyymm (0 if its date is unknown)."""
+        dates = self._arrays["date"][:self._size][mask]
+        months = np.zeros(len(dates), dtype=np.int64)
+        known = dates >= 0
+        #convert each distinct hour once, in local time like the csv timestamps
+        hours, inverse = np.unique(dates[known] // 3600, return_inverse=True)
+        starts = (datetime.fromtimestamp(int(hour) * 3600) for hour in hours)
+        months[known] = np.fromiter((moment.year * 100 + moment.month for moment in starts),
+                                    dtype=np.int64, count=len(hours))[inverse]
+        return months
+
+    def total(self, type=None):
+        """Return the summed amount (of one type if given)."""
+        return float(self._arrays["amount"][:self._size][self._mask(type)].sum())
+
+    def sum_by(self, column, type=None):
+        """Return {key: summed amount} grouped by customer_id, item_id, garage_id or month."""
+        mask = self._mask(type)
+        if column == "month":
+            keys = self._months(mask)
+        else:
+            keys = self._arrays[column][:self._size][mask]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=self._arrays["amount"][:self._size][mask], minlength=len(unique))
+        return dict(zip(unique.tolist(), sums.tolist()))
+
+    def percentiles(self, qs=(50, 90, 99), type=None):
+        """Return {q: amount at the q-th percentile} (linear interpolation), empty if there are no rows."""
+        amounts = self._arrays["amount"][:self._size][self._mask(type)]
+        if not len(amounts):
+            return {}
+        return dict(zip(qs, np.percentile(amounts, qs).tolist()))
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from models import Customer, BuyRentProcess, ServiceProcess, Reservation
+from models import Customer, BuyRentProcess, ServiceProcess, Reservation, format_timestamp
 import storage
 import search_utils
 
@@ -55,6 +55,10 @@ def search_cars_interactive():
     print("=" * 60)
     print("Leave blank to skip any filter\n")
 
+    query = input("Fuzzy search - type a make and/or model, typos allowed (blank for filters): ").strip()
+    if query:
+        return fuzzy_search_cars_interactive(query)
+
     filters = {}
 
     make = input("Car Make (e.g., Toyota, Honda): ").strip()
@@ -94,7 +98,13 @@ def search_cars_interactive():
     
 
     filters['available_only'] = True
-    results = search_utils.general_car_search(filters)
+    if 'min_price' in filters or 'max_price' in filters:
+        #walk the price index instead of scanning, listing the cheapest cars first
+        filters['available'] = filters.pop('available_only')
+        results = storage.cars_in_price_range(filters.pop('min_price', None), filters.pop('max_price', None),
+                                              filters=filters)
+    else:
+        results = search_utils.general_car_search(filters)
 
     if not results:
         print("No cars found matching the criteria.")
@@ -111,6 +121,25 @@ def search_cars_interactive():
     return results
 
 
+def fuzzy_search_cars_interactive(query, limit=10):
+    """Show the available cars that best match a free-text make/model query."""
+    results = search_utils.fuzzy_car_search(query, limit, {'available_only': True})
+
+    if not results:
+        print(f"No cars found close to '{query}'.")
+        return []
+    
+    print(f"\n Best {len(results)} match(es) for '{query}':")
+    print("=" * 100)
+    for i, car in enumerate(results, 1):
+        installment_text = " Installment" if car.installment else "Cash Only"
+        print(f"{i}. ID: {car.id} | {car.make} {car.model} ({car.year})")
+        print(f"  ${car.price:,.2f} | {installment_text}")
+        print("-" * 100)
+    
+    return results
+
+
 def view_car_details(car_id):
     """Display detailed information about a specific car."""
     car = storage.get_car_by_id(car_id)
@@ -133,9 +162,9 @@ def view_car_details(car_id):
     return car
 
 
-def view_showrooms():
-    """Display all showrooms."""
-    showrooms = storage.get_all_showrooms()
+def view_showrooms(filters=None):
+    """Display all showrooms, or those matching a name/location filter."""
+    showrooms = search_utils.search_showrooms(filters=filters) if filters else storage.get_all_showrooms()
     
     if not showrooms:
         print("\n No showrooms available.")
@@ -187,9 +216,9 @@ def view_cars_in_showroom(showroom_id):
     return available_cars
     
 
-def view_garages():
-    """Display all garages."""
-    garages = storage.get_all_garages()
+def view_garages(filters=None):
+    """Display all garages, or those matching a name/location filter."""
+    garages = search_utils.search_garages(filters=filters) if filters else storage.get_all_garages()
     
     if not garages:
         print("\n No garages available.")
@@ -264,8 +293,9 @@ def buy_car(customer_id, car_id):
         type = "buy"
     )
 
-    storage.add_buy_rent_process(buy_process)
-    storage.update_car(car_id, available=0)
+    with storage.transaction():
+        storage.add_buy_rent_process(buy_process)
+        storage.update_car(car_id, available=0)
 
     print(f"\n Congratulations You have successfully purchased:")
     print(f" {car.make} {car.model} ({car.year})")
@@ -301,8 +331,9 @@ def rent_car(customer_id, car_id):
         type = "rent"
     )
 
-    storage.add_buy_rent_process(rent_process)
-    storage.update_car(car_id, available=0)
+    with storage.transaction():
+        storage.add_buy_rent_process(rent_process)
+        storage.update_car(car_id, available=0)
 
     print(f"\n Congratulations. You have successfully rented:")
     print(f"{car.make} {car.model} ({car.year})")
@@ -338,8 +369,9 @@ def reserve_car(customer_id, car_id, hours=24):
         expiry_time = expiry.strftime('%Y-%m-%d %H:%M:%S')
     )
 
-    storage.add_reservation(reservation)
-    storage.update_car(car_id, available=0)
+    with storage.transaction():
+        storage.add_reservation(reservation)
+        storage.update_car(car_id, available=0)
 
     print(f"\n Car reserved successfully!")
     print(f" {car.make} {car.model} ({car.year})")
@@ -363,9 +395,10 @@ def cancel_reservation(customer_id, reservation_id):
         print(" You can only cancel your own reservations.")
         return False
     
-    storage.delete_reservation(reservation_id)
     car = storage.get_car_by_id(reservation.car_id)
-    storage.update_car(car.id, available=1)
+    with storage.transaction():
+        storage.delete_reservation(reservation_id)
+        storage.update_car(car.id, available=1)
 
     print(f"\nReservation cancelled successfully")
     if car.id:
@@ -376,7 +409,7 @@ def cancel_reservation(customer_id, reservation_id):
 
 def view_my_service_requests(customer_id):
     """View customer's service requests in the queue."""
-    queue = storage.service_request_queue
+    queue = storage.get_all_service_requests()
     
     customer_requests = [req for req in queue if req['customer_id'] == customer_id]
     
@@ -387,10 +420,11 @@ def view_my_service_requests(customer_id):
     print(f"\n Your Service Requests ({len(customer_requests)} pending):")
     print("=" * 80)
     
+    positions = storage.get_queue_positions()
     for req in customer_requests:
         service = storage.get_service_by_id(req['service_id'])
         garage = storage.get_garage_by_id(req['garage_id'])
-        position = queue.index(req) + 1
+        position = positions.get(req['request_id'])
         
         service_name = service.name if service else f"Service #{req['service_id']}"
         garage_name = garage.name if garage else f"Garage #{req['garage_id']}"
@@ -400,7 +434,7 @@ def view_my_service_requests(customer_id):
         print(f"Service: {service_name}")
         print(f"Garage: {garage_name}")
         print(f"Status: {req['status']}")
-        print(f"Requested: {req['timestamp']}")
+        print(f"Requested: {format_timestamp(req['timestamp'])}")
         print("-" * 80)
     
     return customer_requests
@@ -425,7 +459,7 @@ def book_service(customer_id, service_id, garage_id):
         return False
     
     request_id = storage.enqueue_service_request(customer_id, service_id, garage_id)
-    queue_position = storage.get_queue_size()
+    queue_position = storage.get_queue_position(request_id)
 
     print(f"\n Service request submitted successfully")
     print(f" Service: {service.name}")
@@ -542,14 +576,16 @@ def customer_menu(customer):
                 view_car_details(car_id)
             
             elif choice == '4':
-                view_showrooms()
+                location = input("Location contains (leave blank for all): ").strip()
+                view_showrooms({'location': location} if location else None)
             
             elif choice == '5':
                 showroom_id = int(input("Enter Showroom ID: "))
                 view_cars_in_showroom(showroom_id)
             
             elif choice == '6':
-                view_garages()
+                location = input("Location contains (leave blank for all): ").strip()
+                view_garages({'location': location} if location else None)
             
             elif choice == '7':
                 garage_id = int(input("Enter Garage ID: "))
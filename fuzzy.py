@@ -0,0 +1,164 @@
+#typo-tolerant matching of car makes and models: edit distance over a BK-tree of their words
+import heapq
+import re
+
+#a dead word (no car uses it any more) stays in the tree until this share of its words are dead
+REBUILD_RATIO = 0.5
+
+
+def edit_distance(a, b):
+    """Return the Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def tolerance(term):
+    """Return how many edits a query word may be away from a match: 0 up to 2 characters, then 1 per 4, at most 2."""
+    if len(term) <= 2:
+        return 0
+    return min(2, max(1, len(term) // 4))
+
+
+def words(text):
+    """Split text into lowercased words ("Mercedes-Benz" -> ["mercedes", "benz"])."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class BKTree:
+    """Burkhard-Keller tree of words under edit distance.
+
+    Each child hangs off its parent at its distance from it, so a query within t edits of a word
+    at distance d only descends into children at d - t .. d + t (the triangle inequality), and
+    compares against a small part of the vocabulary.
+    """
+
+    def __init__(self, words=()):
+        #a node is [word, {distance: child node}]
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        """Insert a word (no-op if already present)."""
+        if self.root is None:
+            self.root = [word, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [word, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """Return [(distance, word)] for the words within max_distance edits of word."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = edit_distance(word, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[0]))
+            for edge, child in node[1].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class FuzzyCarIndex:
+    """The words of every car's make and model in a BKTree, each mapped to the ids of its cars.
+
+    Kept current like storage's other derived indexes (upsert/remove per journaled write). A word
+    no car uses any more is left in the tree and skipped, until enough are dead to rebuild it.
+    """
+
+    def __init__(self, cars=()):
+        #word -> ids of the cars whose make or model contains it, and the words of each car
+        self._ids = {}
+        self._words = {}
+        for car in cars:
+            self._file(car.id, self._car_words(car))
+        self.tree = BKTree(self._ids)
+
+    def __len__(self):
+        return len(self._words)
+
+    @staticmethod
+    def _car_words(car):
+        return frozenset(words(car.make)) | frozenset(words(car.model))
+
+    def _file(self, car_id, car_words):
+        """Add a car's words, returning those no car had before."""
+        self._words[car_id] = car_words
+        new = []
+        for word in car_words:
+            ids = self._ids.get(word)
+            if ids is None:
+                ids = self._ids[word] = set()
+                new.append(word)
+            ids.add(car_id)
+        return new
+
+    def upsert(self, car):
+        """Index a car under its current make and model."""
+        car_words = self._car_words(car)
+        if self._words.get(car.id) == car_words:
+            return
+        self.remove(car.id)
+        for word in self._file(car.id, car_words):
+            self.tree.add(word)
+
+    def remove(self, car_id):
+        """Drop a car."""
+        for word in self._words.pop(car_id, ()):
+            ids = self._ids[word]
+            ids.discard(car_id)
+            if not ids:
+                del self._ids[word]
+        if len(self.tree) - len(self._ids) > REBUILD_RATIO * len(self.tree):
+            self.tree = BKTree(self._ids)
+
+    def search(self, query, limit=10, accept=None):
+        """Return the ids of the best `limit` cars for a free-text make/model query, best first.
+
+        Every query word must be within tolerance() edits of some word of the car's make or model;
+        a car scores the sum of those distances, and ties go to the lower id. accept(car_id), if
+        given, filters the candidates before they are ranked.
+        """
+        terms = words(query)
+        if not terms:
+            return []
+
+        scores = None
+        for term in terms:
+            best = {}
+            for distance, word in self.tree.search(term, tolerance(term)):
+                for car_id in self._ids.get(word, ()):
+                    if distance < best.get(car_id, distance + 1):
+                        best[car_id] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {car_id: score + best[car_id] for car_id, score in scores.items() if car_id in best}
+            if not scores:
+                return []
+
+        ranked = ((score, car_id) for car_id, score in scores.items() if accept is None or accept(car_id))
+        return [car_id for _, car_id in heapq.nsmallest(limit, ranked)]
@@ -1,13 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import storage
+import admin_ops
 import models
+import search_utils
 from datetime import datetime
 
+#how many ranked cars a fuzzy search in the browse tab lists
+FUZZY_RESULTS = 50
+
 storage.ensure_data_directory()
 
 try:
-    storage.load_all_data()
+    storage.load_all_data(preload=False)
+    #cars held by expired reservations are released in the background
+    storage.start_reservation_sweeper()
 except Exception as e:
     print(f"Error loading data: {e}")
 
@@ -264,12 +271,13 @@ class CarsTab(tk.Frame):
                     available=1
                 )
                 
-                if storage.add_car(car):
-                    showroom = storage.get_showroom_by_id(showroom_id)
-                    showroom.add_car(car_id)
-                    storage.save_showrooms()
-                    storage.push_admin_action(self.controller.current_user.id, "add", "car", car_id, f"{make} {model}")
-                    
+                with storage.transaction():
+                    added = storage.add_car(car)
+                    if added:
+                        storage.add_car_to_showroom(showroom_id, car_id)
+                        storage.push_admin_action(self.controller.current_user.id, "add", "car", car_id, f"{make} {model}")
+                
+                if added:
                     messagebox.showinfo("Success", "Car added successfully")
                     self.load_cars()
                     dialog.destroy()
@@ -320,7 +328,14 @@ class CarsTab(tk.Frame):
                 year = int(year_entry.get())
                 price = float(price_entry.get())
                 
-                if storage.update_car(car_id, make=make, model=model, year=year, price=price):
+                before = car.to_csv_row()
+                with storage.transaction():
+                    updated = storage.update_car(car_id, make=make, model=model, year=year, price=price)
+                    if updated:
+                        storage.push_admin_action(self.controller.current_user.id, "update", "car", car_id,
+                                                  f"{make} {model}", before)
+                
+                if updated:
                     messagebox.showinfo("Success", "Car updated successfully")
                     self.load_cars()
                     dialog.destroy()
@@ -340,8 +355,14 @@ class CarsTab(tk.Frame):
         car_id = int(item['values'][0])
         
         if messagebox.askyesno("Confirm", f"Delete car ID {car_id}?"):
-            if storage.delete_car(car_id):
-                storage.push_admin_action(self.controller.current_user.id, "delete", "car", car_id, "Deleted Car")
+            car = storage.get_car_by_id(car_id)
+            before = car.to_csv_row() if car else ""
+            with storage.transaction():
+                deleted = storage.delete_car(car_id)
+                if deleted:
+                    storage.push_admin_action(self.controller.current_user.id, "delete", "car", car_id, "Deleted Car", before)
+            
+            if deleted:
                 self.load_cars()
             else:
                 messagebox.showerror("Error", "Failed to delete car")
@@ -379,6 +400,11 @@ class ShowroomsTab(tk.Frame):
         tk.Button(toolbar, text="Refresh", command=self.load_showrooms).pack(side="left", padx=5)
         tk.Button(toolbar, text="Add Showroom", command=self.add_showroom_dialog).pack(side="left", padx=5)
         
+        tk.Label(toolbar, text="Name:").pack(side="left", padx=2)
+        self.name_var = tk.StringVar()
+        tk.Entry(toolbar, textvariable=self.name_var, width=20).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Search", command=self.load_showrooms).pack(side="left", padx=5)
+        
         columns = ("ID", "Name", "Location")
         self.tree = ttk.Treeview(self, columns=columns, show="headings")
         for col in columns:
@@ -391,7 +417,8 @@ class ShowroomsTab(tk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        showrooms = storage.get_all_showrooms()
+        name = self.name_var.get().strip()
+        showrooms = search_utils.search_showrooms(filters={"name": name}) if name else storage.get_all_showrooms()
         for s in showrooms:
             self.tree.insert("", "end", values=(s.id, s.name, s.location))
 
@@ -437,6 +464,11 @@ class GaragesTab(tk.Frame):
         tk.Button(toolbar, text="Refresh", command=self.load_garages).pack(side="left", padx=5)
         tk.Button(toolbar, text="Add Garage", command=self.add_garage_dialog).pack(side="left", padx=5)
         
+        tk.Label(toolbar, text="Name:").pack(side="left", padx=2)
+        self.name_var = tk.StringVar()
+        tk.Entry(toolbar, textvariable=self.name_var, width=20).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Search", command=self.load_garages).pack(side="left", padx=5)
+        
         columns = ("ID", "Name", "Location", "Phone")
         self.tree = ttk.Treeview(self, columns=columns, show="headings")
         for col in columns:
@@ -449,7 +481,8 @@ class GaragesTab(tk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        garages = storage.get_all_garages()
+        name = self.name_var.get().strip()
+        garages = search_utils.search_garages(filters={"name": name}) if name else storage.get_all_garages()
         for g in garages:
             self.tree.insert("", "end", values=(g.id, g.name, g.location, g.phone))
 
@@ -495,6 +528,11 @@ class ServicesTab(tk.Frame):
         tk.Button(toolbar, text="Refresh", command=self.load_services).pack(side="left", padx=5)
         tk.Button(toolbar, text="Add Service", command=self.add_service_dialog).pack(side="left", padx=5)
         
+        tk.Label(toolbar, text="Name:").pack(side="left", padx=2)
+        self.name_var = tk.StringVar()
+        tk.Entry(toolbar, textvariable=self.name_var, width=20).pack(side="left", padx=2)
+        tk.Button(toolbar, text="Search", command=self.load_services).pack(side="left", padx=5)
+        
         columns = ("ID", "Name", "Price")
         self.tree = ttk.Treeview(self, columns=columns, show="headings")
         for col in columns:
@@ -507,7 +545,8 @@ class ServicesTab(tk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        services = storage.get_all_services()
+        name = self.name_var.get().strip()
+        services = search_utils.search_services(name=name) if name else storage.get_all_services()
         for s in services:
             self.tree.insert("", "end", values=(s.id, s.name, f"${s.price:,.2f}"))
 
@@ -575,6 +614,7 @@ class ServiceQueueTab(tk.Frame):
         toolbar.pack(fill="x", padx=5, pady=5)
         tk.Button(toolbar, text="Refresh", command=self.load_queue).pack(side="left", padx=5)
         tk.Button(toolbar, text="Process Next", command=self.process_next).pack(side="left", padx=5)
+        tk.Button(toolbar, text="Process Batch (serial)", command=self.process_batch).pack(side="left", padx=5)
         
         columns = ("Req ID", "Customer", "Service", "Garage", "Status")
         self.tree = ttk.Treeview(self, columns=columns, show="headings")
@@ -588,7 +628,7 @@ class ServiceQueueTab(tk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        queue = storage.service_request_queue
+        queue = storage.get_all_service_requests()
         for req in queue:
             customer = storage.get_customer_by_id(req['customer_id'])
             service = storage.get_service_by_id(req['service_id'])
@@ -601,27 +641,39 @@ class ServiceQueueTab(tk.Frame):
             self.tree.insert("", "end", values=(req['request_id'], cust_name, serv_name, garage_name, req['status']))
 
     def process_next(self):
-        request = storage.dequeue_service_request()
+        with storage.transaction():
+            request = storage.dequeue_service_request()
+            if request:
+                # Create service process
+                process_id = storage.next_id_for("service_process")
+                service = storage.get_service_by_id(request['service_id'])
+                
+                service_process = models.ServiceProcess(
+                    process_id=process_id,
+                    customer_id=request['customer_id'],
+                    date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    amount=service.price if service else 0,
+                    service_id=request['service_id'],
+                    garage_id=request['garage_id']
+                )
+                
+                storage.add_service_process(service_process)
+        
         if request:
-            # Create service process
-            process_id = storage.next_id_for("service_process")
-            service = storage.get_service_by_id(request['service_id'])
-            
-            service_process = models.ServiceProcess(
-                process_id=process_id,
-                customer_id=request['customer_id'],
-                date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                amount=service.price if service else 0,
-                service_id=request['service_id'],
-                garage_id=request['garage_id']
-            )
-            
-            storage.add_service_process(service_process)
             messagebox.showinfo("Success", "Service request processed!")
             self.load_queue()
         else:
             messagebox.showinfo("Info", "Queue is empty")
 
+    def process_batch(self):
+        summary = admin_ops.process_service_requests(batch_size=100)
+        if summary['processed']:
+            messagebox.showinfo("Success", f"Processed {summary['processed']} service requests "
+                                           f"(${summary['total_amount']:,.2f}). {summary['remaining']} remaining.")
+            self.load_queue()
+        else:
+            messagebox.showinfo("Info", "Queue is empty")
+
 class StatisticsTab(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -646,8 +698,12 @@ class StatisticsTab(tk.Frame):
         service_processes = storage.get_all_service_processes()
         reservations = storage.get_all_reservations()
         
-        total_buy_rent = sum(p.amount for p in buy_rent)
-        total_service = sum(p.amount for p in service_processes)
+        revenue = storage.get_revenue_stats()
+        by_month = "\n".join(f"  {month}: ${amount:,.2f}" for month, amount in revenue['by_month'].items())
+        by_showroom = "\n".join(f"  Showroom #{showroom_id}: ${amount:,.2f}"
+                                for showroom_id, amount in sorted(revenue['by_showroom'].items()))
+        by_garage = "\n".join(f"  Garage #{garage_id}: ${amount:,.2f}"
+                              for garage_id, amount in sorted(revenue['by_garage'].items()))
         
         stats = f"""
 SYSTEM STATISTICS
@@ -672,9 +728,18 @@ Reservations:
   Active Reservations: {len(reservations)}
 
 Revenue:
-  Car Sales/Rentals: ${total_buy_rent:,.2f}
-  Services: ${total_service:,.2f}
-  Total: ${(total_buy_rent + total_service):,.2f}
+  Car Sales/Rentals: ${revenue['buy_rent_total']:,.2f}
+  Services: ${revenue['service_total']:,.2f}
+  Total: ${revenue['total']:,.2f}
+
+Revenue by Month:
+{by_month}
+
+Revenue by Showroom:
+{by_showroom}
+
+Revenue by Garage:
+{by_garage}
 """
         self.text.insert("end", stats)
 
@@ -728,6 +793,9 @@ class BrowseCarsTab(tk.Frame):
         self.price_var = tk.StringVar()
         tk.Entry(search_frame, textvariable=self.price_var, width=10).pack(side="left", padx=2)
         
+        self.fuzzy_var = tk.BooleanVar()
+        tk.Checkbutton(search_frame, text="Fuzzy", variable=self.fuzzy_var).pack(side="left", padx=2)
+        
         tk.Button(search_frame, text="Search", command=self.search_cars).pack(side="left", padx=10)
         tk.Button(search_frame, text="Reset", command=self.reset_search).pack(side="left")
         
@@ -775,8 +843,17 @@ class BrowseCarsTab(tk.Frame):
             except ValueError:
                 pass
         
-        all_cars = storage.get_all_cars()
-        filtered = [c for c in all_cars if c.matches_filter(filters)]
+        if self.fuzzy_var.get() and (make or model):
+            #typo-tolerant: make and model are one free-text query, best matches first
+            query = f"{make} {model}".strip()
+            filters.pop('make', None)
+            filters.pop('model', None)
+            filtered = search_utils.fuzzy_car_search(query, FUZZY_RESULTS, filters)
+        elif 'max_price' in filters:
+            #cheapest first, straight off the price index
+            filtered = storage.cars_in_price_range(hi=filters.pop('max_price'), filters=filters)
+        else:
+            filtered = storage.search_cars(filters)
         
         self.load_cars(filtered)
 
@@ -784,6 +861,7 @@ class BrowseCarsTab(tk.Frame):
         self.make_var.set("")
         self.model_var.set("")
         self.price_var.set("")
+        self.fuzzy_var.set(False)
         self.load_cars()
 
     def buy_car(self):
@@ -807,9 +885,12 @@ class BrowseCarsTab(tk.Frame):
                 type="buy"
             )
             
-            if storage.add_buy_rent_process(process):
-                car.available = 0
-                storage.save_cars()
+            with storage.transaction():
+                purchased = storage.add_buy_rent_process(process)
+                if purchased:
+                    storage.update_car(car_id, available=0)
+            
+            if purchased:
                 messagebox.showinfo("Success", "Car purchased successfully!")
                 self.load_cars()
             else:
@@ -848,21 +929,23 @@ class BrowseCarsTab(tk.Frame):
                         type="rent"
                     )
                     
-                    if storage.add_buy_rent_process(process):
-                        car.available = 0
-                        storage.save_cars()
-                        
-                        # Add reservation record
-                        res_id = storage.next_id_for("reservation")
-                        res = models.Reservation(
-                            reservation_id=res_id,
-                            customer_id=self.controller.current_user.id,
-                            car_id=car_id,
-                            start_time=datetime.now().strftime("%Y-%m-%d"),
-                            expiry_time="TBD"
-                        )
-                        storage.add_reservation(res)
-                        
+                    with storage.transaction():
+                        rented = storage.add_buy_rent_process(process)
+                        if rented:
+                            storage.update_car(car_id, available=0)
+                            
+                            # Add reservation record
+                            res_id = storage.next_id_for("reservation")
+                            res = models.Reservation(
+                                reservation_id=res_id,
+                                customer_id=self.controller.current_user.id,
+                                car_id=car_id,
+                                start_time=datetime.now().strftime("%Y-%m-%d"),
+                                expiry_time="TBD"
+                            )
+                            storage.add_reservation(res)
+                    
+                    if rented:
                         messagebox.showinfo("Success", "Car rented successfully!")
                         self.load_cars()
                         dialog.destroy()
@@ -960,13 +1043,14 @@ class ServiceRequestsTab(tk.Frame):
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        queue = storage.service_request_queue
+        queue = storage.get_all_service_requests()
         my_reqs = [r for r in queue if r['customer_id'] == self.controller.current_user.id]
         
+        positions = storage.get_queue_positions()
         for req in my_reqs:
             service = storage.get_service_by_id(req['service_id'])
             garage = storage.get_garage_by_id(req['garage_id'])
-            position = queue.index(req) + 1
+            position = positions.get(req['request_id'])
             
             serv_name = service.name if service else f"ID {req['service_id']}"
             garage_name = garage.name if garage else f"ID {req['garage_id']}"
@@ -41,16 +41,17 @@ def admin_menu(admin):
         print("11. Add New Service")
         print("12. View Service Request Queue")
         print("13. Process Next Service Request")
-        print("14. View Admin Action Stack")
-        print("15. Undo Last Action")
-        print("16. View All Reservations")
-        print("17. Clean Expired Reservations")
-        print("18. View Statistics")
-        print("19. Save All Data")
-        print("20. Logout")
+        print("14. Process Service Request Batch (serial)")
+        print("15. View Admin Action Stack")
+        print("16. Undo Last Action")
+        print("17. View All Reservations")
+        print("18. Clean Expired Reservations")
+        print("19. View Statistics")
+        print("20. Save All Data")
+        print("21. Logout")
         print("=" * 60)
         
-        choice = input("Enter your choice (1-20): ").strip()
+        choice = input("Enter your choice (1-21): ").strip()
         
         try:
             if choice == '1':
@@ -60,7 +61,7 @@ def admin_menu(admin):
                 admin_ops.add_new_car(admin.id)
             
             elif choice == '3':
-                admin_ops.update_car_details()
+                admin_ops.update_car_details(admin.id)
             
             elif choice == '4':
                 admin_ops.delete_car_admin(admin.id)
@@ -93,29 +94,32 @@ def admin_menu(admin):
                 admin_ops.process_next_service_request()
             
             elif choice == '14':
-                admin_ops.view_admin_actions()
+                admin_ops.process_service_request_batch()
             
             elif choice == '15':
-                admin_ops.undo_last_action()
+                admin_ops.view_admin_actions()
             
             elif choice == '16':
-                admin_ops.view_all_reservations()
+                admin_ops.undo_last_action()
             
             elif choice == '17':
-                storage.clean_expired_reservations()
+                admin_ops.view_all_reservations()
             
             elif choice == '18':
-                admin_ops.view_system_statistics()
+                storage.clean_expired_reservations()
             
             elif choice == '19':
-                storage.save_all_data()
+                admin_ops.view_system_statistics()
             
             elif choice == '20':
+                storage.save_all_data()
+            
+            elif choice == '21':
                 print("\n Logging out from admin panel")
                 break
             
             else:
-                print("\n Wrong choice please enter a number between 1 and 20.")
+                print("\n Wrong choice please enter a number between 1 and 21.")
         
         except ValueError as e:
             print(f"\n Invalid input: {e}")
@@ -164,7 +168,9 @@ if __name__ == "__main__":
         print("INITIALIZING CAR SHOWROOM MANAGEMENT SYSTEM")
         print("=" * 60)
         
-        storage.load_all_data()
+        storage.load_all_data(preload=False)
+        #cars held by expired reservations are released in the background
+        storage.start_reservation_sweeper()
         
         print("\n System initialized successfully")
         
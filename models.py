@@ -1,6 +1,57 @@
+import time
+from datetime import datetime
+
+
+#every model declares __slots__: history tables hold millions of rows, and a per-instance
+#__dict__ would cost more than the fields themselves (see benchmarks/model_memory.py)
+
+#timestamps are held as epoch seconds and written back to csv in the formats below:
+#a value with no time of day as a plain date, a missing one as "TBD"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+LEGACY_TIMESTAMP_FORMATS = (TIMESTAMP_FORMAT, "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", DATE_FORMAT)
+
+
+def parse_timestamp(value):
+    """Parse a timestamp (any legacy csv format, or epoch seconds) into epoch seconds, or None for "TBD"."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip()
+    if not text or text.upper() == "TBD":
+        return None
+    if text.isdigit():
+        return int(text)
+    #fast path: fromisoformat reads every legacy format above (and is ~20x cheaper than strptime)
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        pass
+    for fmt in LEGACY_TIMESTAMP_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid timestamp: {value}")
+
+
+def format_timestamp(timestamp):
+    """Format epoch seconds the way the csv files store them."""
+    if timestamp is None:
+        return "TBD"
+    moment = datetime.fromtimestamp(timestamp)
+    if moment.hour == moment.minute == moment.second == 0:
+        return moment.strftime(DATE_FORMAT)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
 # Admin
 #   id, username, password
 class Admin:
+    __slots__ = ("id", "username", "password")
+
     def __init__(self, id: int, username: str, password: str):
         self.id = int(id)
         self.username = str(username)
@@ -38,6 +89,8 @@ class Admin:
 # Customer
 #   id, username, password, phone
 class Customer():
+    __slots__ = ("id", "username", "password", "phone")
+
     def __init__(self, id: int, username: str, password: str, phone: str):
         self.id = int(id)
         self.username = str(username)
@@ -78,6 +131,8 @@ class Customer():
 # Car
 #   id, make, model, year, price, installment, showroom_id, available
 class Car:
+    __slots__ = ("id", "make", "model", "year", "price", "installment", "showroom_id", "available")
+
     def __init__(self, id: int, make: str, model: str, year: int, price: float, installment: int, showroom_id: int,
                  available: int):
         self.id = int(id)
@@ -146,6 +201,10 @@ class Car:
             if self.year != int(filters["year"]):
                 return False
 
+        if "showroom_id" in filters and filters["showroom_id"] is not None:
+            if self.showroom_id != int(filters["showroom_id"]):
+                return False
+
         if "min_price" in filters and filters["min_price"] is not None:
             if self.price < float(filters["min_price"]):
                 return False
@@ -195,6 +254,8 @@ class Car:
 # Showroom
 #   id, name, location, phone, car_ids
 class Showroom:
+    __slots__ = ("id", "name", "location", "phone", "car_ids")
+
     def __init__(self, id: int, name: str, location: str, phone: str, car_ids):
         self.id = int(id)
         self.name = str(name)
@@ -285,6 +346,8 @@ class Showroom:
 # Garage
 #   id, name, location, phone, service_ids
 class Garage:
+    __slots__ = ("id", "name", "location", "phone", "service_ids")
+
     def __init__(self, id: int, name: str, location: str, phone: str, service_ids):
         self.id = int(id)
         self.name = str(name)
@@ -371,6 +434,8 @@ class Garage:
 # Service
 #   id, name, price
 class Service:
+    __slots__ = ("id", "name", "price")
+
     def __init__(self, id: int, name: str, price: float):
         self.id = int(id)
         self.name = str(name)
@@ -422,14 +487,24 @@ class Service:
 # BuyRentProcess
 #   process_id, customer_id, date, amount, car_id, type
 class BuyRentProcess:
+    __slots__ = ("process_id", "customer_id", "date_ts", "amount", "car_id", "type")
+
     def __init__(self, process_id: int, customer_id: int, date: str, amount: float, car_id: int, type: str):
         self.process_id = int(process_id)
         self.customer_id = int(customer_id)
-        self.date = str(date)
+        self.date_ts = parse_timestamp(date)
         self.amount = float(amount)
         self.car_id = int(car_id)
         self.type = str(type)
 
+    @property
+    def date(self):
+        return format_timestamp(self.date_ts)
+
+    @date.setter
+    def date(self, value):
+        self.date_ts = parse_timestamp(value)
+
     def to_csv_row(self):
         return f"{self.process_id},{self.customer_id},{self.date},{self.amount},{self.car_id},{self.type}"
 
@@ -471,14 +546,24 @@ class BuyRentProcess:
 # ServiceProcess
 #   process_id, customer_id, date, amount, service_id, garage_id
 class ServiceProcess:
+    __slots__ = ("process_id", "customer_id", "date_ts", "amount", "service_id", "garage_id")
+
     def __init__(self, process_id: int, customer_id: int, date: str, amount: float, service_id: int, garage_id: int):
         self.process_id = int(process_id)
         self.customer_id = int(customer_id)
-        self.date = str(date)
+        self.date_ts = parse_timestamp(date)
         self.amount = float(amount)
         self.service_id = int(service_id)
         self.garage_id = int(garage_id)
 
+    @property
+    def date(self):
+        return format_timestamp(self.date_ts)
+
+    @date.setter
+    def date(self, value):
+        self.date_ts = parse_timestamp(value)
+
     def to_csv_row(self):
         return f"{self.process_id},{self.customer_id},{self.date},{self.amount},{self.service_id},{self.garage_id}"
 
@@ -518,12 +603,30 @@ class ServiceProcess:
 # Reservation
 #   reservation_id, customer_id, car_id, start_time, expiry_time
 class Reservation:
+    __slots__ = ("reservation_id", "customer_id", "car_id", "start_ts", "expiry_ts")
+
     def __init__(self, reservation_id: int, customer_id: int, car_id: int, start_time: str, expiry_time: str):
         self.reservation_id = int(reservation_id)
         self.customer_id = int(customer_id)
         self.car_id = int(car_id)
-        self.start_time = str(start_time)
-        self.expiry_time = str(expiry_time)
+        self.start_ts = parse_timestamp(start_time)
+        self.expiry_ts = parse_timestamp(expiry_time)
+
+    @property
+    def start_time(self):
+        return format_timestamp(self.start_ts)
+
+    @start_time.setter
+    def start_time(self, value):
+        self.start_ts = parse_timestamp(value)
+
+    @property
+    def expiry_time(self):
+        return format_timestamp(self.expiry_ts)
+
+    @expiry_time.setter
+    def expiry_time(self, value):
+        self.expiry_ts = parse_timestamp(value)
 
     def to_csv_row(self):
         return f"{self.reservation_id},{self.customer_id},{self.car_id},{self.start_time},{self.expiry_time}"
@@ -542,6 +645,12 @@ class Reservation:
 
         return cls(reservation_id, customer_id, car_id, start_time, expiry_time)
 
+    def is_expired(self, now=None):
+        """Return True if the reservation expired at or before now (epoch seconds, default: the current time)."""
+        if self.expiry_ts is None:
+            return False
+        return self.expiry_ts <= (time.time() if now is None else now)
+
     def to_dict(self):
         return {
             "reservation_id": self.reservation_id,
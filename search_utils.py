@@ -1,44 +1,98 @@
 from models import Car, Showroom, Garage, Service
 import storage
 
+#compiled filters: a filter dict is turned once into a predicate holding only its active
+#clauses, with the values already normalized (lowercased, int, float), so testing a row does
+#no dict lookups or conversions; the semantics are those of the models' matches_filter
+def _join(first, second, third=None):
+    if third is None:
+        return lambda row: first(row) and second(row)
+    return lambda row: first(row) and second(row) and third(row)
+
+def _combine(checks):
+    """Join clause checks into one predicate, three per call so a row pays few nested calls."""
+    if not checks:
+        return lambda row: True
+    while len(checks) > 1:
+        checks = [_join(*checks[:3])] + checks[3:]
+    return checks[0]
+
+def _text_check(field, text):
+    """Return a case-insensitive substring check of a car's make or model."""
+    text = text.lower()
+    if field == "make":
+        return lambda row: text in row.make.lower()
+    return lambda row: text in row.model.lower()
+
+def compile_car_filter(filters):
+    """Return a predicate equivalent to Car.matches_filter(filters)."""
+    #the cheap comparisons go first so most rows are rejected before any lowercasing
+    checks = []
+    if filters.get("year") is not None:
+        year = int(filters["year"])
+        checks.append(lambda row: row.year == year)
+    if filters.get("showroom_id") is not None:
+        showroom_id = int(filters["showroom_id"])
+        checks.append(lambda row: row.showroom_id == showroom_id)
+    low = float(filters["min_price"]) if filters.get("min_price") is not None else None
+    high = float(filters["max_price"]) if filters.get("max_price") is not None else None
+    if low is not None and high is not None:
+        checks.append(lambda row: low <= row.price <= high)
+    elif low is not None:
+        checks.append(lambda row: row.price >= low)
+    elif high is not None:
+        checks.append(lambda row: row.price <= high)
+    if filters.get("available") is not None:
+        val = filters["available"]
+        val = bool(int(val)) if isinstance(val, str) else bool(val)
+        checks.append((lambda row: row.available) if val else (lambda row: not row.available))
+    checks.extend(_text_check(field, filters[field]) for field in ("make", "model") if filters.get(field))
+    return _combine(checks)
+
 def search_cars(cars_list, filters):
-    filtered_cars = []
-    for car in cars_list:
-        if car.matches_filter(filters):
-            filtered_cars.append(car)
-    return filtered_cars
-
-def search_showrooms(showrooms_list, filters):
-    filtered_showrooms = []
-    for showroom in showrooms_list:
-        if showroom.matches_filter(filters):
-            filtered_showrooms.append(showroom)
-    return filtered_showrooms
-
-def search_garages(garages_list, filters):
-    filtered_garages = []
-    for garage in garages_list:
-        if garage.matches_filter(filters):
-            filtered_garages.append(garage)
-    return filtered_garages
-
-def search_services(services_list, name=None):
-    return [s for s in services_list if s.matches_filter(name)]
+    return list(filter(compile_car_filter(filters), cars_list))
+
+#without a list, showrooms, garages and services are searched by storage, through its trigram
+#indexes (or the database), instead of testing every row here; a given list is filtered as before
+def search_showrooms(showrooms_list=None, filters=None):
+    if showrooms_list is None:
+        return storage.search_showrooms(filters)
+    return [showroom for showroom in showrooms_list if showroom.matches_filter(filters or {})]
+
+def search_garages(garages_list=None, filters=None):
+    if garages_list is None:
+        return storage.search_garages(filters)
+    return [garage for garage in garages_list if garage.matches_filter(filters or {})]
+
+def search_services(services_list=None, name=None):
+    #Service.matches_filter takes a filter dict, not a bare name
+    filters = {"name": name} if name else None
+    if services_list is None:
+        return storage.search_services(filters)
+    return [service for service in services_list if service.matches_filter(filters or {})]
 
 def search_cars_in_showroom(showroom, all_cars, filters):
-    cars_in_showroom = []
-    for car in all_cars :
-        if car.id in showroom.car_ids:
-            if car.matches_filter(filters):
-                cars_in_showroom.append(car)
-    return cars_in_showroom
+    car_ids = set(showroom.car_ids)
+    matches = compile_car_filter(filters)
+    return [car for car in all_cars if car.id in car_ids and matches(car)]
 
 def general_car_search(filters):
     """General car search across all cars with filters."""
-    all_cars = storage.get_all_cars()
+    available_only = filters.get('available_only')
+    filters = {k: v for k, v in filters.items() if k != 'available_only'}
+    if available_only and filters.get('available') is None:
+        #lets storage narrow the search to the available set up front
+        filters['available'] = True
     
-    if filters.get('available_only'):
-        all_cars = [car for car in all_cars if car.available]
-        filters = {k: v for k, v in filters.items() if k != 'available_only'}
-    
-    return search_cars(all_cars, filters)
\ No newline at end of file
+    #storage plans the filters over its car indexes, or scans (vectorized when numpy is available)
+    results = storage.search_cars(filters)
+    if available_only:
+        results = [car for car in results if car.available]
+    return results
+
+def fuzzy_car_search(query, limit=10, filters=None):
+    """Typo-tolerant make/model search ("mercedez", "toyota corola"), best matches first."""
+    filters = dict(filters or {})
+    if filters.pop('available_only', None) and filters.get('available') is None:
+        filters['available'] = True
+    return storage.fuzzy_search_cars(query, limit, filters)
@@ -0,0 +1,845 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import fuzzy
+from models import (
+    Customer, Car, Showroom, Garage, Service,
+    BuyRentProcess, ServiceProcess, Reservation
+)
+
+#SQLite storage backend
+#   Serves the entity and history part of the storage API from an indexed
+#   database instead of module-level dicts. The service request queue and
+#   the admin action stack stay in memory and keep using storage's csv files.
+
+#table -> (primary key, columns, model class)
+SCHEMA = {
+    "cars": ("id", ["id", "make", "model", "year", "price", "installment", "showroom_id", "available"], Car),
+    "customers": ("id", ["id", "username", "password", "phone"], Customer),
+    "showrooms": ("id", ["id", "name", "location", "phone", "car_ids"], Showroom),
+    "garages": ("id", ["id", "name", "location", "phone", "service_ids"], Garage),
+    "services": ("id", ["id", "name", "price"], Service),
+    "buy_rent_process": ("process_id", ["process_id", "customer_id", "date", "amount", "car_id", "type"], BuyRentProcess),
+    "service_process": ("process_id", ["process_id", "customer_id", "date", "amount", "service_id", "garage_id"], ServiceProcess),
+    "reservations": ("reservation_id", ["reservation_id", "customer_id", "car_id", "start_time", "expiry_time"], Reservation),
+}
+
+#history tables allow duplicate process ids, so they are keyed by rowid
+HISTORY_TABLES = ("buy_rent_process", "service_process")
+
+DDL = """
+CREATE TABLE IF NOT EXISTS cars (
+    id INTEGER PRIMARY KEY, make TEXT, model TEXT, year INTEGER, price REAL,
+    installment INTEGER, showroom_id INTEGER, available INTEGER
+);
+CREATE TABLE IF NOT EXISTS customers (id INTEGER PRIMARY KEY, username TEXT, password TEXT, phone TEXT);
+CREATE TABLE IF NOT EXISTS showrooms (id INTEGER PRIMARY KEY, name TEXT, location TEXT, phone TEXT, car_ids TEXT);
+CREATE TABLE IF NOT EXISTS garages (id INTEGER PRIMARY KEY, name TEXT, location TEXT, phone TEXT, service_ids TEXT);
+CREATE TABLE IF NOT EXISTS services (id INTEGER PRIMARY KEY, name TEXT, price REAL);
+CREATE TABLE IF NOT EXISTS buy_rent_process (
+    row INTEGER PRIMARY KEY, process_id INTEGER, customer_id INTEGER, date TEXT,
+    amount REAL, car_id INTEGER, type TEXT
+);
+CREATE TABLE IF NOT EXISTS service_process (
+    row INTEGER PRIMARY KEY, process_id INTEGER, customer_id INTEGER, date TEXT,
+    amount REAL, service_id INTEGER, garage_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    reservation_id INTEGER PRIMARY KEY, customer_id INTEGER, car_id INTEGER,
+    start_time TEXT, expiry_time TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE INDEX IF NOT EXISTS idx_cars_make ON cars (make COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_cars_model ON cars (model COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_cars_year ON cars (year);
+CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_cars_showroom ON cars (showroom_id);
+CREATE INDEX IF NOT EXISTS idx_cars_available_price ON cars (available, price);
+CREATE INDEX IF NOT EXISTS idx_cars_price ON cars (price, id);
+CREATE INDEX IF NOT EXISTS idx_customers_username ON customers (username COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_buy_rent_customer ON buy_rent_process (customer_id);
+CREATE INDEX IF NOT EXISTS idx_buy_rent_process_id ON buy_rent_process (process_id);
+CREATE INDEX IF NOT EXISTS idx_service_process_customer ON service_process (customer_id);
+CREATE INDEX IF NOT EXISTS idx_service_process_id ON service_process (process_id);
+CREATE INDEX IF NOT EXISTS idx_reservations_customer ON reservations (customer_id);
+CREATE INDEX IF NOT EXISTS idx_reservations_expiry ON reservations (expiry_time);
+"""
+
+#functions installed into storage's namespace
+__all__ = [
+    "load_all_data", "save_all_data", "compact_journals", "transaction", "in_transaction",
+    "save_cars", "save_customers", "save_showrooms", "save_garages", "save_services",
+    "save_buy_rent_processes", "save_service_processes", "save_reservations",
+    "next_id_for", "clean_expired_reservations",
+    "get_car_by_id", "get_customer_by_id", "get_showroom_by_id", "get_garage_by_id",
+    "get_service_by_id", "get_reservation_by_id",
+    "get_all_cars", "get_all_customers", "get_all_showrooms", "get_all_garages",
+    "get_all_services", "get_all_reservations", "get_all_buy_rent_processes",
+    "get_all_service_processes", "iter_buy_rent_history", "iter_service_history",
+    "get_next_car_id", "get_next_customer_id", "get_next_showroom_id", "get_next_garage_id",
+    "get_next_service_id", "get_next_reservation_id", "get_next_buy_rent_process_id",
+    "get_next_service_process_id",
+    "add_car", "update_car", "delete_car", "restore_entity",
+    "add_customer", "update_customer", "delete_customer",
+    "add_showroom", "update_showroom", "delete_showroom", "add_car_to_showroom",
+    "add_garage", "update_garage", "delete_garage",
+    "add_service", "update_service", "delete_service",
+    "add_reservation", "delete_reservation",
+    "add_buy_rent_process", "add_service_process",
+    "search_cars", "cars_in_price_range", "iter_cars_by_price", "fuzzy_search_cars",
+    "search_showrooms", "search_garages", "search_services", "get_customer_by_username", "get_cars_in_showroom", "get_services_in_garage",
+    "get_customer_reservations", "get_customer_buy_rent_history", "is_buyer", "get_customer_service_history",
+    "get_revenue_stats",
+]
+
+#one connection per thread (the reservation sweeper gets its own), so a transaction opened in one
+#thread is never joined by another; storage's transaction lock serializes the writers
+_local = threading.local()
+_db_path = None
+
+#tables whose sequence row is known to exist
+_seeded = set()
+
+#FuzzyCarIndex over the cars table, built on the first fuzzy search and then kept current by this
+#process's car writes (like storage's derived indexes); dropped when a transaction rolls back
+_fuzzy_index = None
+_fuzzy_lock = threading.RLock()
+
+#rows fetched per "id IN (...)" query, below SQLite's bound-parameter limit
+ID_BATCH_SIZE = 500
+
+#storage's own (csv) functions, captured by install()
+_csv = {}
+
+
+def install(namespace):
+    """Replace the csv-backed functions in storage's namespace with the sqlite ones."""
+    global _db_path
+    _csv.update(namespace)
+    _db_path = namespace["SQLITE_PATH"]
+    for name in __all__:
+        namespace[name] = globals()[name]
+
+
+def connect():
+    """Open (once per thread) the database connection in WAL mode and create the schema."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(_db_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(DDL)
+    return conn
+
+
+def _row_values(obj, columns):
+    """Extract column values from a model object in schema order."""
+    values = []
+    for column in columns:
+        value = getattr(obj, column)
+        if isinstance(value, list):
+            value = ";".join(str(x) for x in value)
+        elif isinstance(value, bool):
+            value = int(value)
+        values.append(value)
+    return values
+
+
+def _fetch_one(table, key):
+    """Fetch one model object by primary key, or None."""
+    pk, columns, cls = SCHEMA[table]
+    row = connect().execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE {pk} = ?", (int(key),)
+    ).fetchone()
+    return cls(*row) if row else None
+
+
+def _iter_all(table, where="", params=()):
+    """Yield model objects of a table one row at a time, optionally filtered by a WHERE clause."""
+    _, columns, cls = SCHEMA[table]
+    order = "row" if table in HISTORY_TABLES else SCHEMA[table][0]
+    sql = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY {order}"
+    for row in connect().execute(sql, params):
+        yield cls(*row)
+
+
+def _fetch_all(table, where="", params=()):
+    """Fetch model objects of a table, optionally filtered by a WHERE clause."""
+    return list(_iter_all(table, where, params))
+
+
+def _insert(table, obj, replace=False):
+    """Insert a model object, returning False if its key already exists."""
+    _, columns, _ = SCHEMA[table]
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    try:
+        connect().execute(
+            f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            _row_values(obj, columns),
+        )
+    except sqlite3.IntegrityError:
+        return False
+    #keep the sequence past ids assigned without it
+    connect().execute("UPDATE sequences SET last_id = MAX(last_id, ?) WHERE name = ?",
+                      (getattr(obj, SCHEMA[table][0]), table))
+    return True
+
+
+def _delete(table, key):
+    """Delete a row by primary key, returning whether it existed."""
+    pk = SCHEMA[table][0]
+    return connect().execute(f"DELETE FROM {table} WHERE {pk} = ?", (int(key),)).rowcount > 0
+
+
+def _next_id(table):
+    """Allocate the next id from the table's persistent sequence, seeding it from MAX(primary key) once."""
+    conn = connect()
+    if table not in _seeded:
+        pk = SCHEMA[table][0]
+        conn.execute(f"INSERT OR IGNORE INTO sequences (name, last_id) "
+                     f"SELECT ?, COALESCE(MAX({pk}), 0) FROM {table}", (table,))
+        _seeded.add(table)
+    return conn.execute("UPDATE sequences SET last_id = last_id + 1 WHERE name = ? RETURNING last_id",
+                        (table,)).fetchone()[0]
+
+
+#load/save
+def _import_csv_data():
+    """Copy the csv tables into an empty database (first start on the sqlite backend)."""
+    conn = connect()
+    if conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone():
+        return False
+
+    print(f"Importing CSV data into {_db_path}...")
+    conn.execute("BEGIN")
+    for table, (_, columns, _) in SCHEMA.items():
+        container = _csv["_read_table"](table)
+        rows = container.values() if isinstance(container, dict) else container
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (_row_values(obj, columns) for obj in rows),
+        )
+        #those journals are now part of the database
+        _csv["_journal_counts"][table] = 0
+    conn.execute("INSERT INTO meta (key, value) VALUES ('imported', ?)",
+                 (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+    conn.execute("COMMIT")
+    return True
+
+
+def load_all_data(preload=True, parallel=False):
+    """Open the database (importing the CSVs on first use) and load the in-memory queue and stack.
+
+    Nothing is read from the database tables themselves, so startup does not grow with them.
+    With preload=False the queue and stack are loaded on first access instead.
+    parallel is accepted for compatibility: only the two small csv tables are read here.
+    """
+    _csv["ensure_data_directory"]()
+
+    connect()
+    _import_csv_data()
+
+    if not preload:
+        _csv["_loaded"].clear()
+        print("Data will be loaded on first access.")
+        return None
+
+    print("Loading all data...")
+
+    _csv["load_service_request_queue"]()
+    _csv["load_admin_action_stack"]()
+
+    #the database tables are not counted: COUNT(*) walks every row, and startup should not
+    print(f"Loaded: {_csv['get_queue_size']()} service requests, {_csv['get_stack_size']()} admin actions "
+          f"(the other tables are read from {_db_path} as needed)")
+
+    return None
+
+
+def _checkpoint():
+    """Fold the WAL file back into the database."""
+    connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+def save_all_data():
+    """Checkpoint the database and save the in-memory queue and stack."""
+    print("Saving all data...")
+
+    _checkpoint()
+    for table in ("service_request_queue", "admin_action_stack"):
+        if table in _csv["_loaded"]:
+            _csv["_save_table"](table)
+
+    print("All data saved successfully")
+
+
+def compact_journals(tables=None):
+    """Compact the queue and stack journals (the other tables live in the database)."""
+    tables = [t for t in (tables or _csv["TABLES"]) if t not in SCHEMA]
+    return _csv["compact_journals"](tables)
+
+
+#every write is committed as it happens, so the save_* functions only checkpoint
+def save_cars():
+    """Checkpoint the database (rows are committed as they are written)."""
+    _checkpoint()
+
+
+save_customers = save_showrooms = save_garages = save_services = save_cars
+save_buy_rent_processes = save_service_processes = save_reservations = save_cars
+
+
+@contextmanager
+def transaction():
+    """Run the block in one SQLite transaction (plus storage's transaction for the queue and stack)."""
+    conn = connect()
+    if conn.in_transaction:
+        yield
+        return
+
+    with _csv["transaction"]():
+        conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            #it may hold car writes that were just undone
+            _drop_fuzzy_index()
+            raise
+        conn.execute("COMMIT")
+
+
+def in_transaction():
+    """Return True while a storage.transaction() block is open in the calling thread."""
+    return connect().in_transaction
+
+
+#id management
+def next_id_for(entity_type):
+    """Generate the next unique ID for a given entity type."""
+    table = _csv["ENTITY_TABLES"].get(entity_type.lower())
+    if table is None:
+        raise ValueError(f"Unknown entity type: {entity_type}")
+    return _next_id(table)
+
+
+def get_next_car_id():
+    """Generate the next available car ID."""
+    return _next_id("cars")
+
+
+def get_next_customer_id():
+    """Generate the next available customer ID."""
+    return _next_id("customers")
+
+
+def get_next_showroom_id():
+    """Generate the next available showroom ID."""
+    return _next_id("showrooms")
+
+
+def get_next_garage_id():
+    """Generate the next available garage ID."""
+    return _next_id("garages")
+
+
+def get_next_service_id():
+    """Generate the next available service ID."""
+    return _next_id("services")
+
+
+def get_next_reservation_id():
+    """Generate the next available reservation ID."""
+    return _next_id("reservations")
+
+
+def get_next_buy_rent_process_id():
+    """Generate the next available buy/rent process ID."""
+    return _next_id("buy_rent_process")
+
+
+def get_next_service_process_id():
+    """Generate the next available service process ID."""
+    return _next_id("service_process")
+
+
+#reservation helpers
+def clean_expired_reservations(verbose=True):
+    """Remove expired reservations and make their cars available again (a range scan of the expiry index)."""
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    due = "FROM reservations WHERE expiry_time != 'TBD' AND expiry_time <= ?"
+
+    #nothing due: no transaction is opened (so other threads are not held up)
+    if not connect().execute(f"SELECT 1 {due} LIMIT 1", (current_time,)).fetchone():
+        return 0
+
+    with transaction():
+        expired = connect().execute(f"SELECT reservation_id, car_id {due}", (current_time,)).fetchall()
+        for reservation_id, car_id in expired:
+            _delete("reservations", reservation_id)
+            connect().execute("UPDATE cars SET available = 1 WHERE id = ?", (car_id,))
+
+    if expired and verbose:
+        print(f"Cleaned {len(expired)} expired reservation(s)")
+
+    return len(expired)
+
+
+#access helpers
+def get_car_by_id(car_id):
+    """Retrieve a car by its ID."""
+    return _fetch_one("cars", car_id)
+
+
+def get_customer_by_id(customer_id):
+    """Retrieve a customer by their ID."""
+    return _fetch_one("customers", customer_id)
+
+
+def get_showroom_by_id(showroom_id):
+    """Retrieve a showroom by its ID."""
+    return _fetch_one("showrooms", showroom_id)
+
+
+def get_garage_by_id(garage_id):
+    """Retrieve a garage by its ID."""
+    return _fetch_one("garages", garage_id)
+
+
+def get_service_by_id(service_id):
+    """Retrieve a service by its ID."""
+    return _fetch_one("services", service_id)
+
+
+def get_reservation_by_id(reservation_id):
+    """Retrieve a reservation by its ID."""
+    return _fetch_one("reservations", reservation_id)
+
+
+def get_all_cars():
+    """Return a list of all cars."""
+    return _fetch_all("cars")
+
+
+def get_all_customers():
+    """Return a list of all customers."""
+    return _fetch_all("customers")
+
+
+def get_all_showrooms():
+    """Return a list of all showrooms."""
+    return _fetch_all("showrooms")
+
+
+def get_all_garages():
+    """Return a list of all garages."""
+    return _fetch_all("garages")
+
+
+def get_all_services():
+    """Return a list of all services."""
+    return _fetch_all("services")
+
+
+def get_all_reservations():
+    """Return a list of all reservations."""
+    return _fetch_all("reservations")
+
+
+def get_all_buy_rent_processes():
+    """Return a list of all buy/rent processes."""
+    return _fetch_all("buy_rent_process")
+
+
+def get_all_service_processes():
+    """Return a list of all service processes."""
+    return _fetch_all("service_process")
+
+
+def iter_buy_rent_history():
+    """Yield every buy/rent process in order, streamed from the database cursor."""
+    return _iter_all("buy_rent_process")
+
+
+def iter_service_history():
+    """Yield every service process in order, streamed from the database cursor."""
+    return _iter_all("service_process")
+
+
+#crud helpers
+def _update(table, key, apply):
+    """Load a row, apply a change to the model object and write it back."""
+    obj = _fetch_one(table, key)
+    if not obj:
+        return False
+    apply(obj)
+    _insert(table, obj, replace=True)
+    return True
+
+
+def add_car(car_object):
+    """Add a new car to the system."""
+    if not _insert("cars", car_object):
+        return False
+    _index_car(car_object)
+    return True
+
+
+def update_car(car_id, **fields):
+    """Update an existing car's details."""
+    car = _fetch_one("cars", car_id)
+    if not car:
+        return False
+    car.update_details(**fields)
+    _insert("cars", car, replace=True)
+    _index_car(car)
+    return True
+
+
+def delete_car(car_id):
+    """Delete a car and unlink it from its showroom."""
+    car = get_car_by_id(car_id)
+    if not car:
+        return False
+
+    with transaction():
+        _update("showrooms", car.showroom_id, lambda showroom: showroom.remove_car(car.id))
+        _delete("cars", car.id)
+        _unindex_car(car.id)
+    return True
+
+
+def add_customer(customer_object):
+    """Add a new customer to the system."""
+    return _insert("customers", customer_object)
+
+
+def update_customer(customer_id, **fields):
+    """Update an existing customer's details."""
+    def apply(customer):
+        if 'username' in fields:
+            customer.username = fields['username']
+        if 'password' in fields:
+            customer.password = fields['password']
+        if 'phone' in fields:
+            customer.phone = int(fields['phone'])
+    return _update("customers", customer_id, apply)
+
+
+def delete_customer(customer_id):
+    """Delete a customer from the system."""
+    return _delete("customers", customer_id)
+
+
+def add_showroom(showroom_object):
+    """Add a new showroom to the system."""
+    return _insert("showrooms", showroom_object)
+
+
+def update_showroom(showroom_id, **fields):
+    """Update an existing showroom's details."""
+    return _update("showrooms", showroom_id, lambda showroom: showroom.update_details(**fields))
+
+
+def delete_showroom(showroom_id):
+    """Delete a showroom from the system."""
+    return _delete("showrooms", showroom_id)
+
+
+def add_car_to_showroom(showroom_id, car_id):
+    """Link a car to a showroom's car list."""
+    return _update("showrooms", showroom_id, lambda showroom: showroom.add_car(car_id))
+
+
+def add_garage(garage_object):
+    """Add a new garage to the system."""
+    return _insert("garages", garage_object)
+
+
+def update_garage(garage_id, **fields):
+    """Update an existing garage's details."""
+    return _update("garages", garage_id, lambda garage: garage.update_details(**fields))
+
+
+def delete_garage(garage_id):
+    """Delete a garage from the system."""
+    return _delete("garages", garage_id)
+
+
+def add_service(service_object):
+    """Add a new service to the system."""
+    return _insert("services", service_object)
+
+
+def update_service(service_id, **fields):
+    """Update an existing service's details."""
+    return _update("services", service_id, lambda service: service.update_details(**fields))
+
+
+def delete_service(service_id):
+    """Delete a service from the system."""
+    return _delete("services", service_id)
+
+
+def add_reservation(reservation_object):
+    """Add a new reservation to the system."""
+    return _insert("reservations", reservation_object)
+
+
+def delete_reservation(reservation_id):
+    """Delete a reservation and make its car available again."""
+    reservation = get_reservation_by_id(reservation_id)
+    if not reservation:
+        return False
+
+    with transaction():
+        connect().execute("UPDATE cars SET available = 1 WHERE id = ?", (reservation.car_id,))
+        _delete("reservations", reservation.reservation_id)
+    return True
+
+
+def add_buy_rent_process(process_object):
+    """Add a new buy/rent process to history."""
+    return _insert("buy_rent_process", process_object)
+
+
+def add_service_process(process_object):
+    """Add a new service process to history."""
+    return _insert("service_process", process_object)
+
+
+def restore_entity(entity_type, row):
+    """Put an entity back exactly as a before-image CSV row describes it (used by undo). Returns the entity."""
+    table = _csv["ENTITY_TABLES"].get(entity_type.lower())
+    if table is None or table in HISTORY_TABLES:
+        raise ValueError(f"Cannot restore entity type: {entity_type}")
+    entity = _csv["TABLES"][table]["parse"](row)
+    _insert(table, entity, replace=True)
+    if table == "cars":
+        _index_car(entity)
+    return entity
+
+
+#search and filter functions
+def _car_where(filters):
+    """Return (WHERE clause, params) for the same filters as Car.matches_filter."""
+    clauses, params = [], []
+    for field in ("make", "model"):
+        if filters.get(field):
+            clauses.append(f"instr(lower({field}), ?) > 0")
+            params.append(filters[field].lower())
+    if filters.get("year") is not None:
+        clauses.append("year = ?")
+        params.append(int(filters["year"]))
+    if filters.get("showroom_id") is not None:
+        clauses.append("showroom_id = ?")
+        params.append(int(filters["showroom_id"]))
+    if filters.get("min_price") is not None:
+        clauses.append("price >= ?")
+        params.append(float(filters["min_price"]))
+    if filters.get("max_price") is not None:
+        clauses.append("price <= ?")
+        params.append(float(filters["max_price"]))
+    if filters.get("available") is not None:
+        val = filters["available"]
+        val = bool(int(val)) if isinstance(val, str) else bool(val)
+        clauses.append("available = ?")
+        params.append(int(val))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def search_cars(filters=None):
+    """Search for cars, pushing the same filters as Car.matches_filter down into SQL."""
+    if not filters:
+        return get_all_cars()
+    return _fetch_all("cars", *_car_where(filters))
+
+
+def _iter_cars_by_price(filters, reverse=False, limit=None, offset=0):
+    """Yield the cars matching filters in (price, id) order, walking idx_cars_price."""
+    _, columns, cls = SCHEMA["cars"]
+    where, params = _car_where(filters)
+    order = "DESC" if reverse else "ASC"
+    sql = (f"SELECT {', '.join(columns)} FROM cars {where} ORDER BY price {order}, id {order} "
+           f"LIMIT ? OFFSET ?")
+    for row in connect().execute(sql, (*params, -1 if limit is None else limit, offset)):
+        yield cls(*row)
+
+
+def cars_in_price_range(lo=None, hi=None, limit=None, offset=0, filters=None):
+    """Return one page of the cars priced lo..hi (inclusive; None leaves that end open), cheapest first."""
+    filters = dict(filters or {}, min_price=lo, max_price=hi)
+    return list(_iter_cars_by_price(filters, limit=limit, offset=offset))
+
+
+def iter_cars_by_price(lo=None, hi=None, reverse=False):
+    """Yield the cars priced lo..hi (inclusive; None leaves that end open), cheapest first (dearest first if reverse)."""
+    return _iter_cars_by_price({"min_price": lo, "max_price": hi}, reverse)
+
+
+def _fuzzy_cars():
+    """Return the cached FuzzyCarIndex, building it from the cars table on first use."""
+    global _fuzzy_index
+    with _fuzzy_lock:
+        if _fuzzy_index is None:
+            _fuzzy_index = fuzzy.FuzzyCarIndex(_iter_all("cars"))
+        return _fuzzy_index
+
+
+def _index_car(car):
+    """Keep the cached FuzzyCarIndex current after a car is added or changed."""
+    with _fuzzy_lock:
+        if _fuzzy_index is not None:
+            _fuzzy_index.upsert(car)
+
+
+def _unindex_car(car_id):
+    """Drop a deleted car from the cached FuzzyCarIndex."""
+    with _fuzzy_lock:
+        if _fuzzy_index is not None:
+            _fuzzy_index.remove(car_id)
+
+
+def _drop_fuzzy_index():
+    global _fuzzy_index
+    with _fuzzy_lock:
+        _fuzzy_index = None
+
+
+def fuzzy_search_cars(query, limit=10, filters=None):
+    """Return up to limit cars whose make/model best match a free-text query, typos allowed (best first).
+
+    Candidates come from the cached FuzzyCarIndex, best first; the other filters are checked in
+    SQL on those candidates only, a batch of ids at a time until limit cars are found.
+    """
+    with _fuzzy_lock:
+        index = _fuzzy_cars()
+        ranked = index.search(query, len(index))
+    where, params = _car_where(filters or {})
+    found = []
+    for start in range(0, len(ranked), ID_BATCH_SIZE):
+        batch = ranked[start:start + ID_BATCH_SIZE]
+        clause = f"id IN ({', '.join('?' * len(batch))})"
+        cars = {car.id: car for car in _iter_all("cars", f"{where} AND {clause}" if where else f"WHERE {clause}",
+                                                  list(params) + batch)}
+        found.extend(cars[car_id] for car_id in batch if car_id in cars)
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+
+def _search_text(table, fields, filters):
+    """Return the rows of a table whose text fields contain the filter values (case-insensitive)."""
+    clauses, params = [], []
+    for field in fields:
+        if (filters or {}).get(field):
+            clauses.append(f"instr(lower({field}), ?) > 0")
+            params.append(filters[field].lower())
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return _fetch_all(table, where, params)
+
+
+def search_showrooms(filters=None):
+    """Search showrooms by name and/or location substring."""
+    return _search_text("showrooms", ("name", "location"), filters)
+
+
+def search_garages(filters=None):
+    """Search garages by name and/or location substring."""
+    return _search_text("garages", ("name", "location"), filters)
+
+
+def search_services(filters=None):
+    """Search services by name substring."""
+    return _search_text("services", ("name",), filters)
+
+
+def get_customer_by_username(username):
+    """Find a customer by username."""
+    customers = _fetch_all("customers", "WHERE username = ? COLLATE NOCASE", (username,))
+    return customers[0] if customers else None
+
+
+def _fetch_ids(table, ids):
+    """Fetch objects for a list of ids, keeping the list's order and skipping missing ones."""
+    if not ids:
+        return []
+    by_id = {obj.id: obj for obj in _fetch_all(table, f"WHERE id IN ({', '.join('?' * len(ids))})", ids)}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def get_cars_in_showroom(showroom_id):
+    """Get all cars in a specific showroom."""
+    showroom = get_showroom_by_id(showroom_id)
+    return _fetch_ids("cars", showroom.car_ids) if showroom else []
+
+
+def get_services_in_garage(garage_id):
+    """Get all services in a specific garage."""
+    garage = get_garage_by_id(garage_id)
+    return _fetch_ids("services", garage.service_ids) if garage else []
+
+
+def get_customer_reservations(customer_id):
+    """Get all reservations for a specific customer."""
+    return _fetch_all("reservations", "WHERE customer_id = ?", (int(customer_id),))
+
+
+def is_buyer(customer_id):
+    """Return True if the customer has bought a car (an idx_buy_rent_customer lookup)."""
+    return connect().execute("SELECT 1 FROM buy_rent_process WHERE customer_id = ? AND type = 'buy' LIMIT 1",
+                             (int(customer_id),)).fetchone() is not None
+
+
+def get_customer_buy_rent_history(customer_id):
+    """Get all buy/rent processes for a specific customer."""
+    return _fetch_all("buy_rent_process", "WHERE customer_id = ?", (int(customer_id),))
+
+
+def get_customer_service_history(customer_id):
+    """Get all service processes for a specific customer."""
+    return _fetch_all("service_process", "WHERE customer_id = ?", (int(customer_id),))
+
+
+#revenue analytics
+def _sums(sql, params=()):
+    """Run a "SELECT key, SUM(amount) ... GROUP BY key" query into {key: total}."""
+    return {key: float(total) for key, total in connect().execute(sql, params)}
+
+
+def get_revenue_stats():
+    """Return revenue totals, breakdowns and percentiles, aggregated by GROUP BY queries."""
+    #dates are stored as csv text, so the month is its "YYYY-MM" prefix
+    month = "CASE WHEN date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN substr(date, 1, 7) ELSE 'unknown' END"
+    union = "SELECT customer_id, date, amount FROM buy_rent_process UNION ALL SELECT customer_id, date, amount FROM service_process"
+
+    totals = [connect().execute(f"SELECT COALESCE(SUM(amount), 0) FROM {table}").fetchone()[0]
+              for table in ("buy_rent_process", "service_process")]
+    by_type = {"buy": 0.0, "rent": 0.0}
+    for name, amount in _sums("SELECT lower(type), SUM(amount) FROM buy_rent_process GROUP BY lower(type)").items():
+        if name in by_type:
+            by_type[name] = amount
+
+    percentiles = {}
+    for name, table in (("buy_rent", "buy_rent_process"), ("service", "service_process")):
+        amounts = [row[0] for row in connect().execute(f"SELECT amount FROM {table} ORDER BY amount")]
+        percentiles[name] = ({q: _csv["_percentile"](amounts, q) for q in _csv["REVENUE_PERCENTILES"]}
+                             if amounts else {})
+
+    return {
+        "buy_rent_total": float(totals[0]),
+        "service_total": float(totals[1]),
+        "total": float(totals[0] + totals[1]),
+        "by_type": by_type,
+        "by_customer": _sums(f"SELECT customer_id, SUM(amount) FROM ({union}) GROUP BY customer_id"),
+        "by_garage": _sums("SELECT garage_id, SUM(amount) FROM service_process GROUP BY garage_id"),
+        "by_showroom": _sums("SELECT COALESCE(c.showroom_id, 0), SUM(p.amount) FROM buy_rent_process p "
+                             "LEFT JOIN cars c ON c.id = p.car_id GROUP BY COALESCE(c.showroom_id, 0)"),
+        "by_month": dict(sorted(_sums(f"SELECT {month}, SUM(amount) FROM ({union}) GROUP BY 1").items(),
+                                key=lambda item: (item[0] != "unknown", item[0]))),
+        "percentiles": percentiles,
+    }
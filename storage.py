@@ -1,9 +1,25 @@
 import os
 import csv
-from datetime import datetime
+import copy
+import zlib
+import marshal
+import struct
+import time
+import atexit
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from operator import attrgetter
+import columnar
+import fuzzy
 from models import (
     Admin, Customer, Car, Showroom, Garage, Service,
-    BuyRentProcess, ServiceProcess, Reservation
+    BuyRentProcess, ServiceProcess, Reservation,
+    parse_timestamp, format_timestamp
 )
 
 #files
@@ -22,6 +38,83 @@ FILES = {
     "admin_action_stack": os.path.join(DATA_DIR, "admin_action_stack.csv"),
 }
 
+#storage backend, selected with the CAR_SHOWROOM_BACKEND environment variable
+#   "csv": tables live in the module-level structures below, persisted as csv + journal
+#   "sqlite": entity and history tables are served from SQLITE_PATH (see sqlite_backend.py)
+STORAGE_BACKEND = os.environ.get("CAR_SHOWROOM_BACKEND", "csv").lower()
+SQLITE_PATH = os.environ.get("CAR_SHOWROOM_DB", os.path.join(DATA_DIR, "showroom.db"))
+
+#append-only journals (one per table), replayed on load and compacted into the base csv
+JOURNALS = {name: os.path.join(DATA_DIR, f"{name}.journal") for name in FILES}
+
+#head offsets of each queue table: per garage, how many requests have been dequeued from the
+#front of its csv + journal since the last compaction, so a dequeue rewrites a few numbers, not the log
+HEADS = {"service_request_queue": os.path.join(DATA_DIR, "service_request_queue.head")}
+
+#service request queue modes, the default taken from CAR_SHOWROOM_QUEUE_MODE
+#   "fifo": each garage serves its requests in arrival order
+#   "priority": each garage serves by priority, aged so that nobody waits forever
+QUEUE_MODES = ("fifo", "priority")
+
+#priority mode: levels for services whose name contains a keyword, plus a level for
+#customers who have bought a car; one level is worth AGING_SECONDS of waiting
+SERVICE_PRIORITIES = {"brake": 3, "transmission": 2, "engine": 2}
+BUYER_PRIORITY = 1
+AGING_SECONDS = 15 * 60
+
+#sealed segments of each stack table, one "number,count,last_id" line each (oldest first)
+#   the active segment is the base csv plus its journal; once it holds STACK_SEGMENT_SIZE actions
+#   they are archived as <table>.<number>.csv and never rewritten, so the active csv stays small
+SEGMENTS = {"admin_action_stack": os.path.join(DATA_DIR, "admin_action_stack.segments")}
+STACK_SEGMENT_SIZE = 500
+
+#how many of the most recent admin actions are kept in memory (rounded up to whole segments)
+STACK_WINDOW = int(os.environ.get("CAR_SHOWROOM_STACK_WINDOW", STACK_SEGMENT_SIZE))
+
+#binary snapshots of each base csv, loaded instead of parsing the csv while it is unchanged
+#   layout: magic, format version, crc32 of the payload, payload length, size and mtime_ns of
+#   the csv it was taken from, then the rows as marshalled tuples of plain values (never code
+#   or objects, so a snapshot can only ever yield data; the models are rebuilt from the fields)
+#   (stack tables have none: their active segment is capped, so parsing it is cheap)
+SNAPSHOTS = {name: os.path.join(DATA_DIR, f"{name}.snap") for name in FILES if name not in SEGMENTS}
+SNAPSHOT_MAGIC = b"CSSNAP"
+#bump SNAPSHOT_VERSION whenever the model classes change shape, so old snapshots are reparsed
+SNAPSHOT_VERSION = 8
+_SNAPSHOT_HEADER = struct.Struct("<6sHIIqq")
+
+#tables are read in chunks of this many characters, so no file is held in memory whole
+READ_CHUNK_SIZE = 64 * 1024
+
+#persistent id sequences: the last id handed out for each table
+SEQUENCES_FILE = os.path.join(DATA_DIR, "sequences.csv")
+SEQUENCES_HEADER = "table,last_id"
+
+#entity names accepted by next_id_for()
+ENTITY_TABLES = {
+    "car": "cars",
+    "customer": "customers",
+    "showroom": "showrooms",
+    "garage": "garages",
+    "service": "services",
+    "buy_rent_process": "buy_rent_process",
+    "service_process": "service_process",
+    "reservation": "reservations",
+}
+
+#a journal is folded back into its csv once it holds this many entries, off the writing thread:
+#by the reservation sweeper if it runs, else by a one-shot compactor thread (compact_journals()
+#and save_all_data() compact on demand)
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+#car searches answered from the CarIndex sets verify at most this share of the inventory one car
+#at a time; a broader plan is handed to the columnar CarTable scan instead (when numpy is available)
+INDEX_SCAN_RATIO = 0.02
+
+#write modes
+#   "immediate": every journal entry is appended to disk as it happens
+#   "deferred": entries are buffered per dirty table and written by flush()
+WRITE_MODES = ("immediate", "deferred")
+
 #DS
 cars_by_id = {}
 customers_by_id = {}
@@ -36,9 +129,63 @@ service_history = []
 #queue (FIFO) for service requests
 service_request_queue = []
 
-#stack (LIFO) for admin actions (undo functionality)
+#stack (LIFO) for admin actions (undo functionality), an AdminActionStack once loaded
 admin_action_stack = []
 
+#number of entries currently sitting in each journal (written or buffered)
+_journal_counts = {}
+
+#tables whose journal (or queue heads) reached JOURNAL_COMPACT_THRESHOLD, waiting to be compacted,
+#and the one-shot thread compacting them when the reservation sweeper is not running
+_compact_due = set()
+_compact_thread = None
+
+_queue_mode = os.environ.get("CAR_SHOWROOM_QUEUE_MODE", "fifo").lower()
+
+#write-behind state: buffered journal lines per dirty table, queue heads not yet written
+_write_mode = "immediate"
+_pending_writes = {}
+_pending_heads = set()
+_io_lock = threading.RLock()
+_flush_thread = None
+_flush_stop = threading.Event()
+_atexit_registered = False
+
+#tables read from disk so far; the rest are loaded on first access
+_loaded = set()
+
+#seconds spent reading each table the last time it was loaded
+_load_timings = {}
+
+#min-heap of (expiry timestamp, reservation_id) over the loaded reservations; entries for
+#reservations deleted (or re-timed) since are left in place and skipped when they reach the top
+_expiry_heap = []
+
+#derived indexes over a table (e.g. the columnar CarTable), as {table: {name: index}}
+#   each index has upsert(item) and remove(key), called on every journaled write of its table;
+#   it is built on first use and dropped when the table is reloaded or a transaction rolls back
+_indexes = {}
+
+#background reservation sweeper
+_sweep_thread = None
+_sweep_stop = threading.Event()
+
+#id sequences (None until first used) and whether they changed since last written
+_sequences = None
+_sequences_dirty = False
+
+#open transaction of each thread (see _current_transaction), and the lock that serializes
+#transactions across threads: it is held for the whole outermost block, so the reservation
+#sweeper can never join (or be joined by) a transaction the main thread has open
+_transaction_state = threading.local()
+_transaction_lock = threading.RLock()
+
+
+def _current_transaction():
+    """Return the transaction open in the calling thread, or None."""
+    return getattr(_transaction_state, "tx", None)
+
+
 def ensure_data_directory():
     """Create the data directory if it doesn't exist."""
     if not os.path.exists(DATA_DIR):
@@ -52,339 +199,1443 @@ def ensure_file_exists(filepath, header):
             f.write(header + '\n')
 
 
-#load functions
-def load_cars():
-    """Load all cars from cars.csv into memory."""
-    global cars_by_id
-    cars_by_id = {}
+#row helpers for the queue and stack (they are stored as plain dicts)
+def service_request_from_csv_row(row):
+    """Parse a service_request_queue.csv row into a request dict."""
+    parts = row.strip().split(',')
+    return {
+        'request_id': int(parts[0]),
+        'customer_id': int(parts[1]),
+        'service_id': int(parts[2]),
+        'garage_id': int(parts[3]),
+        'timestamp': parse_timestamp(parts[4]),
+        'status': parts[5],
+        'priority': int(parts[6]) if len(parts) > 6 else 0
+    }
+
+
+def service_request_to_csv_row(request):
+    """Format a request dict as a service_request_queue.csv row."""
+    return (f"{request['request_id']},{request['customer_id']},{request['service_id']},"
+            f"{request['garage_id']},{format_timestamp(request['timestamp'])},{request['status']},{request.get('priority', 0)}")
+
+
+def admin_action_from_csv_row(row):
+    """Parse an admin_action_stack.csv row into an action dict."""
+    #the before-image is itself a csv row, so it is the last column and keeps its commas
+    parts = row.strip().split(',', 7)
+    return {
+        'action_id': int(parts[0]),
+        'admin_id': int(parts[1]),
+        'action_type': parts[2],
+        'entity_type': parts[3],
+        'entity_id': int(parts[4]),
+        'timestamp': parse_timestamp(parts[5]),
+        'details': parts[6] if len(parts) > 6 else '',
+        'before': parts[7] if len(parts) > 7 else ''
+    }
+
+
+def admin_action_to_csv_row(action):
+    """Format an action dict as an admin_action_stack.csv row."""
+    details = str(action.get('details', '')).replace(',', ';')
+    return (f"{action['action_id']},{action['admin_id']},{action['action_type']},"
+            f"{action['entity_type']},{action['entity_id']},{format_timestamp(action['timestamp'])},{details},"
+            f"{action.get('before', '')}")
+
+
+#service request queue
+class ServiceRequestQueue:
+    """Per-garage FIFOs of service request dicts, dispatched round-robin across garages.
+
+    Each garage has its own deque, so a backlog at one garage never holds up another.
+    Dequeuing (for a garage or round-robin) and position lookup by request_id are O(1).
+    """
+
+    #dequeues take each garage's oldest request, so they are persisted as head offsets
+    fifo = True
+
+    def __init__(self, requests=()):
+        self._garages = {}
+        #garage id and sequence number of each queued request; position = seq - seq of the garage's front
+        self._seq = {}
+        self._front = {}
+        self._next = {}
+        #arrival number of each queued request, for listing all garages in arrival order
+        self._order = {}
+        self._arrivals = 0
+        #garages in round-robin order (empty ones are dropped lazily)
+        self._rotation = deque()
+        self._in_rotation = set()
+        #requests taken off the front of each garage's queue since the table was last compacted
+        self.heads = {}
+        for request in requests:
+            self.append(request)
+
+    def __len__(self):
+        return len(self._seq)
+
+    def __iter__(self):
+        """Iterate over every queued request in arrival order."""
+        return heapq.merge(*self._garages.values(), key=lambda request: self._order[request['request_id']])
+
+    @property
+    def consumed(self):
+        """Total number of requests dequeued since the table was last compacted."""
+        return sum(self.heads.values())
+
+    def append(self, request):
+        """Add a request at the back of its garage's queue (or replace it in place if already queued)."""
+        request_id, garage_id = request['request_id'], request['garage_id']
+        if request_id in self._seq:
+            if self._seq[request_id][0] == garage_id:
+                self._garages[garage_id][self.position(request_id) - 1] = request
+                return
+            self.remove(request_id)
+
+        queue = self._garages.setdefault(garage_id, deque())
+        seq = self._next.get(garage_id, 0)
+        self._front.setdefault(garage_id, seq)
+        self._next[garage_id] = seq + 1
+        self._seq[request_id] = (garage_id, seq)
+        self._order[request_id] = self._arrivals
+        self._arrivals += 1
+        queue.append(request)
+        self._rotate(garage_id)
+
+    def _pop_garage(self, garage_id):
+        """Remove and return the front request of one garage's queue."""
+        request = self._garages[garage_id].popleft()
+        del self._seq[request['request_id']]
+        del self._order[request['request_id']]
+        self._front[garage_id] += 1
+        self.heads[garage_id] = self.heads.get(garage_id, 0) + 1
+        return request
+
+    def _rotate(self, garage_id):
+        """Put a garage with waiting requests at the back of the round-robin rotation."""
+        if garage_id not in self._in_rotation:
+            self._rotation.append(garage_id)
+            self._in_rotation.add(garage_id)
+
+    def popleft(self, garage_id=None):
+        """Remove and return the front request of a garage, or of the next garage in round-robin order."""
+        if garage_id is not None:
+            if not self.size(garage_id):
+                raise IndexError(f"no queued requests for garage {garage_id}")
+            return self._pop_garage(garage_id)
+
+        while self._rotation:
+            garage_id = self._rotation.popleft()
+            self._in_rotation.discard(garage_id)
+            if not self.size(garage_id):
+                continue
+
+            request = self._pop_garage(garage_id)
+            if self.size(garage_id):
+                #back of the line for this garage's next request
+                self._rotate(garage_id)
+            return request
+
+        raise IndexError("service request queue is empty")
+
+    def skip(self, heads):
+        """Drop requests from the front of each garage's queue (replaying persisted head offsets)."""
+        for garage_id, count in heads.items():
+            for _ in range(min(count, len(self._garages.get(garage_id, ())))):
+                self._pop_garage(garage_id)
+
+    def remove(self, request_id):
+        """Remove a request from anywhere in its garage's queue. O(n), unlike popleft()."""
+        position = self.position(request_id)
+        if position is None:
+            return False
+        garage_id = self._seq[request_id][0]
+        queue = self._garages[garage_id]
+        del queue[position - 1]
+        del self._seq[request_id]
+        del self._order[request_id]
+        #everything behind it moves up one place
+        for request in list(queue)[position - 1:]:
+            self._seq[request['request_id']] = (garage_id, self._seq[request['request_id']][1] - 1)
+        self._next[garage_id] -= 1
+        return True
+
+    def peek(self, garage_id=None):
+        """Return the request popleft() would return, without removing it."""
+        if garage_id is not None:
+            queue = self._garages.get(garage_id)
+            return queue[0] if queue else None
+
+        for garage_id in self._rotation:
+            if self.size(garage_id):
+                return self.peek(garage_id)
+        return None
+
+    def position(self, request_id):
+        """Return the 1-based position of a request in its garage's queue, or None if it is not queued."""
+        if request_id not in self._seq:
+            return None
+        garage_id, seq = self._seq[request_id]
+        return seq - self._front[garage_id] + 1
+
+    def positions(self):
+        """Return {request_id: 1-based position in its garage's queue} for every queued request."""
+        return {request_id: seq - self._front[garage_id] + 1 for request_id, (garage_id, seq) in self._seq.items()}
+
+    def size(self, garage_id=None):
+        """Return the number of queued requests, in total or for one garage."""
+        if garage_id is None:
+            return len(self._seq)
+        return len(self._garages.get(garage_id, ()))
+
+    def depths(self):
+        """Return {garage_id: queued requests} for every garage with a backlog."""
+        return {garage_id: len(queue) for garage_id, queue in self._garages.items() if queue}
+
+    def copy(self):
+        """Return an independent copy (used for transaction rollback)."""
+        clone = ServiceRequestQueue()
+        clone._garages = {garage_id: deque(queue) for garage_id, queue in self._garages.items()}
+        clone._seq = dict(self._seq)
+        clone._front = dict(self._front)
+        clone._next = dict(self._next)
+        clone._order = dict(self._order)
+        clone._arrivals = self._arrivals
+        clone._rotation = deque(self._rotation)
+        clone._in_rotation = set(self._in_rotation)
+        clone.heads = dict(self.heads)
+        return clone
+
+
+class PriorityServiceRequestQueue(ServiceRequestQueue):
+    """Per-garage heaps of service requests ordered by aged priority, dispatched round-robin across garages.
+
+    A request's heap key is its enqueue time minus priority * AGING_SECONDS. Every request ages
+    at the same rate, so this fixed key orders requests by effective priority
+    (priority + waited / AGING_SECONDS) and nothing has to be re-heapified as time passes.
+    Enqueue and dequeue are O(log n); removed requests are dropped lazily from the heaps.
+    """
+
+    #dequeues take requests out of arrival order, so they are journaled as deletes
+    fifo = False
+
+    def __init__(self, requests=()):
+        self._heaps = {}
+        self._requests = {}
+        self._garage_of = {}
+        self._sizes = {}
+        super().__init__(requests)
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __iter__(self):
+        """Iterate over every queued request in arrival order."""
+        return iter(sorted(self._requests.values(), key=lambda request: self._order[request['request_id']]))
+
+    def _entry(self, request):
+        """Return the heap entry for a request: aged priority key, then arrival as tie-breaker."""
+        return (_aging_key(request), self._order[request['request_id']], request['request_id'])
+
+    def append(self, request):
+        """Add a request to its garage's heap (or replace it if already queued)."""
+        request_id, garage_id = request['request_id'], request['garage_id']
+        if request_id in self._requests:
+            self.remove(request_id)
+
+        self._order[request_id] = self._arrivals
+        self._arrivals += 1
+        self._requests[request_id] = request
+        self._garage_of[request_id] = garage_id
+        self._sizes[garage_id] = self._sizes.get(garage_id, 0) + 1
+        heapq.heappush(self._heaps.setdefault(garage_id, []), self._entry(request))
+        self._rotate(garage_id)
+
+    def _clean(self, garage_id):
+        """Drop removed requests from the top of a garage's heap."""
+        heap = self._heaps.get(garage_id)
+        while heap and heap[0][2] not in self._requests:
+            heapq.heappop(heap)
+        return heap
+
+    def _pop_garage(self, garage_id):
+        """Remove and return the highest (aged) priority request of one garage."""
+        _, _, request_id = heapq.heappop(self._clean(garage_id))
+        return self._forget(request_id)
+
+    def _forget(self, request_id):
+        """Drop a request from the bookkeeping, leaving any heap entry to be cleaned lazily."""
+        request = self._requests.pop(request_id)
+        garage_id = self._garage_of.pop(request_id)
+        del self._order[request_id]
+        self._sizes[garage_id] -= 1
+        return request
+
+    def skip(self, heads):
+        """Drop each garage's oldest requests (head offsets persisted while the queue was FIFO)."""
+        for garage_id, count in heads.items():
+            queued = [request_id for request_id, garage in self._garage_of.items() if garage == garage_id]
+            queued.sort(key=self._order.get)
+            for request_id in queued[:count]:
+                self._forget(request_id)
+            self.heads[garage_id] = self.heads.get(garage_id, 0) + min(count, len(queued))
+
+    def remove(self, request_id):
+        """Remove a request from anywhere in its garage's heap."""
+        if request_id not in self._requests:
+            return False
+        self._forget(request_id)
+        return True
+
+    def peek(self, garage_id=None):
+        """Return the request popleft() would return, without removing it."""
+        if garage_id is None:
+            return super().peek()
+        heap = self._clean(garage_id)
+        return self._requests[heap[0][2]] if heap else None
+
+    def position(self, request_id):
+        """Return the 1-based dispatch position of a request within its garage, or None if it is not queued. O(n)."""
+        request = self._requests.get(request_id)
+        if request is None:
+            return None
+        garage_id = self._garage_of[request_id]
+        entry = self._entry(request)
+        return 1 + sum(1 for other in self._heaps[garage_id] if other[2] in self._requests and other < entry)
+
+    def positions(self):
+        """Return {request_id: 1-based dispatch position within its garage} for every queued request.
+
+        One sort of each garage's live heap entries, so a whole queue view costs O(n log n), not O(n^2).
+        """
+        positions = {}
+        for heap in self._heaps.values():
+            #skip entries of removed requests and the stale entry of a re-queued one
+            live = sorted(entry for entry in heap if self._order.get(entry[2]) == entry[1])
+            for position, entry in enumerate(live, 1):
+                positions[entry[2]] = position
+        return positions
+
+    def size(self, garage_id=None):
+        """Return the number of queued requests, in total or for one garage."""
+        if garage_id is None:
+            return len(self._requests)
+        return self._sizes.get(garage_id, 0)
+
+    def depths(self):
+        """Return {garage_id: queued requests} for every garage with a backlog."""
+        return {garage_id: size for garage_id, size in self._sizes.items() if size}
+
+    def copy(self):
+        """Return an independent copy (used for transaction rollback)."""
+        clone = PriorityServiceRequestQueue()
+        clone._heaps = {garage_id: list(heap) for garage_id, heap in self._heaps.items()}
+        clone._requests = dict(self._requests)
+        clone._garage_of = dict(self._garage_of)
+        clone._sizes = dict(self._sizes)
+        clone._order = dict(self._order)
+        clone._arrivals = self._arrivals
+        clone._rotation = deque(self._rotation)
+        clone._in_rotation = set(self._in_rotation)
+        clone.heads = dict(self.heads)
+        return clone
+
+
+def _aging_key(request):
+    """Return a request's heap key: enqueue time (seconds) minus its priority's worth of waiting."""
+    return (request['timestamp'] or 0) - request.get('priority', 0) * AGING_SECONDS
+
+
+#admin action stack
+class AdminActionStack:
+    """LIFO of admin action dicts that keeps only the newest ones in memory.
+
+    The stack is stored as sealed segments (see SEGMENTS) under an active segment. Memory holds
+    the active segment plus whole sealed segments up to `window` actions; older segments are read
+    back only when pops reach them. Push, pop and peek are O(1).
+    """
+
+    table = "admin_action_stack"
+
+    def __init__(self, segments=(), window=None):
+        #sealed segments, oldest first, as (number, count, id of their last action)
+        self.segments = list(segments)
+        #sealed segments popped back into the active one, to be deleted at the next save
+        self.reopened = []
+        self.window = window or STACK_WINDOW
+        self._items = deque()
+        self._archived = sum(count for _, count, _ in self.segments)
+        self._total = self._archived
+        #index of the oldest segment in memory: memory always starts at a segment boundary
+        self._base = len(self.segments)
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        """Iterate over the actions held in memory, oldest first."""
+        return iter(self._items)
+
+    @property
+    def active(self):
+        """Number of actions in the active segment."""
+        return self._total - self._archived
+
+    @property
+    def sealed_id(self):
+        """Id of the newest sealed action."""
+        return self.segments[-1][2] if self.segments else 0
+
+    def append(self, action):
+        """Push an action, dropping the oldest sealed segment from memory once the window is exceeded."""
+        if action['action_id'] <= self.sealed_id:
+            #already sealed (left in the active csv by an interrupted save)
+            return
+        self._items.append(action)
+        self._total += 1
+        self.trim()
+
+    def pop(self):
+        """Remove and return the newest action."""
+        top = self.peek()
+        if not self.active:
+            #the top is in the newest sealed segment, which becomes the active one again
+            number, count, _ = self.segments.pop()
+            self.reopened.append(number)
+            self._archived -= count
+        self._items.pop()
+        self._total -= 1
+        return top
+
+    def peek(self):
+        """Return the newest action without removing it."""
+        if not self._total:
+            raise IndexError("admin action stack is empty")
+        if not self._items:
+            self.fill()
+        return self._items[-1]
+
+    def remove(self, action_id):
+        """Pop the top action if it has this id (replaying a journaled pop); anything else is stale."""
+        if self._total and self.peek()['action_id'] == action_id:
+            self.pop()
+
+    def recent(self, limit):
+        """Return up to limit of the newest in-memory actions, newest first."""
+        return list(islice(reversed(self._items), limit))
+
+    def active_rows(self):
+        """Return the actions of the active segment, oldest first."""
+        return list(islice(self._items, len(self._items) - self.active, None))
+
+    def trim(self):
+        """Drop whole sealed segments from memory while the newer actions still fill the window."""
+        while self._base < len(self.segments):
+            count = self.segments[self._base][1]
+            if len(self._items) - count < self.window:
+                break
+            for _ in range(count):
+                self._items.popleft()
+            self._base += 1
+
+    def fill(self):
+        """Read sealed segments back into memory, newest first, until the window is full."""
+        if not self._items and self._total:
+            #the top lies inside a sealed segment: find it and read it up to the top
+            index, end = len(self.segments), self._archived
+            while end - self.segments[index - 1][1] >= self._total:
+                index -= 1
+                end -= self.segments[index][1]
+            index -= 1
+            start = end - self.segments[index][1]
+            self._items.extend(_read_segment(self.table, self.segments[index][0])[:self._total - start])
+            self._base = index
+
+        while len(self._items) < self.window and self._base > 0:
+            self._base -= 1
+            self._items.extendleft(reversed(_read_segment(self.table, self.segments[self._base][0])))
+
+    def seal(self, number):
+        """Close the oldest STACK_SEGMENT_SIZE active actions into sealed segment `number`, returning them."""
+        start = len(self._items) - self.active
+        rows = list(islice(self._items, start, start + STACK_SEGMENT_SIZE))
+        self.segments.append((number, len(rows), rows[-1]['action_id']))
+        self._archived += len(rows)
+        return rows
+
+    def copy(self):
+        """Return an independent copy (for transaction rollback)."""
+        clone = AdminActionStack(self.segments, self.window)
+        clone.reopened = list(self.reopened)
+        clone._items = deque(self._items)
+        clone._total = self._total
+        clone._base = self._base
+        return clone
+
+
+#buyers index
+class BuyerIndex:
+    """Set of the customer ids with at least one "buy" process, for the priority queue's buyer level.
+
+    Kept current through the derived-index hook on buy_rent_process; history rows are never
+    deleted, so remove() has nothing to do.
+    """
+
+    def __init__(self, processes=()):
+        self.customers = {process.customer_id for process in processes if process.type == 'buy'}
+
+    def __contains__(self, customer_id):
+        return customer_id in self.customers
+
+    def upsert(self, process):
+        if process.type == 'buy':
+            self.customers.add(process.customer_id)
+
+    def remove(self, key):
+        pass
+
+
+#trigram substring index
+def _trigrams(text):
+    """Return the set of three-character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index serving the case-insensitive substring filters of matches_filter.
+
+    Per text field, each distinct lowercased value maps to the ids holding it, and each trigram
+    to the values containing it. A query of three or more characters intersects the value sets of
+    its trigrams, smallest first, and checks only those values for the substring; shorter queries
+    check every distinct value. Rows sharing a value (cars of one make, say) cost one entry.
+    """
+
+    def __init__(self, rows=(), fields=("name",)):
+        self.fields = tuple(fields)
+        self._ids = {field: {} for field in self.fields}
+        self._grams = {field: {} for field in self.fields}
+        #the lowercased values each row is filed under, so an update can unfile it after the row has changed
+        self._values = {}
+        for row in rows:
+            self._file(row)
+
+    def __len__(self):
+        return len(self._values)
+
+    def _file(self, row):
+        """Add a row that is not in the index yet."""
+        values = self._values[row.id] = tuple(getattr(row, field).lower() for field in self.fields)
+        for field, value in zip(self.fields, values):
+            ids = self._ids[field].get(value)
+            if ids is None:
+                ids = self._ids[field][value] = set()
+                grams = self._grams[field]
+                for gram in _trigrams(value):
+                    holders = grams.get(gram)
+                    if holders is None:
+                        holders = grams[gram] = set()
+                    holders.add(value)
+            ids.add(row.id)
+
+    def upsert(self, row):
+        """File a row under its current values (moving it if they changed)."""
+        if self._values.get(row.id) == tuple(getattr(row, field).lower() for field in self.fields):
+            return
+        self.remove(row.id)
+        self._file(row)
+
+    def remove(self, key):
+        """Unfile a row."""
+        values = self._values.pop(key, None)
+        if values is None:
+            return
+        for field, value in zip(self.fields, values):
+            ids = self._ids[field][value]
+            ids.discard(key)
+            if ids:
+                continue
+            del self._ids[field][value]
+            grams = self._grams[field]
+            for gram in _trigrams(value):
+                holders = grams[gram]
+                holders.discard(value)
+                if not holders:
+                    del grams[gram]
+
+    def postings(self, field, text):
+        """Return the id sets of the distinct values whose field contains text (shared: do not modify).
+
+        Their lengths add up to the number of matching rows, so a caller can size a substring
+        filter before paying for the union.
+        """
+        needle = text.lower()
+        if len(needle) < 3:
+            values = self._ids[field]
+        else:
+            sets = []
+            for gram in _trigrams(needle):
+                holders = self._grams[field].get(gram)
+                if not holders:
+                    return []
+                sets.append(holders)
+            sets.sort(key=len)
+            values = sets[0].intersection(*sets[1:])
+
+        return [self._ids[field][value] for value in values if needle in value]
+
+    def matching(self, field, text):
+        """Return the set of ids whose field contains text, case-insensitively (shared: do not modify)."""
+        postings = self.postings(field, text)
+        return postings[0] if len(postings) == 1 else set().union(*postings)
+
+    def search(self, filters):
+        """Return the ids matching every text filter that is set, or None if none of them is."""
+        sets = [self.matching(field, filters[field]) for field in self.fields if filters.get(field)]
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+
+#text fields searched by substring in each table (see the models' matches_filter)
+TEXT_FIELDS = {
+    "cars": ("make", "model"),
+    "showrooms": ("name", "location"),
+    "garages": ("name", "location"),
+    "services": ("name",),
+}
+
+
+#car secondary indexes
+class CarIndex:
+    """Hash indexes over the car inventory, kept current through the derived-index hook.
+
+    year and showroom_id each map a value to the set of car ids holding it, `available` is the
+    set of available ids, and make and model are served by a TrigramIndex. plan(filters)
+    intersects the sets a search narrows to, smallest first, so selective searches touch only
+    the cars they could return.
+    """
+
+    FIELDS = ("year", "showroom_id")
+
+    def __init__(self, cars=()):
+        cars = list(cars)
+        self.text = TrigramIndex(cars, TEXT_FIELDS["cars"])
+        self.maps = {field: {} for field in self.FIELDS}
+        self.available = set()
+        #the keys each car is filed under, so an update can unfile it after the car has changed
+        self._keys = {}
+        for car in cars:
+            self._file(car)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _file(self, car):
+        """Add a car that is not in the index yet."""
+        keys = self._keys[car.id] = (car.year, car.showroom_id)
+        for field, key in zip(self.FIELDS, keys):
+            ids = self.maps[field].get(key)
+            if ids is None:
+                ids = self.maps[field][key] = set()
+            ids.add(car.id)
+        if car.available:
+            self.available.add(car.id)
+
+    def upsert(self, car):
+        """File a car under its current values (moving it if they changed)."""
+        self.text.upsert(car)
+        self._unfile(car.id)
+        self._file(car)
+
+    def remove(self, car_id):
+        """Unfile a car."""
+        self.text.remove(car_id)
+        self._unfile(car_id)
+
+    def _unfile(self, car_id):
+        """Drop a car from the year, showroom and availability sets."""
+        keys = self._keys.pop(car_id, None)
+        if keys is None:
+            return
+        for field, key in zip(self.FIELDS, keys):
+            ids = self.maps[field][key]
+            ids.discard(car_id)
+            if not ids:
+                del self.maps[field][key]
+        self.available.discard(car_id)
+
+    def plan(self, filters, limit=None):
+        """Return a set of ids holding every car that can match the filters, or None to scan instead.
+
+        Each indexed filter is sized from its posting sets before any union or intersection, and
+        the result is estimated from those sizes as if the filters were independent. None means no
+        filter narrows the search, or the estimate exceeds `limit` cars. Otherwise the smallest
+        filter is materialized and narrowed by the exact-match sets; the substring filters,
+        available=False and prices are left for the caller to verify.
+        """
+        #(size, posting sets): one set for an exact match, one per matching value for a substring
+        clauses = []
+        for field in self.text.fields:
+            if filters.get(field):
+                postings = self.text.postings(field, filters[field])
+                clauses.append((sum(map(len, postings)), postings))
+
+        for field in self.FIELDS:
+            if filters.get(field) is not None:
+                ids = self.maps[field].get(int(filters[field]), set())
+                clauses.append((len(ids), [ids]))
+
+        if filters.get("available") is not None:
+            val = filters["available"]
+            val = bool(int(val)) if isinstance(val, str) else bool(val)
+            if val:
+                clauses.append((len(self.available), [self.available]))
+
+        if not clauses:
+            return None
+        clauses.sort(key=lambda clause: clause[0])
+        if limit is not None:
+            estimate = len(self)
+            for size, _ in clauses:
+                estimate *= size / max(len(self), 1)
+            if estimate > limit:
+                return None
+        
+        postings = clauses[0][1]
+        ids = postings[0].copy() if len(postings) == 1 else set().union(*postings)
+        for _, postings in clauses[1:]:
+            if not ids:
+                break
+            if len(postings) == 1:
+                ids &= postings[0]
+        return ids
+
+
+#car price index
+class PriceIndex:
+    """Car ids sorted by (price, id), for price ranges and cheapest-first pages.
+
+    Either end of a range is found by bisection, so reading k cars of a range costs
+    O(log n + k). A write moves one entry of the sorted list (a memmove of the entries after it).
+    """
+
+    def __init__(self, cars=()):
+        self.prices = {car.id: car.price for car in cars}
+        self._entries = sorted((price, car_id) for car_id, price in self.prices.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, car_id):
+        """Return a car's sort key."""
+        return (self.prices[car_id], car_id)
+
+    def upsert(self, car):
+        """Insert a car, or move it if its price changed."""
+        old = self.prices.get(car.id)
+        if old == car.price:
+            return
+        if old is not None:
+            self.remove(car.id)
+        self.prices[car.id] = car.price
+        insort(self._entries, (car.price, car.id))
+
+    def remove(self, car_id):
+        """Drop a car."""
+        price = self.prices.pop(car_id, None)
+        if price is not None:
+            del self._entries[bisect_left(self._entries, (price, car_id))]
+
+    def _bounds(self, lo, hi):
+        """Return the slice of entries priced lo..hi (inclusive; None leaves that end open)."""
+        start = 0 if lo is None else bisect_left(self._entries, (float(lo),))
+        end = len(self._entries) if hi is None else bisect_right(self._entries, (float(hi), float("inf")))
+        return start, max(start, end)
+
+    def count(self, lo=None, hi=None):
+        """Return how many cars are priced lo..hi."""
+        start, end = self._bounds(lo, hi)
+        return end - start
+
+    def ids_between(self, lo=None, hi=None, reverse=False):
+        """Yield the ids of the cars priced lo..hi, cheapest first (dearest first if reverse)."""
+        start, end = self._bounds(lo, hi)
+        entries = self._entries
+        for position in (range(end - 1, start - 1, -1) if reverse else range(start, end)):
+            if position < len(entries):
+                yield entries[position][1]
+
+
+#table layout
+#   kind "dict" tables are keyed by id, kind "list" tables keep insertion order,
+#   kind "queue" is the ServiceRequestQueue (dequeues advance its head offsets file, see HEADS),
+#   kind "stack" is the AdminActionStack (full segments are sealed into archives, see SEGMENTS).
+#   pop_index is where a journal delete removes from a list table (None: search for the key).
+#   model is the class of a table's rows, built from its __slots__ fields when read from a snapshot.
+TABLES = {
+    "cars": {
+        "global": "cars_by_id",
+        "header": "id,make,model,year,price,installment,showroom_id,available",
+        "label": "car",
+        "kind": "dict",
+        "model": Car,
+        "parse": Car.from_csv_row,
+        "format": Car.to_csv_row,
+        "key": lambda car: car.id,
+    },
+    "customers": {
+        "global": "customers_by_id",
+        "header": "id,username,password,phone",
+        "label": "customer",
+        "kind": "dict",
+        "model": Customer,
+        "parse": Customer.from_csv_row,
+        "format": Customer.to_csv_row,
+        "key": lambda customer: customer.id,
+    },
+    "showrooms": {
+        "global": "showrooms_by_id",
+        "header": "id,name,location,phone,car_ids",
+        "label": "showroom",
+        "kind": "dict",
+        "model": Showroom,
+        "parse": Showroom.from_csv_row,
+        "format": Showroom.to_csv_row,
+        "key": lambda showroom: showroom.id,
+    },
+    "garages": {
+        "global": "garages_by_id",
+        "header": "id,name,location,phone,service_ids",
+        "label": "garage",
+        "kind": "dict",
+        "model": Garage,
+        "parse": Garage.from_csv_row,
+        "format": Garage.to_csv_row,
+        "key": lambda garage: garage.id,
+    },
+    "services": {
+        "global": "services_by_id",
+        "header": "id,name,price",
+        "label": "service",
+        "kind": "dict",
+        "model": Service,
+        "parse": Service.from_csv_row,
+        "format": Service.to_csv_row,
+        "key": lambda service: service.id,
+    },
+    "buy_rent_process": {
+        "global": "buy_rent_history",
+        "header": "process_id,customer_id,date,amount,car_id,type",
+        "label": "buy/rent process",
+        "kind": "list",
+        "model": BuyRentProcess,
+        "parse": BuyRentProcess.from_csv_row,
+        "format": BuyRentProcess.to_csv_row,
+        "key": lambda process: process.process_id,
+        "pop_index": None,
+    },
+    "service_process": {
+        "global": "service_history",
+        "header": "process_id,customer_id,date,amount,service_id,garage_id",
+        "label": "service process",
+        "kind": "list",
+        "model": ServiceProcess,
+        "parse": ServiceProcess.from_csv_row,
+        "format": ServiceProcess.to_csv_row,
+        "key": lambda process: process.process_id,
+        "pop_index": None,
+    },
+    "reservations": {
+        "global": "reservations_by_id",
+        "header": "reservation_id,customer_id,car_id,start_time,expiry_time",
+        "label": "reservation",
+        "kind": "dict",
+        "model": Reservation,
+        "parse": Reservation.from_csv_row,
+        "format": Reservation.to_csv_row,
+        "key": lambda reservation: reservation.reservation_id,
+    },
+    "service_request_queue": {
+        "global": "service_request_queue",
+        "header": "request_id,customer_id,service_id,garage_id,timestamp,status,priority",
+        "label": "service request",
+        "kind": "queue",
+        "parse": service_request_from_csv_row,
+        "format": service_request_to_csv_row,
+        "key": lambda request: request['request_id'],
+    },
+    "admin_action_stack": {
+        "global": "admin_action_stack",
+        "header": "action_id,admin_id,action_type,entity_type,entity_id,timestamp,details,before",
+        "label": "admin action",
+        "kind": "stack",
+        "parse": admin_action_from_csv_row,
+        "format": admin_action_to_csv_row,
+        "key": lambda action: action['action_id'],
+    },
+}
+
+
+def _apply_insert(spec, container, item):
+    """Insert (or overwrite) one parsed row in a table container."""
+    if spec["kind"] == "dict":
+        container[spec["key"](item)] = item
+    else:
+        container.append(item)
+
+
+def _new_container(spec):
+    """Return an empty container for a table."""
+    if spec["kind"] == "dict":
+        return {}
+    if spec["kind"] == "queue":
+        return _queue_class()()
+    if spec["kind"] == "stack":
+        #sealed segments first, so the active csv can skip rows they already hold
+        return AdminActionStack(_read_segments(AdminActionStack.table))
+    return []
+
+
+def _apply_delete(spec, container, key):
+    """Remove one row from a table container."""
+    if spec["kind"] == "dict":
+        container.pop(key, None)
+        return
+    if spec["kind"] in ("queue", "stack"):
+        container.remove(key)
+        return
+
+    index = spec["pop_index"]
+    if index is not None and container and spec["key"](container[index]) == key:
+        container.pop(index)
+        return
+
+    #fall back to searching for the key
+    for i, item in enumerate(container):
+        if spec["key"](item) == key:
+            del container[i]
+            return
+
+
+def _iter_lines(filepath):
+    """Yield the non-empty lines of a file, reading it in fixed-size chunks."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        remainder = ""
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            lines = (remainder + chunk).split('\n')
+            #the last piece may be a partial line, finished by the next chunk
+            remainder = lines.pop()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield line
+
+        remainder = remainder.strip()
+        if remainder:
+            yield remainder
+
+
+def _iter_rows(table, filepath=None):
+    """Yield the parsed rows of a table's base CSV (or of another file in its format) one at a time."""
+    spec = TABLES[table]
+    lines = _iter_lines(filepath or FILES[table])
+
+    #skip header
+    next(lines, None)
+
+    for line in lines:
+        try:
+            yield spec["parse"](line)
+        except (ValueError, IndexError) as e:
+            print(f"Warning: Skipping invalid {spec['label']} row: {line} - Error: {e}")
+
+
+def _iter_journal(table):
+    """Yield (line, op, payload) for each entry of a table's journal."""
+    filepath = JOURNALS[table]
+    if not os.path.exists(filepath):
+        return
+
+    for line in _iter_lines(filepath):
+        op, _, payload = line.partition(',')
+        yield line, op, payload
+
+
+def _replay_journal(table, container):
+    """Apply every entry of a table's journal on top of its loaded base CSV."""
+    spec = TABLES[table]
+    count = 0
+
+    for line, op, payload in _iter_journal(table):
+        count += 1
+        try:
+            if op == '+':
+                _apply_insert(spec, container, spec["parse"](payload))
+            elif op == '-':
+                _apply_delete(spec, container, int(payload))
+            else:
+                raise ValueError(f"unknown journal operation '{op}'")
+        except (ValueError, IndexError) as e:
+            print(f"Warning: Skipping invalid {spec['label']} journal entry: {line} - Error: {e}")
+
+    _journal_counts[table] = count
+    if table in HEADS:
+        container.skip(_read_head(table))
+    if table in SEGMENTS:
+        container.fill()
+    return container
+
+
+def _read_head(table):
+    """Return a queue table's persisted head offsets as {garage_id: count}."""
+    heads = {}
+    if not os.path.exists(HEADS[table]):
+        return heads
+
+    for line in _iter_lines(HEADS[table]):
+        garage_id, _, count = line.partition(',')
+        try:
+            heads[int(garage_id)] = int(count)
+        except ValueError:
+            print(f"Warning: Skipping invalid queue head entry: {line}")
+    return heads
+
+
+def _head_text(table):
+    """Format a queue table's head offsets for its head file."""
+    heads = globals()[TABLES[table]["global"]].heads
+    return ''.join(f"{garage_id},{count}\n" for garage_id, count in heads.items() if count)
+
+
+def _write_head(table):
+    """Persist a queue table's head offsets."""
+    os.replace(_atomic_write(HEADS[table], _head_text(table)), HEADS[table])
+
+
+def _record_head(table):
+    """Persist a dequeue: now, at transaction commit, or on the next flush in deferred mode."""
+    with _io_lock:
+        tx = _current_transaction()
+        if tx is not None:
+            tx["heads"].add(table)
+            return
+        
+        if _write_mode == "deferred":
+            _pending_heads.add(table)
+        else:
+            _write_head(table)
     
-    filepath = FILES["cars"]
-    ensure_file_exists(filepath, "id,make,model,year,price,installment,showroom_id,available")
+    if globals()[TABLES[table]["global"]].consumed >= JOURNAL_COMPACT_THRESHOLD:
+        _request_compaction(table)
+
+
+def _segment_path(table, number):
+    """Return the file of one sealed segment of a stack table."""
+    return os.path.join(DATA_DIR, f"{table}.{number}.csv")
+
+
+def _read_segments(table):
+    """Return a stack table's sealed segments from its manifest as [(number, count, last_id)]."""
+    segments = []
+    if not os.path.exists(SEGMENTS[table]):
+        return segments
+
+    for line in _iter_lines(SEGMENTS[table]):
+        try:
+            number, count, last_id = (int(part) for part in line.split(','))
+        except ValueError:
+            print(f"Warning: Skipping invalid segment manifest entry: {line}")
+            continue
+        segments.append((number, count, last_id))
+    return segments
+
+
+def _read_segment(table, number):
+    """Parse the rows of one sealed segment."""
+    try:
+        return list(_iter_rows(table, _segment_path(table, number)))
+    except FileNotFoundError:
+        print(f"Warning: {TABLES[table]['label']} segment {number} is missing.")
+        return []
+
+
+def _roll_segments(table):
+    """Seal full active segments into archive files and update the manifest.
+
+    Returns the numbers of reopened segments, whose files are deleted once the active csv is rewritten.
+    """
+    spec = TABLES[table]
+    container = globals()[spec["global"]]
+    reopened, container.reopened = container.reopened, []
+    number = max([n for n, _, _ in container.segments] + reopened, default=0)
+
+    sealed = False
+    while container.active >= STACK_SEGMENT_SIZE:
+        number += 1
+        rows = container.seal(number)
+        lines = [spec["header"]]
+        lines.extend(spec["format"](item) for item in rows)
+        filepath = _segment_path(table, number)
+        os.replace(_atomic_write(filepath, '\n'.join(lines) + '\n'), filepath)
+        sealed = True
+
+    if sealed or reopened:
+        text = ''.join(f"{n},{count},{last_id}\n" for n, count, last_id in container.segments)
+        os.replace(_atomic_write(SEGMENTS[table], text), SEGMENTS[table])
+    container.trim()
+    return reopened
+
+
+def _remove_segments(table, numbers):
+    """Delete the files of segments that are no longer part of a stack table."""
+    for number in numbers:
+        filepath = _segment_path(table, number)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _check_segments(table):
+    """Save a stack table once its active segment is full or a pop has reopened a sealed one."""
+    container = globals()[TABLES[table]["global"]]
+    if _current_transaction() is None and (container.active >= STACK_SEGMENT_SIZE or container.reopened):
+        _save_table(table)
+
+
+def set_stack_window(size):
+    """Set how many of the most recent admin actions are kept in memory."""
+    global STACK_WINDOW
+    if size < 1:
+        raise ValueError(f"Stack window must be at least 1, got {size}")
+
+    with _io_lock:
+        STACK_WINDOW = size
+        if "admin_action_stack" in _loaded:
+            admin_action_stack.window = size
+            admin_action_stack.trim()
+            admin_action_stack.fill()
+
+
+def _queue_class():
+    """Return the service request queue type for the current queue mode."""
+    return PriorityServiceRequestQueue if _queue_mode == "priority" else ServiceRequestQueue
+
+
+def _convert_queue(queue):
+    """Rebuild a queue as the type for the current queue mode, keeping its requests and head offsets."""
+    cls = _queue_class()
+    if type(queue) is cls:
+        return queue
+    converted = cls(queue)
+    converted.heads = dict(queue.heads)
+    return converted
+
+
+def set_queue_mode(mode):
+    """Switch the service request queue between "fifo" and "priority" dispatch."""
+    global _queue_mode
+    mode = mode.lower()
+    if mode not in QUEUE_MODES:
+        raise ValueError(f"Unknown queue mode: {mode} (expected one of {', '.join(QUEUE_MODES)})")
     
+    with _io_lock:
+        _queue_mode = mode
+        if "service_request_queue" in _loaded:
+            globals()["service_request_queue"] = _convert_queue(service_request_queue)
+
+
+def get_queue_mode():
+    """Return the current queue mode."""
+    return _queue_mode
+
+
+def _iter_history(table):
+    """Stream an append-only history table from disk: base CSV rows, then journaled appends."""
+    spec = TABLES[table]
+    #buffered appends must be on disk to be seen
+    flush([table])
+
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
+        yield from _iter_rows(table)
+    except FileNotFoundError:
+        return
+
+    for line, op, payload in _iter_journal(table):
+        if op != '+':
+            continue
+        try:
+            yield spec["parse"](payload)
+        except (ValueError, IndexError) as e:
+            print(f"Warning: Skipping invalid {spec['label']} journal entry: {line} - Error: {e}")
+
+
+def _snapshot_rows(table, container):
+    """Return a table's container as plain values: field tuples of its models (or the queue's requests and heads)."""
+    spec = TABLES[table]
+    if spec["kind"] == "queue":
+        return list(container), container.heads
+    fields = attrgetter(*spec["model"].__slots__)
+    items = container.values() if spec["kind"] == "dict" else container
+    return [fields(item) for item in items]
+
+
+def _container_from_rows(table, rows):
+    """Rebuild a table's container from _snapshot_rows() values."""
+    spec = TABLES[table]
+    if spec["kind"] == "queue":
+        requests, heads = rows
+        container = _queue_class()(requests)
+        container.heads = heads
+        return container
+    cls = spec["model"]
+    items = [cls(*row) for row in rows]
+    if spec["kind"] == "dict":
+        key = spec["key"]
+        return {key(item): item for item in items}
+    return items
+
+
+def _write_snapshot(table, container, csv_stat=None):
+    """Write a table's base container to its binary snapshot, stamped with the csv it matches.
+
+    csv_stat is the os.stat() of the csv as the container was read from it (default: the csv now).
+    """
+    if table not in SNAPSHOTS:
+        return
+    try:
+        with _io_lock:
+            csv_stat = csv_stat or os.stat(FILES[table])
+            payload = marshal.dumps(_snapshot_rows(table, container))
+            header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(payload), len(payload),
+                                           csv_stat.st_size, csv_stat.st_mtime_ns)
+            os.replace(_atomic_write(SNAPSHOTS[table], header + payload), SNAPSHOTS[table])
+    except OSError as e:
+        print(f"Warning: Could not write {TABLES[table]['label']} snapshot: {e}")
+
+
+def _read_snapshot(table):
+    """Return a table's base container from its snapshot, or None if it is missing, stale or corrupt."""
+    snap_path = SNAPSHOTS.get(table)
+    if snap_path is None:
+        return None
+    try:
+        csv_stat = os.stat(FILES[table])
+        with open(snap_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
 
-        for line in lines[1:]:
-            line = line.strip()
+    if len(data) < _SNAPSHOT_HEADER.size:
+        return None
+    magic, version, checksum, length, csv_size, csv_mtime = _SNAPSHOT_HEADER.unpack_from(data)
+    #any change to the csv since the snapshot was taken (e.g. edited by hand) wins
+    if (csv_size, csv_mtime) != (csv_stat.st_size, csv_stat.st_mtime_ns):
+        return None
+    payload = data[_SNAPSHOT_HEADER.size:]
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+            or length != len(payload) or zlib.crc32(payload) != checksum):
+        print(f"Warning: Ignoring invalid {TABLES[table]['label']} snapshot, parsing csv instead.")
+        return None
 
-            if not line:  
-                continue
-            
-            try:
-                car = Car.from_csv_row(line)
-                cars_by_id[car.id] = car
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid car row: {line} - Error: {e}")
-                
+    try:
+        return _container_from_rows(table, marshal.loads(payload))
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable {TABLES[table]['label']} snapshot: {e}")
+        return None
+
+
+def _read_table(table):
+    """Load a table's base snapshot (or parse its CSV) and replay its journal, returning the in-memory container."""
+    spec = TABLES[table]
+    filepath = FILES[table]
+    ensure_file_exists(filepath, spec["header"])
+
+    container = _read_snapshot(table)
+    if container is not None:
+        return _replay_journal(table, container)
+
+    container = _new_container(spec)
+    try:
+        csv_stat = os.stat(filepath)
+    except OSError:
+        csv_stat = None
+
+    try:
+        for item in _iter_rows(table):
+            _apply_insert(spec, container, item)
     except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty cars.")
-    
-    return cars_by_id
+        print(f"Warning: {filepath} not found. Starting with empty {spec['label']} table.")
+    else:
+        #the next startup can skip parsing this csv
+        _write_snapshot(table, container, csv_stat)
+
+    return _replay_journal(table, container)
+
+
+def _bind_table(table, container):
+    """Make a loaded container the table's module-level data structure."""
+    if TABLES[table]["kind"] == "queue":
+        #a snapshot may hold the queue type of another mode
+        container = _convert_queue(container)
+    globals()[TABLES[table]["global"]] = container
+    _indexes.pop(table, None)
+    if table == "reservations":
+        _build_expiry_heap(container)
+    _loaded.add(table)
+
+
+def _load_table(table):
+    """Load a table and bind it to its module-level data structure."""
+    with _io_lock:
+        #buffered writes must reach the journal before it is replayed
+        flush([table])
+        start = time.perf_counter()
+        container = _read_table(table)
+        _load_timings[table] = time.perf_counter() - start
+        _bind_table(table, container)
+    return container
+
+
+def _read_table_worker(table):
+    """Read one table in a worker process, returning its rows as plain values for the parent to bind.
+
+    The models are rebuilt in the parent from marshalled field tuples (as for a snapshot), which
+    crosses the process boundary far more cheaply than pickling every model object.
+    """
+    start = time.perf_counter()
+    container = _read_table(table)
+    return marshal.dumps(_snapshot_rows(table, container)), _journal_counts.get(table, 0), time.perf_counter() - start
+
+
+def _load_tables_parallel(tables):
+    """Read several tables concurrently in a process pool and bind them in this process."""
+    #the stack is rebuilt from its segments, which only the parent can do; its active csv is small anyway
+    serial = [table for table in tables if table in SEGMENTS]
+    tables = [table for table in tables if table not in SEGMENTS]
+    workers = min(len(tables), os.cpu_count() or 1)
+
+    with _io_lock:
+        flush(tables)
+        results = None
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_read_table_worker, tables))
+            except (OSError, NotImplementedError) as e:
+                print(f"Warning: Parallel loading unavailable ({e}), loading tables one by one.")
+        if results is None:
+            #a single cpu gains nothing from a pool but its startup cost
+            serial = tables + serial
+        else:
+            for table, (payload, journal_count, elapsed) in zip(tables, results):
+                start = time.perf_counter()
+                container = _container_from_rows(table, marshal.loads(payload))
+                _journal_counts[table] = journal_count
+                _load_timings[table] = elapsed + time.perf_counter() - start
+                _bind_table(table, container)
+
+        for table in serial:
+            _load_table(table)
+
+
+def _ensure_loaded(*tables):
+    """Load any of the given tables that have not been read from disk yet."""
+    for table in tables:
+        if table not in _loaded:
+            with _io_lock:
+                if table not in _loaded:
+                    _load_table(table)
+
+
+#load functions
+def load_cars():
+    """Load all cars from cars.csv into memory."""
+    return _load_table("cars")
 
 
 def load_customers():
     """Load all customers from customers.csv into memory."""
-    global customers_by_id
-    customers_by_id = {}
-    
-    filepath = FILES["customers"]
-    ensure_file_exists(filepath, "id,username,password,phone")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        for line in lines[1:]: #skip headfer
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                customer = Customer.from_csv_row(line)
-                customers_by_id[customer.id] = customer
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid customer row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty customers.")
-    
-    return customers_by_id
+    return _load_table("customers")
+
 
 def load_showrooms():
     """Load all showrooms from showrooms.csv into memory."""
-    global showrooms_by_id
-    showrooms_by_id = {}
-    
-    filepath = FILES["showrooms"]
-    ensure_file_exists(filepath, "id,name,location,phone,car_ids")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        #skiping header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                showroom = Showroom.from_csv_row(line)
-                showrooms_by_id[showroom.id] = showroom
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid showroom row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty showrooms.")
-    
-    return showrooms_by_id
+    return _load_table("showrooms")
 
 
 def load_garages():
     """Load all garages from garages.csv into memory."""
-    global garages_by_id
-    garages_by_id = {}
-    
-    filepath = FILES["garages"]
-    ensure_file_exists(filepath, "id,name,location,phone,service_ids")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        #skipping header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                garage = Garage.from_csv_row(line)
-                garages_by_id[garage.id] = garage
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid garage row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty garages.")
-    
-    return garages_by_id
+    return _load_table("garages")
 
 
 def load_services():
     """Load all services from services.csv into memory."""
-    global services_by_id
-    services_by_id = {}
-    
-    filepath = FILES["services"]
-    ensure_file_exists(filepath, "id,name,price")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        #skipping header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                service = Service.from_csv_row(line)
-                services_by_id[service.id] = service
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid service row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty services.")
-    
-    return services_by_id
+    return _load_table("services")
 
 
 def load_buy_rent_processes():
     """Load all buy/rent processes from buy_rent_process.csv into memory."""
-    global buy_rent_history
-    buy_rent_history = []
-    
-    filepath = FILES["buy_rent_process"]
-    ensure_file_exists(filepath, "process_id,customer_id,date,amount,car_id,type")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        # Skip header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                process = BuyRentProcess.from_csv_row(line)
-                buy_rent_history.append(process)
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid buy/rent process row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty buy/rent history.")
-    
-    return buy_rent_history
+    return _load_table("buy_rent_process")
 
 
 def load_service_processes():
     """Load all service processes from service_process.csv into memory."""
-    global service_history
-    service_history = []
-    
-    filepath = FILES["service_process"]
-    ensure_file_exists(filepath, "process_id,customer_id,date,amount,service_id,garage_id")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        # Skip header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                process = ServiceProcess.from_csv_row(line)
-                service_history.append(process)
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid service process row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty service history.")
-    
-    return service_history
+    return _load_table("service_process")
 
 
 def load_reservations():
     """Load all reservations from reservations.csv into memory."""
-    global reservations_by_id
-    reservations_by_id = {}
-    
-    filepath = FILES["reservations"]
-    ensure_file_exists(filepath, "reservation_id,customer_id,car_id,start_time,expiry_time")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        # Skip header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                reservation = Reservation.from_csv_row(line)
-                reservations_by_id[reservation.reservation_id] = reservation
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid reservation row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty reservations.")
-    
-    return reservations_by_id
+    return _load_table("reservations")
 
 
 def load_service_request_queue():
     """Load service request queue from service_request_queue.csv into memory."""
-    global service_request_queue
-    service_request_queue = []
-    
-    filepath = FILES["service_request_queue"]
-    ensure_file_exists(filepath, "request_id,customer_id,service_id,garage_id,timestamp,status")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        #skip header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                parts = line.split(',')
-                request = {
-                    'request_id': int(parts[0]),
-                    'customer_id': int(parts[1]),
-                    'service_id': int(parts[2]),
-                    'garage_id': int(parts[3]),
-                    'timestamp': parts[4],
-                    'status': parts[5]
-                }
-                service_request_queue.append(request)
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid service request row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty service request queue.")
-    
-    return service_request_queue
+    return _load_table("service_request_queue")
 
 
 def load_admin_action_stack():
     """Load admin action stack from admin_action_stack.csv into memory."""
-    global admin_action_stack
-    admin_action_stack = []
-    
-    filepath = FILES["admin_action_stack"]
-    ensure_file_exists(filepath, "action_id,admin_id,action_type,entity_type,entity_id,timestamp,details")
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        #skip header
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                parts = line.split(',')
-                action = {
-                    'action_id': int(parts[0]),
-                    'admin_id': int(parts[1]),
-                    'action_type': parts[2],
-                    'entity_type': parts[3],
-                    'entity_id': int(parts[4]),
-                    'timestamp': parts[5],
-                    'details': parts[6] if len(parts) > 6 else ''
-                }
-                admin_action_stack.append(action)
-            except (ValueError, IndexError) as e:
-                print(f"Warning: Skipping invalid admin action row: {line} - Error: {e}")
-                
-    except FileNotFoundError:
-        print(f"Warning: {filepath} not found. Starting with empty admin action stack.")
-    
-    return admin_action_stack
+    return _load_table("admin_action_stack")
+
 
+def load_all_data(preload=True, parallel=False):
+    """Load all data from CSV files into memory. This function should be called once when the program starts.
 
-def load_all_data():
-    """Load all data from CSV files into memory. This function should be called once when the program starts."""
+    With preload=False nothing is read yet: each table is loaded the first time it is accessed.
+    With parallel=True the tables are parsed concurrently in a process pool and per-table timings are printed.
+    """
     ensure_data_directory()
     
+    if not preload:
+        #drop what is in memory so the next access reads each table fresh
+        _loaded.clear()
+        print("Data will be loaded on first access.")
+        return None
+    
     print("Loading all data...")
     
-    load_cars()
-    load_customers()
-    load_showrooms()
-    load_garages()
-    load_services()
-    load_buy_rent_processes()
-    load_service_processes()
-    load_reservations()
-    load_service_request_queue()
-    load_admin_action_stack()
+    if parallel:
+        start = time.perf_counter()
+        _load_tables_parallel(list(TABLES))
+        for table in TABLES:
+            print(f"  {table}: {_load_timings[table] * 1000:.1f} ms")
+        print(f"  total: {(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        load_cars()
+        load_customers()
+        load_showrooms()
+        load_garages()
+        load_services()
+        load_buy_rent_processes()
+        load_service_processes()
+        load_reservations()
+        load_service_request_queue()
+        load_admin_action_stack()
     
     print(f"Loaded: {len(cars_by_id)} cars, {len(customers_by_id)} customers, "
           f"{len(showrooms_by_id)} showrooms, {len(garages_by_id)} garages, "
@@ -406,412 +1657,836 @@ def load_all_data():
     }
 
 
+#journal functions
+def _append_journal(table, op, payload):
+    """Append one entry to a table's journal, flagging it for compaction once it grows past the threshold."""
+    line = f"{op},{payload}\n"
+
+    with _io_lock:
+        tx = _current_transaction()
+        if tx is not None:
+            #held back until the transaction commits
+            tx["lines"].setdefault(table, []).append(line)
+            _journal_counts[table] = _journal_counts.get(table, 0) + 1
+            return
+        
+        if _write_mode == "deferred":
+            #mark the table dirty, the line is written on the next flush
+            _pending_writes.setdefault(table, []).append(line)
+        else:
+            with open(JOURNALS[table], 'a', encoding='utf-8') as f:
+                f.write(line)
+
+        _journal_counts[table] = _journal_counts.get(table, 0) + 1
+
+    if _journal_counts[table] >= JOURNAL_COMPACT_THRESHOLD:
+        _request_compaction(table)
+
+
+def _journal_upsert(table, item):
+    """Record an insert or update of a single row."""
+    _observe_id(table, TABLES[table]["key"](item))
+    for index in _indexes.get(table, {}).values():
+        index.upsert(item)
+    _append_journal(table, '+', TABLES[table]["format"](item))
+
+
+def _journal_delete(table, key):
+    """Record the deletion of a single row."""
+    for index in _indexes.get(table, {}).values():
+        index.remove(key)
+    _append_journal(table, '-', key)
+
+
+def _get_index(table, name, build):
+    """Return a derived index of a table, building it from the loaded rows with build(rows) on first use."""
+    _ensure_loaded(table)
+    indexes = _indexes.setdefault(table, {})
+    if name not in indexes:
+        spec = TABLES[table]
+        container = globals()[spec["global"]]
+        indexes[name] = build(container.values() if spec["kind"] == "dict" else container)
+    return indexes[name]
+
+
+def get_dirty_tables():
+    """Return the names of tables with buffered writes that have not been flushed yet."""
+    dirty = [table for table, lines in _pending_writes.items() if lines]
+    dirty.extend(table for table in _pending_heads if table not in dirty)
+    return dirty
+
+
+def flush(tables=None):
+    """Write buffered journal entries to disk, one append per dirty table. Returns the number of tables flushed."""
+    flushed = 0
+    with _io_lock:
+        for table in list(tables or _pending_writes):
+            lines = _pending_writes.pop(table, None)
+            if not lines:
+                continue
+            
+            with open(JOURNALS[table], 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+            flushed += 1
+        
+        #heads after journals, so a head never counts requests missing from the log
+        for table in list(tables or _pending_heads):
+            if table in _pending_heads:
+                _pending_heads.discard(table)
+                _write_head(table)
+        
+        if _sequences_dirty:
+            _save_sequences()
+    
+    return flushed
+
+
+def _flush_loop(interval):
+    """Background loop that flushes dirty tables every interval seconds."""
+    while not _flush_stop.wait(interval):
+        try:
+            flush()
+        except OSError as e:
+            print(f"Warning: Background flush failed - Error: {e}")
+
+
+def start_background_flush(interval=5.0):
+    """Start a daemon thread that flushes dirty tables on a timer."""
+    global _flush_thread
+    if _flush_thread and _flush_thread.is_alive():
+        return _flush_thread
+    
+    _flush_stop.clear()
+    _flush_thread = threading.Thread(target=_flush_loop, args=(interval,), name="storage-flush", daemon=True)
+    _flush_thread.start()
+    return _flush_thread
+
+
+def stop_background_flush():
+    """Stop the background flush thread and write whatever is still buffered."""
+    global _flush_thread
+    _flush_stop.set()
+    if _flush_thread:
+        _flush_thread.join()
+        _flush_thread = None
+    flush()
+
+
+def set_write_mode(mode, flush_interval=None):
+    """Switch between "immediate" and "deferred" (write-behind) persistence.
+
+    In deferred mode mutations only mark their table dirty; the buffered
+    entries are written on flush(), every flush_interval seconds if given,
+    and at interpreter exit.
+    """
+    global _write_mode, _atexit_registered
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode: {mode}")
+    
+    if mode == "immediate":
+        stop_background_flush()
+        _write_mode = mode
+        return
+    
+    _write_mode = mode
+    if not _atexit_registered:
+        atexit.register(flush)
+        _atexit_registered = True
+    if flush_interval:
+        start_background_flush(flush_interval)
+
+
+def get_write_mode():
+    """Return the current write mode."""
+    return _write_mode
+
+
+def compact_journals(tables=None):
+    """Fold pending journal entries into their base CSV files. Returns the number of tables compacted."""
+    compacted = 0
+    for table in (tables or TABLES):
+        dequeued = table in HEADS and table in _loaded and globals()[TABLES[table]["global"]].consumed > 0
+        if _journal_counts.get(table, 0) > 0 or dequeued:
+            _save_table(table)
+            compacted += 1
+    return compacted
+
+
+def _compact_due_tables():
+    """Compact the tables whose journals reached the threshold, between transactions."""
+    if not _compact_due:
+        return 0
+    #a transaction's rows are in memory before it commits, so none may be open while a csv is rewritten
+    with _transaction_lock:
+        compacted = 0
+        for table in list(_compact_due):
+            _save_table(table)
+            _compact_due.discard(table)
+            compacted += 1
+    return compacted
+
+
+def _request_compaction(table):
+    """Flag a table for compaction, starting a compactor thread unless the sweeper will get to it."""
+    global _compact_thread
+    _compact_due.add(table)
+    if _sweep_thread and _sweep_thread.is_alive():
+        return
+    with _io_lock:
+        if _compact_thread and _compact_thread.is_alive():
+            return
+        #not a daemon: exiting waits for a rewrite in progress rather than cutting it short
+        _compact_thread = threading.Thread(target=_compact_in_background, name="journal-compactor")
+        _compact_thread.start()
+
+
+def _compact_in_background():
+    """Compact the flagged tables once, off the thread whose write crossed the threshold."""
+    try:
+        _compact_due_tables()
+    except Exception as e:
+        print(f"Warning: Journal compaction failed - Error: {e}")
+
+
+#transactions
+def _before_write(table, key=None):
+    """Capture the pre-transaction state of a row (or of a list table) before it is modified."""
+    tx = _current_transaction()
+    if tx is None:
+        return
+    
+    spec = TABLES[table]
+    container = globals()[spec["global"]]
+    
+    if spec["kind"] == "dict":
+        rows = tx["rows"].setdefault(table, {})
+        if key not in rows:
+            rows[key] = copy.deepcopy(container.get(key))
+    elif table not in tx["lists"]:
+        if spec["kind"] in ("queue", "stack"):
+            tx["lists"][table] = container.copy()
+        else:
+            #history tables only ever grow, so their length is enough to roll back
+            tx["lists"][table] = len(container) if spec["pop_index"] is None else list(container)
+
+
+def _rollback(tx):
+    """Restore every row and list touched by a failed transaction."""
+    for table, rows in tx["rows"].items():
+        container = globals()[TABLES[table]["global"]]
+        for key, before in rows.items():
+            if before is None:
+                container.pop(key, None)
+            else:
+                container[key] = before
+    
+    for table, saved in tx["lists"].items():
+        name = TABLES[table]["global"]
+        if isinstance(saved, int):
+            del globals()[name][saved:]
+        else:
+            globals()[name] = saved
+    
+    for table, lines in tx["lines"].items():
+        _journal_counts[table] -= len(lines)
+    
+    #indexes saw the rolled back writes, so they are rebuilt on next use
+    for table in (*tx["rows"], *tx["lists"]):
+        _indexes.pop(table, None)
+
+
+def _atomic_write(filepath, data):
+    """Write a file (text or bytes) through a temp file, returning the temp path to be renamed into place."""
+    temp_path = filepath + ".tmp"
+    if isinstance(data, bytes):
+        f = open(temp_path, 'wb')
+    else:
+        f = open(temp_path, 'w', encoding='utf-8')
+    with f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return temp_path
+
+
+def _commit(tx):
+    """Write each journal touched by a transaction once, then rename all of them into place."""
+    with _io_lock:
+        if _write_mode == "deferred":
+            for table, lines in tx["lines"].items():
+                _pending_writes.setdefault(table, []).extend(lines)
+            _pending_heads.update(tx["heads"])
+            return
+        
+        renames = []
+        try:
+            for table, lines in tx["lines"].items():
+                filepath = JOURNALS[table]
+                existing = ""
+                if os.path.exists(filepath):
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        existing = f.read()
+                renames.append((_atomic_write(filepath, existing + ''.join(lines)), filepath))
+            for table in tx["heads"]:
+                renames.append((_atomic_write(HEADS[table], _head_text(table)), HEADS[table]))
+        except OSError:
+            for temp_path, _ in renames:
+                os.remove(temp_path)
+            raise
+        
+        for temp_path, filepath in renames:
+            os.replace(temp_path, filepath)
+        
+        #ids allocated inside the transaction, written once
+        if _sequences_dirty:
+            _save_sequences()
+
+
+@contextmanager
+def transaction():
+    """Group several mutations so they are written together or not at all.
+
+    Journal entries are buffered until the block ends, then every affected
+    journal is written once via temp file plus rename. If the block raises,
+    the in-memory tables are rolled back and nothing is written.
+    Nested transactions join the outermost one of the same thread; a transaction in
+    another thread waits until this one has committed or rolled back.
+    """
+    if _current_transaction() is not None:
+        yield
+        return
+    
+    tx = {"lines": {}, "rows": {}, "lists": {}, "heads": set()}
+    with _transaction_lock:
+        _transaction_state.tx = tx
+        try:
+            yield
+        except BaseException:
+            _transaction_state.tx = None
+            _rollback(tx)
+            raise
+        
+        _transaction_state.tx = None
+        try:
+            _commit(tx)
+        except OSError:
+            _rollback(tx)
+            raise
+    
+    for table in tx["lines"]:
+        if _journal_counts.get(table, 0) >= JOURNAL_COMPACT_THRESHOLD:
+            _request_compaction(table)
+    for table in tx["heads"]:
+        if globals()[TABLES[table]["global"]].consumed >= JOURNAL_COMPACT_THRESHOLD:
+            _request_compaction(table)
+    for table in tx["lists"]:
+        if table in SEGMENTS:
+            _check_segments(table)
+
+
+def in_transaction():
+    """Return True while a storage.transaction() block is open in the calling thread."""
+    return _current_transaction() is not None
+
+
 #save functions
+def _save_table(table):
+    """Rewrite a table's base CSV from memory and empty its journal."""
+    _ensure_loaded(table)
+    spec = TABLES[table]
+    container = globals()[spec["global"]]
+
+    with _io_lock:
+        reopened = []
+        if table in SEGMENTS:
+            #only the active segment is rewritten, sealed ones stay as they are
+            reopened = _roll_segments(table)
+            rows = container.active_rows()
+        else:
+            rows = container.values() if spec["kind"] == "dict" else container
+
+        lines = [spec["header"]]
+        lines.extend(spec["format"](item) for item in rows)
+        os.replace(_atomic_write(FILES[table], '\n'.join(lines) + '\n'), FILES[table])
+
+        #the csv now holds everything the journal and the write buffer did
+        if os.path.exists(JOURNALS[table]):
+            os.remove(JOURNALS[table])
+        _pending_writes.pop(table, None)
+        _journal_counts[table] = 0
+        _compact_due.discard(table)
+
+        if table in HEADS:
+            #dequeued requests are gone from the rewritten csv
+            container.heads = {}
+            _pending_heads.discard(table)
+            if os.path.exists(HEADS[table]):
+                os.remove(HEADS[table])
+
+        _remove_segments(table, reopened)
+        _write_snapshot(table, container)
+
+
 def save_cars():
     """Save all cars from memory to cars.csv."""
-    filepath = FILES["cars"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("id,make,model,year,price,installment,showroom_id,available\n")
-        
-        # Write data
-        for car in cars_by_id.values():
-            f.write(car.to_csv_row() + '\n')
+    _save_table("cars")
 
 
 def save_customers():
     """Save all customers from memory to customers.csv."""
-    filepath = FILES["customers"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("id,username,password,phone\n")
-        
-        # Write data
-        for customer in customers_by_id.values():
-            f.write(customer.to_csv_row() + '\n')
+    _save_table("customers")
 
 
 def save_showrooms():
     """Save all showrooms from memory to showrooms.csv."""
-    filepath = FILES["showrooms"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("id,name,location,phone,car_ids\n")
-        
-        # Write data
-        for showroom in showrooms_by_id.values():
-            f.write(showroom.to_csv_row() + '\n')
+    _save_table("showrooms")
 
 
 def save_garages():
     """Save all garages from memory to garages.csv."""
-    filepath = FILES["garages"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("id,name,location,phone,service_ids\n")
-        
-        # Write data
-        for garage in garages_by_id.values():
-            f.write(garage.to_csv_row() + '\n')
+    _save_table("garages")
 
 
 def save_services():
     """Save all services from memory to services.csv."""
-    filepath = FILES["services"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("id,name,price\n")
-        
-        # Write data
-        for service in services_by_id.values():
-            f.write(service.to_csv_row() + '\n')
+    _save_table("services")
 
 
 def save_buy_rent_processes():
     """Save all buy/rent processes from memory to buy_rent_process.csv."""
-    filepath = FILES["buy_rent_process"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("process_id,customer_id,date,amount,car_id,type\n")
-        
-        # Write data
-        for process in buy_rent_history:
-            f.write(process.to_csv_row() + '\n')
+    _save_table("buy_rent_process")
 
 
 def save_service_processes():
     """Save all service processes from memory to service_process.csv."""
-    filepath = FILES["service_process"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("process_id,customer_id,date,amount,service_id,garage_id\n")
-        
-        # Write data
-        for process in service_history:
-            f.write(process.to_csv_row() + '\n')
+    _save_table("service_process")
 
 
 def save_reservations():
     """Save all reservations from memory to reservations.csv."""
-    filepath = FILES["reservations"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        # Write header
-        f.write("reservation_id,customer_id,car_id,start_time,expiry_time\n")
-        
-        # Write data
-        for reservation in reservations_by_id.values():
-            f.write(reservation.to_csv_row() + '\n')
+    _save_table("reservations")
 
 
 def save_service_request_queue():
     """Save service request queue from memory to service_request_queue.csv."""
-    filepath = FILES["service_request_queue"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        #write header
-        f.write("request_id,customer_id,service_id,garage_id,timestamp,status\n")
-        
-        #write data
-        for request in service_request_queue:
-            f.write(f"{request['request_id']},{request['customer_id']},{request['service_id']},"
-                   f"{request['garage_id']},{request['timestamp']},{request['status']}\n")
+    _save_table("service_request_queue")
 
 
 def save_admin_action_stack():
     """Save admin action stack from memory to admin_action_stack.csv."""
-    filepath = FILES["admin_action_stack"]
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        #write header
-        f.write("action_id,admin_id,action_type,entity_type,entity_id,timestamp,details\n")
-        
-        #write data
-        for action in admin_action_stack:
-            details = action.get('details', '')
-            f.write(f"{action['action_id']},{action['admin_id']},{action['action_type']},"
-                   f"{action['entity_type']},{action['entity_id']},{action['timestamp']},{details}\n")
+    _save_table("admin_action_stack")
 
 
 def save_all_data():
     """Save all in-memory data structures back to CSV files.Called before program exit."""
     print("Saving all data...")
     
-    save_cars()
-    save_customers()
-    save_showrooms()
-    save_garages()
-    save_services()
-    save_buy_rent_processes()
-    save_service_processes()
-    save_reservations()
-    save_service_request_queue()
-    save_admin_action_stack()
+    #tables never loaded this session are already up to date on disk
+    for table in TABLES:
+        if table in _loaded:
+            _save_table(table)
+    if _sequences_dirty:
+        _save_sequences()
     
     print("All data saved successfully")
 
 
 #id management
+def _load_sequences():
+    """Read the persisted id sequences (once)."""
+    global _sequences
+    if _sequences is not None:
+        return _sequences
+
+    sequences = {}
+    ensure_file_exists(SEQUENCES_FILE, SEQUENCES_HEADER)
+    for line in _iter_lines(SEQUENCES_FILE):
+        table, _, last_id = line.partition(',')
+        if table in TABLES and last_id.strip().isdigit():
+            sequences[table] = int(last_id)
+    _sequences = sequences
+    return _sequences
+
+
+def _save_sequences():
+    """Persist the id sequences."""
+    global _sequences_dirty
+    lines = [SEQUENCES_HEADER]
+    lines.extend(f"{table},{last_id}" for table, last_id in _sequences.items())
+    with _io_lock:
+        os.replace(_atomic_write(SEQUENCES_FILE, '\n'.join(lines) + '\n'), SEQUENCES_FILE)
+        _sequences_dirty = False
+
+
+def _sequences_changed():
+    """Persist the sequences now, at transaction commit, or on the next flush in deferred mode."""
+    global _sequences_dirty
+    _sequences_dirty = True
+    if _write_mode == "immediate" and _current_transaction() is None:
+        _save_sequences()
+
+
+def _seed_sequence(table):
+    """Start a table's sequence at the largest id it holds (a one-off scan when no sequence exists yet)."""
+    _ensure_loaded(table)
+    spec = TABLES[table]
+    container = globals()[spec["global"]]
+    rows = container.values() if spec["kind"] == "dict" else container
+    return max((spec["key"](item) for item in rows), default=0)
+
+
+def _next_sequence(table):
+    """Allocate the next id for a table. Ids are never reused, even after deletes and pops."""
+    with _io_lock:
+        sequences = _load_sequences()
+        if table not in sequences:
+            sequences[table] = _seed_sequence(table)
+        sequences[table] += 1
+        _sequences_changed()
+        return sequences[table]
+
+
+def _observe_id(table, key):
+    """Move a table's sequence past an id that was assigned without it."""
+    with _io_lock:
+        sequences = _load_sequences()
+        if table in sequences and key > sequences[table]:
+            sequences[table] = key
+            _sequences_changed()
+
+
 def next_id_for(entity_type):
     """Generate the next unique ID for a given entity type."""
-    entity_type = entity_type.lower()
-    
-    if entity_type == "car":
-        if not cars_by_id:
-            return 1
-        return max(cars_by_id.keys()) + 1
-    
-    elif entity_type == "customer":
-        if not customers_by_id:
-            return 1
-        return max(customers_by_id.keys()) + 1
-    
-    elif entity_type == "showroom":
-        if not showrooms_by_id:
-            return 1
-        return max(showrooms_by_id.keys()) + 1
-    
-    elif entity_type == "garage":
-        if not garages_by_id:
-            return 1
-        return max(garages_by_id.keys()) + 1
-    
-    elif entity_type == "service":
-        if not services_by_id:
-            return 1
-        return max(services_by_id.keys()) + 1
-    
-    elif entity_type == "buy_rent_process":
-        if not buy_rent_history:
-            return 1
-        return max(p.process_id for p in buy_rent_history) + 1
-    
-    elif entity_type == "service_process":
-        if not service_history:
-            return 1
-        return max(p.process_id for p in service_history) + 1
-    
-    elif entity_type == "reservation":
-        if not reservations_by_id:
-            return 1
-        return max(reservations_by_id.keys()) + 1
-    
-    else:
+    table = ENTITY_TABLES.get(entity_type.lower())
+    if table is None:
         raise ValueError(f"Unknown entity type: {entity_type}")
+    return _next_sequence(table)
 
 
 #reservation helpers
-def clean_expired_reservations():
-    """Remove expired reservations and make their cars available again. This function should be called periodically or when checking reservations."""
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    expired_ids = []
-    
-    # Find expired reservations
-    for res_id, reservation in reservations_by_id.items():
-        if reservation.is_expired(current_time):
-            expired_ids.append(res_id)
-            
-            # Mark the car as available again
-            car_id = reservation.car_id
-            if car_id in cars_by_id:
-                cars_by_id[car_id].mark_available()
-    
-    # Remove expired reservations
-    for res_id in expired_ids:
-        del reservations_by_id[res_id]
+def _build_expiry_heap(reservations):
+    """Rebuild the expiry heap from a freshly loaded reservations table."""
+    global _expiry_heap
+    heap = []
+    for reservation in reservations.values():
+        if reservation.expiry_ts is not None:
+            heap.append((reservation.expiry_ts, reservation.reservation_id))
+    heapq.heapify(heap)
+    _expiry_heap = heap
+
+
+def _index_expiry(reservation):
+    """Add a new or restored reservation to the expiry heap (reservations without an expiry never expire)."""
+    if reservation.expiry_ts is not None:
+        with _io_lock:
+            heapq.heappush(_expiry_heap, (reservation.expiry_ts, reservation.reservation_id))
+
+
+def clean_expired_reservations(verbose=True):
+    """Remove expired reservations and make their cars available again. This function should be called periodically or when checking reservations.
+
+    Only the k expired reservations are popped from the expiry heap, so a sweep costs O(k log n).
+    """
+    _ensure_loaded("cars", "reservations")
+    now = time.time()
+    expired = []
+    
+    #nothing due: no transaction is opened (so other threads are not held up)
+    with _io_lock:
+        if not _expiry_heap or _expiry_heap[0][0] > now:
+            return 0
     
-    if expired_ids:
-        print(f"Cleaned {len(expired_ids)} expired reservation(s)")
-        save_reservations()
-        save_cars()
-    
-    return len(expired_ids)
+    try:
+        with transaction():
+            with _io_lock:
+                # Find expired reservations
+                while _expiry_heap and _expiry_heap[0][0] <= now:
+                    entry = heapq.heappop(_expiry_heap)
+                    reservation = reservations_by_id.get(entry[1])
+                    if reservation is not None and reservation.expiry_ts == entry[0]:
+                        expired.append(entry)
+            
+            # Remove expired reservations and mark their cars as available again
+            for _, res_id in expired:
+                _before_write("reservations", res_id)
+                reservation = reservations_by_id.pop(res_id)
+                _journal_delete("reservations", res_id)
+                
+                car = cars_by_id.get(reservation.car_id)
+                if car:
+                    _before_write("cars", car.id)
+                    car.mark_available()
+                    _journal_upsert("cars", car)
+    except BaseException:
+        #the reservations were rolled back, so they are still due
+        with _io_lock:
+            for entry in expired:
+                heapq.heappush(_expiry_heap, entry)
+        raise
+    
+    if expired and verbose:
+        print(f"Cleaned {len(expired)} expired reservation(s)")
+    
+    return len(expired)
+
+
+def _sweep_loop(interval):
+    """Background loop that releases expired reservations every interval seconds.
+
+    It also compacts the journals that reached JOURNAL_COMPACT_THRESHOLD since the last pass,
+    so no user action waits for a csv to be rewritten.
+    """
+    while not _sweep_stop.wait(interval):
+        try:
+            clean_expired_reservations(verbose=False)
+        except Exception as e:
+            print(f"Warning: Reservation sweep failed - Error: {e}")
+        try:
+            _compact_due_tables()
+        except Exception as e:
+            print(f"Warning: Journal compaction failed - Error: {e}")
+
+
+def start_reservation_sweeper(interval=1.0):
+    """Start a daemon thread that releases the cars of expired reservations as they expire."""
+    global _sweep_thread
+    if _sweep_thread and _sweep_thread.is_alive():
+        return _sweep_thread
+    
+    _sweep_stop.clear()
+    _sweep_thread = threading.Thread(target=_sweep_loop, args=(interval,), name="reservation-sweeper", daemon=True)
+    _sweep_thread.start()
+    return _sweep_thread
+
+
+def stop_reservation_sweeper():
+    """Stop the background reservation sweeper."""
+    global _sweep_thread
+    _sweep_stop.set()
+    if _sweep_thread:
+        _sweep_thread.join()
+        _sweep_thread = None
 
 
 #access helpers
 def get_car_by_id(car_id):
     """Retrieve a car by its ID."""
+    _ensure_loaded("cars")
     return cars_by_id.get(int(car_id))
 
 
 def get_customer_by_id(customer_id):
     """Retrieve a customer by their ID."""
+    _ensure_loaded("customers")
     return customers_by_id.get(int(customer_id))
 
 
 def get_showroom_by_id(showroom_id):
     """Retrieve a showroom by its ID."""
+    _ensure_loaded("showrooms")
     return showrooms_by_id.get(int(showroom_id))
 
 
 def get_garage_by_id(garage_id):
     """Retrieve a garage by its ID."""
+    _ensure_loaded("garages")
     return garages_by_id.get(int(garage_id))
 
 
 def get_service_by_id(service_id):
     """Retrieve a service by its ID."""
+    _ensure_loaded("services")
     return services_by_id.get(int(service_id))
 
 
 def get_reservation_by_id(reservation_id):
     """Retrieve a reservation by its ID."""
+    _ensure_loaded("reservations")
     return reservations_by_id.get(int(reservation_id))
 
 
 def get_all_cars():
     """Return a list of all cars."""
+    _ensure_loaded("cars")
     return list(cars_by_id.values())
 
 
 def get_all_customers():
     """Return a list of all customers."""
+    _ensure_loaded("customers")
     return list(customers_by_id.values())
 
 
 def get_all_showrooms():
     """Return a list of all showrooms."""
+    _ensure_loaded("showrooms")
     return list(showrooms_by_id.values())
 
 
 def get_all_garages():
     """Return a list of all garages."""
+    _ensure_loaded("garages")
     return list(garages_by_id.values())
 
 
 def get_all_services():
     """Return a list of all services."""
+    _ensure_loaded("services")
     return list(services_by_id.values())
 
 
 def get_all_reservations():
     """Return a list of all reservations."""
+    _ensure_loaded("reservations")
     return list(reservations_by_id.values())
 
 
 def get_all_buy_rent_processes():
     """Return a list of all buy/rent processes."""
+    _ensure_loaded("buy_rent_process")
     return list(buy_rent_history)
 
 
 def get_all_service_processes():
     """Return a list of all service processes."""
+    _ensure_loaded("service_process")
     return list(service_history)
 
 #id generators
 def get_next_car_id():
     """Generate the next available car ID."""
-    if not cars_by_id:
-        return 1
-    return max(cars_by_id.keys()) + 1
+    return _next_sequence("cars")
 
 def get_next_customer_id():
     """Generate the next available customer ID."""
-    if not customers_by_id:
-        return 1
-    return max(customers_by_id.keys()) + 1
+    return _next_sequence("customers")
 
 def get_next_showroom_id():
     """Generate the next available showroom ID."""
-    if not showrooms_by_id:
-        return 1
-    return max(showrooms_by_id.keys()) + 1
+    return _next_sequence("showrooms")
 
 def get_next_garage_id():
     """Generate the next available garage ID."""
-    if not garages_by_id:
-        return 1
-    return max(garages_by_id.keys()) + 1
+    return _next_sequence("garages")
 
 def get_next_service_id():
     """Generate the next available service ID."""
-    if not services_by_id:
-        return 1
-    return max(services_by_id.keys()) + 1
+    return _next_sequence("services")
 
 def get_next_reservation_id():
     """Generate the next available reservation ID."""
-    if not reservations_by_id:
-        return 1
-    return max(reservations_by_id.keys()) + 1
+    return _next_sequence("reservations")
 
 def get_next_buy_rent_process_id():
     """Generate the next available buy/rent process ID."""
-    if not buy_rent_history:
-        return 1
-    return max(p.id for p in buy_rent_history) + 1
+    return _next_sequence("buy_rent_process")
 
 def get_next_service_process_id():
     """Generate the next available service process ID."""
-    if not service_history:
-        return 1
-    return max(p.id for p in service_history) + 1
+    return _next_sequence("service_process")
 
 def get_next_service_request_id():
     """Generate the next available service request ID."""
-    if not service_request_queue:
-        return 1
-    return max(req['request_id'] for req in service_request_queue) + 1
+    return _next_sequence("service_request_queue")
 
 def get_next_admin_action_id():
     """Generate the next available admin action ID."""
-    if not admin_action_stack:
-        return 1
-    return max(action['action_id'] for action in admin_action_stack) + 1
+    return _next_sequence("admin_action_stack")
 
 #crud helpers for cars
 def add_car(car_object):
     """Add a new car to the system."""
+    _ensure_loaded("cars")
     if car_object.id in cars_by_id:
         return False
     
-    cars_by_id[car_object.id] = car_object
-    save_cars()
+    with _io_lock:
+        _before_write("cars", car_object.id)
+        cars_by_id[car_object.id] = car_object
+        _journal_upsert("cars", car_object)
     return True
 
 
+def iter_buy_rent_history():
+    """Yield every buy/rent process in order without holding the whole history in memory."""
+    if "buy_rent_process" in _loaded:
+        yield from buy_rent_history
+    else:
+        yield from _iter_history("buy_rent_process")
+
+
+def iter_service_history():
+    """Yield every service process in order without holding the whole history in memory."""
+    if "service_process" in _loaded:
+        yield from service_history
+    else:
+        yield from _iter_history("service_process")
+
+
 def update_car(car_id, **fields):
     """Update an existing car's details."""
     car = get_car_by_id(car_id)
     if not car:
         return False
     
-    car.update_details(**fields)
-    save_cars()
+    with _io_lock:
+        _before_write("cars", car.id)
+        car.update_details(**fields)
+        _journal_upsert("cars", car)
     return True
 
 
 def delete_car(car_id):
     """Delete a car from the system."""
+    _ensure_loaded("cars")
     car_id = int(car_id)
     if car_id not in cars_by_id:
         return False
     
     car = cars_by_id[car_id]
-    showroom = get_showroom_by_id(car.showroom_id)
-    if showroom:
-        showroom.remove_car(car_id)
-        save_showrooms()
-    
-    del cars_by_id[car_id]
-    save_cars()
+    with transaction():
+        showroom = get_showroom_by_id(car.showroom_id)
+        if showroom:
+            _before_write("showrooms", showroom.id)
+            showroom.remove_car(car_id)
+            _journal_upsert("showrooms", showroom)
+        
+        _before_write("cars", car_id)
+        del cars_by_id[car_id]
+        _journal_delete("cars", car_id)
     return True
 
+def restore_entity(entity_type, row):
+    """Put an entity back exactly as a before-image CSV row describes it (used by undo). Returns the entity."""
+    table = ENTITY_TABLES.get(entity_type.lower())
+    if table is None or TABLES[table]["kind"] != "dict":
+        raise ValueError(f"Cannot restore entity type: {entity_type}")
+    
+    spec = TABLES[table]
+    entity = spec["parse"](row)
+    key = spec["key"](entity)
+    
+    _ensure_loaded(table)
+    with _io_lock:
+        _before_write(table, key)
+        globals()[spec["global"]][key] = entity
+        _journal_upsert(table, entity)
+        if table == "reservations":
+            _index_expiry(entity)
+    return entity
+
+
 #crud helpers for customers
 def add_customer(customer_object):
     """Add a new customer to the system."""
+    _ensure_loaded("customers")
     if customer_object.id in customers_by_id:
         return False
     
-    customers_by_id[customer_object.id] = customer_object
-    save_customers()
+    with _io_lock:
+        _before_write("customers", customer_object.id)
+        customers_by_id[customer_object.id] = customer_object
+        _journal_upsert("customers", customer_object)
     return True
 
 
@@ -821,36 +2496,44 @@ def update_customer(customer_id, **fields):
     if not customer:
         return False
     
-    if 'username' in fields:
-        customer.username = fields['username']
-    if 'password' in fields:
-        customer.password = fields['password']
-    if 'phone' in fields:
-        customer.phone = int(fields['phone'])
-    
-    save_customers()
+    with _io_lock:
+        _before_write("customers", customer.id)
+        if 'username' in fields:
+            customer.username = fields['username']
+        if 'password' in fields:
+            customer.password = fields['password']
+        if 'phone' in fields:
+            customer.phone = int(fields['phone'])
+        
+        _journal_upsert("customers", customer)
     return True
 
 
 def delete_customer(customer_id):
     """Delete a customer from the system."""
+    _ensure_loaded("customers")
     customer_id = int(customer_id)
     if customer_id not in customers_by_id:
         return False
     
-    del customers_by_id[customer_id]
-    save_customers()
+    with _io_lock:
+        _before_write("customers", customer_id)
+        del customers_by_id[customer_id]
+        _journal_delete("customers", customer_id)
     return True
 
 
 #crud helpers for showrooms
 def add_showroom(showroom_object):
     """Add a new showroom to the system."""
+    _ensure_loaded("showrooms")
     if showroom_object.id in showrooms_by_id:
         return False
     
-    showrooms_by_id[showroom_object.id] = showroom_object
-    save_showrooms()
+    with _io_lock:
+        _before_write("showrooms", showroom_object.id)
+        showrooms_by_id[showroom_object.id] = showroom_object
+        _journal_upsert("showrooms", showroom_object)
     return True
 
 
@@ -860,30 +2543,51 @@ def update_showroom(showroom_id, **fields):
     if not showroom:
         return False
     
-    showroom.update_details(**fields)
-    save_showrooms()
+    with _io_lock:
+        _before_write("showrooms", showroom.id)
+        showroom.update_details(**fields)
+        _journal_upsert("showrooms", showroom)
     return True
 
 
 def delete_showroom(showroom_id):
     """Delete a showroom from the system."""
+    _ensure_loaded("showrooms")
     showroom_id = int(showroom_id)
     if showroom_id not in showrooms_by_id:
         return False
     
-    del showrooms_by_id[showroom_id]
-    save_showrooms()
+    with _io_lock:
+        _before_write("showrooms", showroom_id)
+        del showrooms_by_id[showroom_id]
+        _journal_delete("showrooms", showroom_id)
+    return True
+
+
+def add_car_to_showroom(showroom_id, car_id):
+    """Link a car to a showroom's car list."""
+    showroom = get_showroom_by_id(showroom_id)
+    if not showroom:
+        return False
+    
+    with _io_lock:
+        _before_write("showrooms", showroom.id)
+        if showroom.add_car(car_id):
+            _journal_upsert("showrooms", showroom)
     return True
 
 
 #crud helpers for garages
 def add_garage(garage_object):
     """Add a new garage to the system."""
+    _ensure_loaded("garages")
     if garage_object.id in garages_by_id:
         return False
     
-    garages_by_id[garage_object.id] = garage_object
-    save_garages()
+    with _io_lock:
+        _before_write("garages", garage_object.id)
+        garages_by_id[garage_object.id] = garage_object
+        _journal_upsert("garages", garage_object)
     return True
 
 
@@ -893,30 +2597,38 @@ def update_garage(garage_id, **fields):
     if not garage:
         return False
     
-    garage.update_details(**fields)
-    save_garages()
+    with _io_lock:
+        _before_write("garages", garage.id)
+        garage.update_details(**fields)
+        _journal_upsert("garages", garage)
     return True
 
 
 def delete_garage(garage_id):
     """Delete a garage from the system."""
+    _ensure_loaded("garages")
     garage_id = int(garage_id)
     if garage_id not in garages_by_id:
         return False
     
-    del garages_by_id[garage_id]
-    save_garages()
+    with _io_lock:
+        _before_write("garages", garage_id)
+        del garages_by_id[garage_id]
+        _journal_delete("garages", garage_id)
     return True
 
 
 #crud helpers for services
 def add_service(service_object):
     """Add a new service to the system."""
+    _ensure_loaded("services")
     if service_object.id in services_by_id:
         return False
     
-    services_by_id[service_object.id] = service_object
-    save_services()
+    with _io_lock:
+        _before_write("services", service_object.id)
+        services_by_id[service_object.id] = service_object
+        _journal_upsert("services", service_object)
     return True
 
 
@@ -926,71 +2638,107 @@ def update_service(service_id, **fields):
     if not service:
         return False
     
-    service.update_details(**fields)
-    save_services()
+    with _io_lock:
+        _before_write("services", service.id)
+        service.update_details(**fields)
+        _journal_upsert("services", service)
     return True
 
 
 def delete_service(service_id):
     """Delete a service from the system."""
+    _ensure_loaded("services")
     service_id = int(service_id)
     if service_id not in services_by_id:
         return False
     
-    del services_by_id[service_id]
-    save_services()
+    with _io_lock:
+        _before_write("services", service_id)
+        del services_by_id[service_id]
+        _journal_delete("services", service_id)
     return True
 
 
 #crud helpers for reservations
 def add_reservation(reservation_object):
     """Add a new reservation to the system."""
+    _ensure_loaded("reservations")
     if reservation_object.reservation_id in reservations_by_id:
         return False
     
-    reservations_by_id[reservation_object.reservation_id] = reservation_object
-    save_reservations()
+    with _io_lock:
+        _before_write("reservations", reservation_object.reservation_id)
+        reservations_by_id[reservation_object.reservation_id] = reservation_object
+        _journal_upsert("reservations", reservation_object)
+        _index_expiry(reservation_object)
     return True
 
 
 def delete_reservation(reservation_id):
     """Delete a reservation from the system."""
+    _ensure_loaded("reservations")
     reservation_id = int(reservation_id)
     if reservation_id not in reservations_by_id:
         return False
     
     reservation = reservations_by_id[reservation_id]
-    car = get_car_by_id(reservation.car_id)
-    if car:
-        car.mark_available()
-        save_cars()
-    
-    del reservations_by_id[reservation_id]
-    save_reservations()
+    with transaction():
+        car = get_car_by_id(reservation.car_id)
+        if car:
+            _before_write("cars", car.id)
+            car.mark_available()
+            _journal_upsert("cars", car)
+        
+        _before_write("reservations", reservation_id)
+        del reservations_by_id[reservation_id]
+        _journal_delete("reservations", reservation_id)
     return True
 
 
 #helpers for processes
 def add_buy_rent_process(process_object):
     """Add a new buy/rent process to history."""
-    buy_rent_history.append(process_object)
-    save_buy_rent_processes()
+    _ensure_loaded("buy_rent_process")
+    with _io_lock:
+        _before_write("buy_rent_process")
+        buy_rent_history.append(process_object)
+        _journal_upsert("buy_rent_process", process_object)
     return True
 
 
 def add_service_process(process_object):
     """Add a new service process to history."""
-    service_history.append(process_object)
-    save_service_processes()
+    _ensure_loaded("service_process")
+    with _io_lock:
+        _before_write("service_process")
+        service_history.append(process_object)
+        _journal_upsert("service_process", process_object)
     return True
 
 
 #search and filter functions
 def search_cars(filters=None):
-    """Search for cars matching the given filters."""
+    """Search for cars matching the given filters.
+
+    Filters on make, model, year, showroom_id or available=True are planned over the CarIndex
+    sets and only the cars they leave are checked (results then come back in id order). Broad
+    or unindexed searches run as vectorized masks over the columnar CarTable when numpy is
+    installed, and as a loop over every car otherwise.
+    """
+    _ensure_loaded("cars")
     if not filters:
         return get_all_cars()
     
+    #with numpy, a plan whose most selective filter still leaves a broad share is not built at all
+    limit = INDEX_SCAN_RATIO * len(cars_by_id) if columnar.HAVE_NUMPY else None
+    ids = _get_index("cars", "secondary", CarIndex).plan(filters, limit)
+    if ids is not None:
+        candidates = (cars_by_id[car_id] for car_id in sorted(ids))
+        return [car for car in candidates if car.matches_filter(filters)]
+    
+    if columnar.HAVE_NUMPY:
+        return _get_index("cars", "columns", columnar.CarTable).filter(filters)
+    
     results = []
     for car in cars_by_id.values():
         if car.matches_filter(filters):
@@ -999,8 +2747,81 @@ def search_cars(filters=None):
     return results
 
 
+def cars_in_price_range(lo=None, hi=None, limit=None, offset=0, filters=None):
+    """Return one page of the cars priced lo..hi (inclusive; None leaves that end open), cheapest first.
+
+    Walks the PriceIndex from the first car in range, checking any other filters on the way, and
+    stops after offset + limit matches. If the CarIndex narrows the other filters to fewer cars
+    than the range holds, those few are sorted by price instead.
+    """
+    _ensure_loaded("cars")
+    prices = _get_index("cars", "prices", PriceIndex)
+    filters = dict(filters or {}, min_price=lo, max_price=hi)
+    
+    in_range = prices.count(lo, hi)
+    ids = _get_index("cars", "secondary", CarIndex).plan(filters, in_range)
+    if ids is not None and len(ids) < in_range:
+        candidates = sorted(ids, key=prices.key)
+    else:
+        candidates = prices.ids_between(lo, hi)
+    
+    matches = (car for car in map(cars_by_id.__getitem__, candidates) if car.matches_filter(filters))
+    return list(islice(matches, offset, None if limit is None else offset + limit))
+
+
+def iter_cars_by_price(lo=None, hi=None, reverse=False):
+    """Yield the cars priced lo..hi (inclusive; None leaves that end open), cheapest first (dearest first if reverse).
+
+    The walk follows the live index, so cars written while it runs may be skipped or seen twice.
+    """
+    _ensure_loaded("cars")
+    for car_id in _get_index("cars", "prices", PriceIndex).ids_between(lo, hi, reverse):
+        yield cars_by_id[car_id]
+
+
+def fuzzy_search_cars(query, limit=10, filters=None):
+    """Return up to limit cars whose make/model best match a free-text query, typos allowed (best first).
+
+    Candidates come from the FuzzyCarIndex BK-tree, so edit distances are computed against a
+    pruned part of the make/model vocabulary, never against every car. Any other filters are
+    checked on those candidates only.
+    """
+    _ensure_loaded("cars")
+    accept = (lambda car_id: cars_by_id[car_id].matches_filter(filters)) if filters else None
+    ids = _get_index("cars", "fuzzy", fuzzy.FuzzyCarIndex).search(query, limit, accept)
+    return [cars_by_id[car_id] for car_id in ids]
+
+
+def _search_text(table, filters):
+    """Return the rows of a table matching filters, narrowing substring filters with its TrigramIndex (id order)."""
+    _ensure_loaded(table)
+    rows = globals()[TABLES[table]["global"]]
+    if not filters:
+        return list(rows.values())
+    
+    ids = _get_index(table, "trigrams", lambda items: TrigramIndex(items, TEXT_FIELDS[table])).search(filters)
+    candidates = rows.values() if ids is None else map(rows.__getitem__, sorted(ids))
+    return [row for row in candidates if row.matches_filter(filters)]
+
+
+def search_showrooms(filters=None):
+    """Search showrooms by name and/or location substring."""
+    return _search_text("showrooms", filters)
+
+
+def search_garages(filters=None):
+    """Search garages by name and/or location substring."""
+    return _search_text("garages", filters)
+
+
+def search_services(filters=None):
+    """Search services by name substring."""
+    return _search_text("services", filters)
+
+
 def get_customer_by_username(username):
     """Find a customer by username."""
+    _ensure_loaded("customers")
     for customer in customers_by_id.values():
         if customer.username.lower() == username.lower():
             return customer
@@ -1039,6 +2860,7 @@ def get_services_in_garage(garage_id):
 
 def get_customer_reservations(customer_id):
     """Get all reservations for a specific customer."""
+    _ensure_loaded("reservations")
     reservations = []
     for reservation in reservations_by_id.values():
         if reservation.customer_id == int(customer_id):
@@ -1049,6 +2871,7 @@ def get_customer_reservations(customer_id):
 
 def get_customer_buy_rent_history(customer_id):
     """Get all buy/rent processes for a specific customer."""
+    _ensure_loaded("buy_rent_process")
     processes = []
     for process in buy_rent_history:
         if process.customer_id == int(customer_id):
@@ -1059,6 +2882,7 @@ def get_customer_buy_rent_history(customer_id):
 
 def get_customer_service_history(customer_id):
     """Get all service processes for a specific customer."""
+    _ensure_loaded("service_process")
     processes = []
     for process in service_history:
         if process.customer_id == int(customer_id):
@@ -1067,63 +2891,243 @@ def get_customer_service_history(customer_id):
     return processes
 
 
-#queue operations (FIFO - first in first out)
-def enqueue_service_request(customer_id, service_id, garage_id):
-    """Add a service request to the end of the queue (enqueue operation)."""
-    request_id = len(service_request_queue) + 1
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    request = {
-        'request_id': request_id,
-        'customer_id': customer_id,
-        'service_id': service_id,
-        'garage_id': garage_id,
-        'timestamp': timestamp,
-        'status': 'pending'
+#revenue analytics
+REVENUE_PERCENTILES = (50, 90, 99)
+
+
+def _percentile(sorted_values, q):
+    """Return the q-th percentile of sorted values, interpolated linearly like numpy.percentile."""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _month_label(month):
+    """Format a yyyymm month key as "YYYY-MM" ("unknown" for 0)."""
+    return f"{month // 100:04d}-{month % 100:02d}" if month else "unknown"
+
+
+def _add_amount(sums, key, amount):
+    """Add an amount to a running {key: total}."""
+    sums[key] = sums.get(key, 0.0) + amount
+
+
+def _revenue_ledgers():
+    """Return the columnar ledgers of the buy/rent and service histories (built on first use)."""
+    sales = _get_index("buy_rent_process", "ledger",
+                       lambda rows: columnar.Ledger(rows, "car_id", type_field="type"))
+    services = _get_index("service_process", "ledger",
+                          lambda rows: columnar.Ledger(rows, "service_id", garage_field="garage_id"))
+    return sales, services
+
+
+def get_revenue_stats():
+    """Return revenue totals, breakdowns and percentiles over the buy/rent and service histories.
+
+    Keys: buy_rent_total, service_total, total, by_type (buy/rent), by_customer, by_garage,
+    by_showroom (through each sold or rented car), by_month ("YYYY-MM") and percentiles
+    ({"buy_rent": {q: amount}, "service": {q: amount}}). With numpy installed every figure is
+    a vectorized reduction over the columnar ledgers instead of a loop over process objects.
+    """
+    _ensure_loaded("cars", "buy_rent_process", "service_process")
+    
+    if columnar.HAVE_NUMPY:
+        sales, services = _revenue_ledgers()
+        by_type = {name: sales.total(name) for name in ("buy", "rent")}
+        by_car = sales.sum_by("item_id")
+        by_customer = sales.sum_by("customer_id")
+        by_garage = services.sum_by("garage_id")
+        by_month = sales.sum_by("month")
+        for customer_id, amount in services.sum_by("customer_id").items():
+            _add_amount(by_customer, customer_id, amount)
+        for month, amount in services.sum_by("month").items():
+            _add_amount(by_month, month, amount)
+        totals = (sales.total(), services.total())
+        percentiles = {"buy_rent": sales.percentiles(REVENUE_PERCENTILES),
+                       "service": services.percentiles(REVENUE_PERCENTILES)}
+    else:
+        by_type, by_car, by_customer, by_garage, by_month = {"buy": 0.0, "rent": 0.0}, {}, {}, {}, {}
+        for history in (buy_rent_history, service_history):
+            for process in history:
+                _add_amount(by_customer, process.customer_id, process.amount)
+                month = time.localtime(process.date_ts) if process.date_ts is not None else None
+                _add_amount(by_month, month.tm_year * 100 + month.tm_mon if month else 0, process.amount)
+        for process in buy_rent_history:
+            if process.type.lower() in by_type:
+                _add_amount(by_type, process.type.lower(), process.amount)
+            _add_amount(by_car, process.car_id, process.amount)
+        for process in service_history:
+            _add_amount(by_garage, process.garage_id, process.amount)
+        totals = (sum(p.amount for p in buy_rent_history), sum(p.amount for p in service_history))
+        percentiles = {}
+        for name, history in (("buy_rent", buy_rent_history), ("service", service_history)):
+            amounts = sorted(p.amount for p in history)
+            percentiles[name] = {q: _percentile(amounts, q) for q in REVENUE_PERCENTILES} if amounts else {}
+    
+    #a car's sales count towards the showroom it is listed in now
+    by_showroom = {}
+    for car_id, amount in by_car.items():
+        car = cars_by_id.get(car_id)
+        _add_amount(by_showroom, car.showroom_id if car else 0, amount)
+    
+    return {
+        "buy_rent_total": totals[0],
+        "service_total": totals[1],
+        "total": totals[0] + totals[1],
+        "by_type": by_type,
+        "by_customer": by_customer,
+        "by_garage": by_garage,
+        "by_showroom": by_showroom,
+        "by_month": {_month_label(month): amount for month, amount in sorted(by_month.items())},
+        "percentiles": percentiles,
     }
+
+
+#queue operations (FIFO - first in first out, or aged priority in "priority" mode)
+def is_buyer(customer_id):
+    """Return True if the customer has bought a car. O(1) once the BuyerIndex is built."""
+    indexes = _indexes.setdefault("buy_rent_process", {})
+    if "buyers" not in indexes:
+        #streamed from disk when the history is not loaded, so it is not pulled into memory
+        indexes["buyers"] = BuyerIndex(iter_buy_rent_history())
+    return int(customer_id) in indexes["buyers"]
+
+
+def service_request_priority(customer_id, service_id):
+    """Return the priority level of a request: from the service's name, plus a level for car buyers."""
+    priority = 0
+    service = get_service_by_id(service_id)
+    if service:
+        name = service.name.lower()
+        priority = max((level for keyword, level in SERVICE_PRIORITIES.items() if keyword in name), default=0)
     
-    service_request_queue.append(request)
-    save_service_request_queue()
+    if is_buyer(customer_id):
+        priority += BUYER_PRIORITY
+    return priority
+
+
+def enqueue_service_request(customer_id, service_id, garage_id):
+    """Add a service request to the end of the queue (enqueue operation)."""
+    _ensure_loaded("service_request_queue")
+    #the id is allocated under the lock too, so rows reach the container in id order
+    with _io_lock:
+        request_id = _next_sequence("service_request_queue")
+        timestamp = int(time.time())
+        
+        request = {
+            'request_id': request_id,
+            'customer_id': customer_id,
+            'service_id': service_id,
+            'garage_id': garage_id,
+            'timestamp': timestamp,
+            'status': 'pending',
+            'priority': service_request_priority(customer_id, service_id)
+        }
+        
+        _before_write("service_request_queue")
+        service_request_queue.append(request)
+        _journal_upsert("service_request_queue", request)
     
-    print(f"Service request #{request_id} added to queue at position {len(service_request_queue)}")
+    print(f"Service request #{request_id} added to garage #{garage_id} queue at position "
+          f"{service_request_queue.size(garage_id)}")
     return request_id
 
 
-def dequeue_service_request():
-    """Remove and return the first service request from the queue (dequeue operation)."""
-    if not service_request_queue:
-        print("Queue is empty. No service requests to process.")
+def dequeue_service_request(garage_id=None):
+    """Remove and return the first service request for a garage, or round-robin across garages (dequeue operation)."""
+    _ensure_loaded("service_request_queue")
+    if not service_request_queue.size(garage_id):
+        if garage_id is None:
+            print("Queue is empty. No service requests to process.")
+        else:
+            print(f"Queue for garage #{garage_id} is empty. No service requests to process.")
         return None
     
-    request = service_request_queue.pop(0)
-    save_service_request_queue()
+    with _io_lock:
+        _before_write("service_request_queue")
+        request = service_request_queue.popleft(garage_id)
+        if service_request_queue.fifo:
+            _record_head("service_request_queue")
+        else:
+            _journal_delete("service_request_queue", request['request_id'])
     
     print(f"Processing service request #{request['request_id']} from customer {request['customer_id']}")
     return request
 
 
-def peek_service_request_queue():
-    """View the first service request in the queue without removing it."""
-    if not service_request_queue:
-        return None
-    return service_request_queue[0]
+def dequeue_service_requests(count, garage_id=None):
+    """Remove and return up to count service requests in dispatch order (batch dequeue operation)."""
+    _ensure_loaded("service_request_queue")
+    requests = []
+    
+    #one transaction, so the whole batch costs one write per file
+    with transaction():
+        _before_write("service_request_queue")
+        while len(requests) < count and service_request_queue.size(garage_id):
+            request = service_request_queue.popleft(garage_id)
+            if not service_request_queue.fifo:
+                _journal_delete("service_request_queue", request['request_id'])
+            requests.append(request)
+        
+        if requests and service_request_queue.fifo:
+            _record_head("service_request_queue")
+    
+    print(f"Dequeued {len(requests)} service requests")
+    return requests
+
+
+def peek_service_request_queue(garage_id=None):
+    """View the service request dequeue_service_request() would return next, without removing it."""
+    _ensure_loaded("service_request_queue")
+    return service_request_queue.peek(garage_id)
+
+
+def get_queue_size(garage_id=None):
+    """Return the number of service requests in the queue, in total or for one garage."""
+    _ensure_loaded("service_request_queue")
+    return service_request_queue.size(garage_id)
+
+
+def get_garage_queue_sizes():
+    """Return {garage_id: number of queued requests} for every garage with a backlog."""
+    _ensure_loaded("service_request_queue")
+    return service_request_queue.depths()
+
+
+def get_queue_position(request_id):
+    """Return the 1-based position of a service request in its garage's queue, or None if it is not queued."""
+    _ensure_loaded("service_request_queue")
+    return service_request_queue.position(request_id)
+
 
+def get_queue_positions():
+    """Return {request_id: 1-based position in its garage's queue} for every queued request, in one pass."""
+    _ensure_loaded("service_request_queue")
+    return service_request_queue.positions()
 
-def get_queue_size():
-    """Return the number of service requests in the queue."""
-    return len(service_request_queue)
+
+def get_all_service_requests():
+    """Return the queued service requests, front of the queue first."""
+    _ensure_loaded("service_request_queue")
+    return list(service_request_queue)
 
 
 def view_service_request_queue():
     """Display all service requests in the queue."""
+    _ensure_loaded("service_request_queue")
     if not service_request_queue:
         print("Service request queue is empty.")
         return []
     
     print(f"\nService Request Queue ({len(service_request_queue)} requests):")
+    for garage_id, depth in sorted(service_request_queue.depths().items()):
+        print(f"  Garage #{garage_id}: {depth} waiting")
     print("=" * 80)
     
-    for i, request in enumerate(service_request_queue, 1):
+    positions = service_request_queue.positions()
+    for request in service_request_queue:
+        position = positions[request['request_id']]
         customer = get_customer_by_id(request['customer_id'])
         service = get_service_by_id(request['service_id'])
         garage = get_garage_by_id(request['garage_id'])
@@ -1132,35 +3136,45 @@ def view_service_request_queue():
         service_name = service.name if service else f"Service #{request['service_id']}"
         garage_name = garage.name if garage else f"Garage #{request['garage_id']}"
         
-        print(f"Position {i}: Request #{request['request_id']}")
+        print(f"Position {position} at {garage_name}: Request #{request['request_id']}")
         print(f"  Customer: {customer_name}")
         print(f"  Service: {service_name}")
         print(f"  Garage: {garage_name}")
-        print(f"  Timestamp: {request['timestamp']}")
+        print(f"  Timestamp: {format_timestamp(request['timestamp'])}")
+        print(f"  Priority: {request.get('priority', 0)}")
         print(f"  Status: {request['status']}")
         print("-" * 80)
     
-    return service_request_queue
+    return list(service_request_queue)
 
 
 #stack operations
-def push_admin_action(admin_id, action_type, entity_type, entity_id, details=""):
-    """Push an admin action onto the stack (for undo functionality)."""
-    action_id = len(admin_action_stack) + 1
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    action = {
-        'action_id': action_id,
-        'admin_id': admin_id,
-        'action_type': action_type,
-        'entity_type': entity_type,
-        'entity_id': entity_id,
-        'timestamp': timestamp,
-        'details': details
-    }
-    
-    admin_action_stack.append(action)
-    save_admin_action_stack()
+def push_admin_action(admin_id, action_type, entity_type, entity_id, details="", before=""):
+    """Push an admin action onto the stack (for undo functionality).
+
+    before is the entity's CSV row as it was before an update or delete, so the action can be undone.
+    """
+    _ensure_loaded("admin_action_stack")
+    #the id is allocated under the lock too, so rows reach the container in id order
+    with _io_lock:
+        action_id = _next_sequence("admin_action_stack")
+        timestamp = int(time.time())
+        
+        action = {
+            'action_id': action_id,
+            'admin_id': admin_id,
+            'action_type': action_type,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'timestamp': timestamp,
+            'details': details,
+            'before': before
+        }
+        
+        _before_write("admin_action_stack")
+        admin_action_stack.append(action)
+        _journal_upsert("admin_action_stack", action)
+        _check_segments("admin_action_stack")
     
     print(f"Admin action #{action_id} ({action_type}) pushed to stack")
     return action_id
@@ -1168,12 +3182,16 @@ def push_admin_action(admin_id, action_type, entity_type, entity_id, details="")
 
 def pop_admin_action():
     """Pop the most recent admin action from the stack (for undo operation)."""
+    _ensure_loaded("admin_action_stack")
     if not admin_action_stack:
         print("Stack is empty. No actions to undo.")
         return None
     
-    action = admin_action_stack.pop()
-    save_admin_action_stack()
+    with _io_lock:
+        _before_write("admin_action_stack")
+        action = admin_action_stack.pop()
+        _journal_delete("admin_action_stack", action['action_id'])
+        _check_segments("admin_action_stack")
     
     print(f"Popped action #{action['action_id']}: {action['action_type']} on {action['entity_type']} #{action['entity_id']}")
     return action
@@ -1181,25 +3199,27 @@ def pop_admin_action():
 
 def peek_admin_action_stack():
     """View the most recent admin action without removing it from the stack."""
+    _ensure_loaded("admin_action_stack")
     if not admin_action_stack:
         return None
-    return admin_action_stack[-1]
+    return admin_action_stack.peek()
 
 
 def get_stack_size():
-    """Return the number of admin actions in the stack."""
+    """Return the number of admin actions in the stack (including those not held in memory)."""
+    _ensure_loaded("admin_action_stack")
     return len(admin_action_stack)
 
 
 def view_admin_action_stack(limit=10):
-    """Display the most recent admin actions in the stack."""
+    """Display the most recent admin actions in the stack (from memory, never the sealed segments)."""
+    _ensure_loaded("admin_action_stack")
     if not admin_action_stack:
         print("Admin action stack is empty.")
         return []
     
-    display_count = min(limit, len(admin_action_stack))
-    recent_actions = admin_action_stack[-display_count:]
-    recent_actions.reverse()
+    recent_actions = admin_action_stack.recent(limit)
+    display_count = len(recent_actions)
     
     print(f"\nAdmin Action Stack (showing {display_count} most recent):")
     print("=" * 80)
@@ -1208,7 +3228,7 @@ def view_admin_action_stack(limit=10):
         print(f"Action #{action['action_id']}: {action['action_type'].upper()}")
         print(f"  Admin ID: {action['admin_id']}")
         print(f"  Entity: {action['entity_type']} #{action['entity_id']}")
-        print(f"  Timestamp: {action['timestamp']}")
+        print(f"  Timestamp: {format_timestamp(action['timestamp'])}")
         if action.get('details'):
             print(f"  Details: {action['details']}")
         print("-" * 80)
@@ -1218,9 +3238,27 @@ def view_admin_action_stack(limit=10):
 
 def clear_admin_action_stack():
     """Clear all admin actions from the stack."""
+    _ensure_loaded("admin_action_stack")
     global admin_action_stack
     count = len(admin_action_stack)
-    admin_action_stack = []
+    sealed = [number for number, _, _ in admin_action_stack.segments] + admin_action_stack.reopened
+    admin_action_stack = AdminActionStack()
+    #the old segments are all dropped by the rewrite, like reopened ones
+    admin_action_stack.reopened = sealed
     save_admin_action_stack()
     print(f"Cleared {count} admin action(s) from stack")
     return count
+
+
+#backend selection
+if STORAGE_BACKEND == "sqlite":
+    import sqlite_backend
+    sqlite_backend.install(globals())
+elif STORAGE_BACKEND != "csv":
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+if STACK_WINDOW < 1:
+    raise ValueError(f"Stack window must be at least 1, got {STACK_WINDOW}")
+
+if _queue_mode not in QUEUE_MODES:
+    raise ValueError(f"Unknown queue mode: {_queue_mode} (expected one of {', '.join(QUEUE_MODES)})")